@@ -0,0 +1,115 @@
+# admission.py - Bounded admission queue in front of inference
+import math
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot be admitted; retry_after is a hint in whole seconds"""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(f"Inference queue {reason}, retry after {retry_after}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Caps concurrent inference at `max_in_flight`. Up to `max_queue` further callers wait,
+    each for at most `queue_timeout_ms`; anyone beyond that is rejected immediately, so a
+    burst fails fast instead of stretching every request's latency.
+
+    Waiting is FIFO. Queue wait and service time are tracked separately and the mean
+    service time drives the Retry-After estimate.
+    """
+
+    def __init__(self, max_in_flight, max_queue, queue_timeout_ms, on_wait=None):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout_ms / 1000.0
+        self.on_wait = on_wait  # called with the queue wait in seconds of every admitted request
+        self._in_flight = 0
+        self._waiters = []  # FIFO of waiting tickets
+        self._cond = threading.Condition()
+        self._counters = Counter()
+        self._service_ewma = None
+
+    @contextmanager
+    def admit(self):
+        """Hold an inference slot for the duration of the block, or raise AdmissionRejected"""
+        wait = self._acquire()
+        if self.on_wait is not None:
+            self.on_wait(wait)
+        start = time.perf_counter()
+        try:
+            yield wait
+        finally:
+            self._release(time.perf_counter() - start)
+
+    def saturated(self):
+        """True when a new caller would be rejected without waiting"""
+        with self._cond:
+            return len(self._waiters) >= self.max_queue
+
+    def retry_after(self):
+        """Seconds until the current backlog should have drained (at least 1)"""
+        with self._cond:
+            return self._retry_after()
+
+    def stats(self):
+        with self._cond:
+            counters = dict(self._counters)
+            return {
+                'enabled': True,
+                'max_in_flight': self.max_in_flight,
+                'max_queue': self.max_queue,
+                'queue_timeout_ms': self.queue_timeout * 1000.0,
+                'in_flight': self._in_flight,
+                'queued': len(self._waiters),
+                'mean_service_ms': (self._service_ewma or 0.0) * 1000.0,
+                **{name: counters.get(name, 0) for name in ('admitted', 'rejected_queue_full', 'rejected_timeout')},
+            }
+
+    def _acquire(self):
+        start = time.perf_counter()
+        with self._cond:
+            if self._in_flight < self.max_in_flight and not self._waiters:
+                self._in_flight += 1
+                self._counters['admitted'] += 1
+                return 0.0
+            if len(self._waiters) >= self.max_queue:
+                self._counters['rejected_queue_full'] += 1
+                raise AdmissionRejected('full', self._retry_after())
+
+            ticket = object()
+            self._waiters.append(ticket)
+            deadline = start + self.queue_timeout
+            try:
+                while self._waiters[0] is not ticket or self._in_flight >= self.max_in_flight:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        self._counters['rejected_timeout'] += 1
+                        raise AdmissionRejected('deadline exceeded', self._retry_after())
+                    self._cond.wait(remaining)
+            finally:
+                self._waiters.remove(ticket)
+                # The next waiter may now be at the head of the queue
+                self._cond.notify_all()
+            self._in_flight += 1
+            self._counters['admitted'] += 1
+        return time.perf_counter() - start
+
+    def _release(self, service_time):
+        with self._cond:
+            self._in_flight -= 1
+            self._service_ewma = service_time if self._service_ewma is None else (
+                0.9 * self._service_ewma + 0.1 * service_time
+            )
+            self._cond.notify_all()
+
+    def _retry_after(self):
+        backlog = len(self._waiters) + self._in_flight
+        drain = backlog * (self._service_ewma or 0.0) / max(1, self.max_in_flight)
+        return max(1, math.ceil(drain))
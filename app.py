@@ -1,36 +1,127 @@
 # app.py - Plant Disease Detection Backend (Fixed Issues)
 import os
 import io
+import argparse
+import functools
+import zipfile
+import random
 import json
 import re
-import sqlite3
-import requests
 import numpy as np
 import logging
-from datetime import datetime
-from flask import Flask, request, jsonify
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from contextlib import contextmanager
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 from flask_cors import CORS
 from PIL import Image
 from bs4 import BeautifulSoup
 import tensorflow as tf
-from tensorflow.keras.layers import Dense, GlobalAveragePooling2D, Input, Conv2D, MaxPooling2D, Flatten, Dropout
-from tensorflow.keras.models import Model, Sequential
-from tensorflow.keras.optimizers import Adam
 from urllib.parse import urlparse
-import wikipediaapi
+from admission import AdmissionController, AdmissionRejected
+from rate_limit import ClientRateLimiter
+from inference import BatchScheduler, compile_forward, warm_up
+from preprocessing import ImagePreprocessor, ImageTooLargeError
+from prediction_cache import PredictionCache
+from knowledge_cache import KnowledgeCache
+from disease_index import DiseaseIndex, display_key
+from event_log import PredictionEventLog
+from archive import UploadArchiver
+from knowledge_snapshot import build_snapshot, load_snapshot, save_snapshot
+from storage import get_store
+from pipeline import EnrichmentPipeline
+from http_transport import HttpTransport
+from mediawiki import MediaWikiClient
+from metrics import MetricsRegistry, StackSampler
+from log_pipeline import parse_sample_rates, set_request_id, setup_logging
+from mapped_weights import MappedModel, MappedWeights, export_weights
+from models import CLASS_NAMES, build_model
+from quantization import QUANTIZATION_MODES, TFLiteRunner, convert_model, find_images, representative_dataset
 
 # --- Configuration ---
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 UPLOAD_FOLDER = os.path.join(BASE_DIR, 'uploads')
-DATABASE = os.path.join(BASE_DIR, 'plant_disease.db')
-MODEL_PATH = os.path.join(BASE_DIR, 'plant_disease_model.h5')
+DATABASE = os.environ.get('DATABASE', os.path.join(BASE_DIR, 'plant_disease.db'))
+MODEL_PATH = os.environ.get('MODEL_PATH', os.path.join(BASE_DIR, 'plant_disease_model.h5'))
+TFLITE_MODEL_PATH = os.environ.get('TFLITE_MODEL_PATH', os.path.join(BASE_DIR, 'plant_disease_model.tflite'))
+MAPPED_WEIGHTS_PATH = os.environ.get('MAPPED_WEIGHTS_PATH', os.path.join(BASE_DIR, 'plant_disease_model.bin'))  # + .json manifest
+MAPPED_WEIGHTS_VERIFY = os.environ.get('MAPPED_WEIGHTS_VERIFY', 'False').lower() == 'true'  # sha256 on every load
 CACHE_EXPIRY_HOURS = 24
+TREATMENT_MEMORY_ENTRIES = 512  # In-memory treatment cache entries (LRU); the rest stay in SQLite
+WIKI_CACHE_TTL_HOURS = 24 * 7
+WIKI_CACHE_STALE_HOURS = 24 * 30  # Serve stale pages this long past TTL while refreshing in the background
+PREFETCH_WORKERS = 8
+HTTP_POOL_SIZE = 16
+HTTP_MAX_RETRIES = 2
+HTTP_BACKOFF_SECONDS = 0.3
+HTTP_PER_HOST_LIMIT = 8
 REQUEST_TIMEOUT = 8
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
+MAX_IMAGE_PIXELS = int(os.environ.get('MAX_IMAGE_PIXELS', 40_000_000))  # Declared dimensions, checked before decoding
+MAX_DECODE_BYTES = int(os.environ.get('MAX_DECODE_MB', 64)) * 1024 * 1024  # Decode memory per image after draft scaling
+MAX_BATCH_UPLOAD_SIZE = int(os.environ.get('MAX_BATCH_UPLOAD_MB', 100)) * 1024 * 1024  # Whole /predict/batch request
+MAX_BATCH_FILES = int(os.environ.get('MAX_BATCH_FILES', 64))
+MAX_BATCH_UNCOMPRESSED = int(os.environ.get('MAX_BATCH_UNCOMPRESSED_MB', 256)) * 1024 * 1024  # Images after unzipping
+BATCH_IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.gif', '.webp')
+TILED_MAX_TILES = int(os.environ.get('TILED_MAX_TILES', 16))  # Tiles per /predict?mode=tiled upload, run as one batch
+TILED_OVERLAP = float(os.environ.get('TILED_OVERLAP', 0.25))  # Minimum overlap between neighbouring tiles
+INFERENCE_TIMEOUT = 30
 
 # Environment variables
 DEBUG = os.environ.get('FLASK_DEBUG', 'True').lower() == 'true'
 PORT = int(os.environ.get('PORT', 5000))
+KNOWLEDGE_SNAPSHOT = os.environ.get('KNOWLEDGE_SNAPSHOT', os.path.join(BASE_DIR, 'knowledge_snapshot.json'))
+PIPELINE_WORKERS = int(os.environ.get('PIPELINE_WORKERS', 8))
+PIPELINE_DEADLINE_MS = float(os.environ.get('PIPELINE_DEADLINE_MS', 2500))  # Enrichment budget per /predict request
+PIPELINE_TOP_K = int(os.environ.get('PIPELINE_TOP_K', 3))
+WIKI_API_URL = os.environ.get('WIKI_API_URL', 'https://en.wikipedia.org/w/api.php')  # Point at a stand-in server for offline benchmarks
+OFFLINE_MODE = os.environ.get('OFFLINE_MODE', 'False').lower() == 'true'  # Serve knowledge only from the snapshot
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))  # Fraction of requests run under the stack sampler
+PROFILE_SLOW_MS = float(os.environ.get('PROFILE_SLOW_MS', 1000))  # Only sampled requests slower than this are written out
+PROFILE_DIR = os.environ.get('PROFILE_DIR', os.path.join(BASE_DIR, 'profiles'))
+MODEL_BACKBONE = os.environ.get('MODEL_BACKBONE', 'simple_cnn')  # see models.BACKBONES
+INFERENCE_BACKEND = os.environ.get('INFERENCE_BACKEND', 'compiled').lower()  # keras, compiled, xla, mmap or tflite
+BATCHING_ENABLED = os.environ.get('BATCHING_ENABLED', 'True').lower() == 'true'
+BATCH_MAX_SIZE = int(os.environ.get('BATCH_MAX_SIZE', 16))
+BATCH_MAX_WAIT_MS = float(os.environ.get('BATCH_MAX_WAIT_MS', 5))
+TFLITE_MAX_INTERPRETERS = int(os.environ.get('TFLITE_MAX_INTERPRETERS', 4))  # Each keeps a batch size allocated
+PREDICTION_CACHE_ENABLED = os.environ.get('PREDICTION_CACHE_ENABLED', 'True').lower() == 'true'
+PREDICTION_CACHE_SIZE = int(os.environ.get('PREDICTION_CACHE_SIZE', 1024))
+PREDICTION_CACHE_DISTANCE = int(os.environ.get('PREDICTION_CACHE_DISTANCE', 0))  # Near-duplicate bits, 0: exact only
+PREDICTION_CACHE_DB = os.environ.get('PREDICTION_CACHE_DB', '')  # SQLite path for the persistent tier, empty to disable
+TF_INTRA_OP_THREADS = int(os.environ.get('TF_INTRA_OP_THREADS', 0))  # 0 keeps TensorFlow's default (all cores); serve.py sets it per worker
+TF_INTER_OP_THREADS = int(os.environ.get('TF_INTER_OP_THREADS', 0))
+ADMISSION_ENABLED = os.environ.get('ADMISSION_ENABLED', 'True').lower() == 'true'
+ADMISSION_MAX_IN_FLIGHT = int(os.environ.get('ADMISSION_MAX_IN_FLIGHT', 0))  # 0: BATCH_MAX_SIZE with batching, else the CPU count
+ADMISSION_MAX_QUEUE = int(os.environ.get('ADMISSION_MAX_QUEUE', 32))
+ADMISSION_QUEUE_TIMEOUT_MS = float(os.environ.get('ADMISSION_QUEUE_TIMEOUT_MS', 1000))  # Longest wait for an inference slot
+RATE_LIMIT_PER_MINUTE = float(os.environ.get('RATE_LIMIT_PER_MINUTE', 0))  # Per-client token bucket, 0 to disable
+RATE_LIMIT_BURST = int(os.environ.get('RATE_LIMIT_BURST', 10))
+CLIENT_ID_HEADER = os.environ.get('CLIENT_ID_HEADER', '')  # e.g. X-Forwarded-For behind a proxy; empty uses the peer address
+RATE_LIMITED_ENDPOINTS = ('predict', 'predict_batch', 'disease_info')
+PREDICTION_LOG_ENABLED = os.environ.get('PREDICTION_LOG_ENABLED', 'True').lower() == 'true'
+PREDICTION_LOG_DB = os.environ.get('PREDICTION_LOG_DB', os.path.join(BASE_DIR, 'plantdoc.db'))
+PREDICTION_LOG_BATCH = int(os.environ.get('PREDICTION_LOG_BATCH', 256))
+PREDICTION_LOG_FLUSH_MS = float(os.environ.get('PREDICTION_LOG_FLUSH_MS', 500))
+ARCHIVE_ENABLED = os.environ.get('ARCHIVE_ENABLED', 'True').lower() == 'true'  # Keep uploads for retraining
+ARCHIVE_DIR = os.environ.get('ARCHIVE_DIR', os.path.join(BASE_DIR, 'archive'))  # Not under uploads/, classify.py input
+ARCHIVE_THUMBNAILS = os.environ.get('ARCHIVE_THUMBNAILS', 'True').lower() == 'true'
+ARCHIVE_FSYNC = os.environ.get('ARCHIVE_FSYNC', 'True').lower() == 'true'
+ARCHIVE_QUEUE_BYTES = int(os.environ.get('ARCHIVE_QUEUE_MB', 64)) * 1024 * 1024  # Uploads beyond this are not archived
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'DEBUG' if DEBUG else 'INFO').upper()
+LOG_FILE = os.environ.get('LOG_FILE', os.path.join(BASE_DIR, 'app.log'))  # JSON lines, empty to log to stderr only
+LOG_JSON = os.environ.get('LOG_JSON', 'True').lower() == 'true'
+LOG_MAX_BYTES = int(os.environ.get('LOG_MAX_MB', 10)) * 1024 * 1024  # Rotated by the background log writer
+LOG_BACKUPS = int(os.environ.get('LOG_BACKUPS', 5))
+LOG_SAMPLE_RATES = parse_sample_rates(os.environ.get('LOG_SAMPLE_RATES', 'DEBUG=0.1'))  # Fraction kept per level
+LOG_RATE_LIMITED = tuple(filter(None, os.environ.get(
+    'LOG_RATE_LIMITED', 'Processing image,Using cached data,Predicted:'
+).split(',')))  # Hot message prefixes, each limited to LOG_RATE_PER_SECOND
+LOG_RATE_PER_SECOND = float(os.environ.get('LOG_RATE_PER_SECOND', 5))
+LOG_RATE_BURST = int(os.environ.get('LOG_RATE_BURST', 20))
 
 # --- Flask App Setup ---
 app = Flask(__name__)
@@ -40,123 +131,348 @@ app.config['MAX_CONTENT_LENGTH'] = MAX_FILE_SIZE
 # CORS Configuration
 CORS(app)
 
-# Configure logging (fixed Unicode issues)
-logging.basicConfig(
-    level=logging.INFO if not DEBUG else logging.DEBUG,
-    format='%(asctime)s %(levelname)s %(name)s %(message)s',
-    handlers=[
-        logging.FileHandler(os.path.join(BASE_DIR, 'app.log'), encoding='utf-8'),
-        logging.StreamHandler()
-    ]
+# Configure logging: request threads only enqueue; a background listener formats, writes and rotates
+log_handler = setup_logging(
+    level=LOG_LEVEL,
+    log_path=LOG_FILE or None,
+    json_lines=LOG_JSON,
+    max_bytes=LOG_MAX_BYTES,
+    backup_count=LOG_BACKUPS,
+    sample_rates=LOG_SAMPLE_RATES,
+    rate_limited=LOG_RATE_LIMITED,
+    rate=LOG_RATE_PER_SECOND,
+    burst=LOG_RATE_BURST
 )
 logger = logging.getLogger(__name__)
+access_logger = logging.getLogger('access')
+
+# Stage timers feed /metrics histograms and the Server-Timing response header
+metrics = MetricsRegistry()
 
 # TensorFlow configuration
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
 os.environ['TF_ENABLE_ONEDNN_OPTS'] = '0'
 
-# Disease classes
-CLASS_NAMES = [
-    "Apple Scab", "Apple Black Rot", "Apple Cedar Rust", "Apple Healthy",
-    "Blueberry Healthy", "Cherry Healthy", "Cherry Powdery Mildew",
-    "Corn Gray Leaf Spot", "Corn Common Rust", "Corn Healthy",
-    "Corn Northern Leaf Blight", "Grape Black Rot", "Grape Esca",
-    "Grape Healthy", "Grape Leaf Blight", "Orange Haunglongbing",
-    "Peach Bacterial Spot", "Peach Healthy", "Pepper Bacterial Spot",
-    "Pepper Healthy", "Potato Early Blight", "Potato Healthy",
-    "Potato Late Blight", "Raspberry Healthy", "Soybean Healthy",
-    "Squash Powdery Mildew", "Strawberry Healthy", "Strawberry Leaf Scorch",
-    "Tomato Bacterial Spot", "Tomato Early Blight", "Tomato Healthy",
-    "Tomato Late Blight", "Tomato Leaf Mold", "Tomato Septoria Leaf Spot",
-    "Tomato Spider Mites", "Tomato Target Spot", "Tomato Mosaic Virus",
-    "Tomato Yellow Leaf Curl Virus"
-]
-
-# --- Simple Model Setup (Avoids EfficientNet issues) ---
-def create_simple_model(num_classes, input_shape=(224, 224, 3)):
-    """Create a simple CNN model that works reliably"""
-    logger.info("Creating simple CNN model")
-    
-    model = Sequential([
-        Conv2D(32, (3, 3), activation='relu', input_shape=input_shape),
-        MaxPooling2D(2, 2),
-        Conv2D(64, (3, 3), activation='relu'),
-        MaxPooling2D(2, 2),
-        Conv2D(128, (3, 3), activation='relu'),
-        MaxPooling2D(2, 2),
-        Flatten(),
-        Dense(512, activation='relu'),
-        Dropout(0.5),
-        Dense(num_classes, activation='softmax')
-    ])
-    
-    model.compile(
-        optimizer=Adam(learning_rate=0.001),
-        loss='categorical_crossentropy',
-        metrics=['accuracy']
-    )
-    
-    return model
+# Size TensorFlow's thread pools before the first op runs, so preforked workers do not oversubscribe cores
+try:
+    if TF_INTRA_OP_THREADS:
+        tf.config.threading.set_intra_op_parallelism_threads(TF_INTRA_OP_THREADS)
+    if TF_INTER_OP_THREADS:
+        tf.config.threading.set_inter_op_parallelism_threads(TF_INTER_OP_THREADS)
+except RuntimeError as e:
+    logger.warning(f"Could not configure TensorFlow threading: {e}")
 
-# Initialize model
+# --- Model Setup (backbones are registered in models.py) ---
+model_load_start = time.perf_counter()
 try:
-    model = create_simple_model(len(CLASS_NAMES))
-    logger.info("Model built successfully")
-    
-    # Try to load weights if they exist and are compatible
-    if os.path.exists(MODEL_PATH):
+    model = None
+    if INFERENCE_BACKEND == 'mmap':
+        # Dense weights stay in the shared page cache instead of each worker's heap
         try:
-            model.load_weights(MODEL_PATH)
-            logger.info("Pre-trained model weights loaded successfully")
+            model = MappedModel(
+                build_model(MODEL_BACKBONE, len(CLASS_NAMES), include_head=False)[0],
+                MappedWeights(MAPPED_WEIGHTS_PATH, source_path=MODEL_PATH, verify=MAPPED_WEIGHTS_VERIFY)
+            )
+            logger.info(f"Model mapped from {MAPPED_WEIGHTS_PATH}")
         except Exception as e:
-            logger.warning(f"Could not load pre-trained weights: {e}")
-            logger.info("Using model with random initialization")
-    else:
-        logger.info("No pre-trained model found. Using model with random initialization")
+            logger.warning(f"Could not map exported weights ({e}); run 'python app.py export-weights' first")
+
+    if model is None:
+        # Weights come only from the local MODEL_PATH; missing or incompatible weights leave a random initialization
+        model, _ = build_model(MODEL_BACKBONE, len(CLASS_NAMES), weights_path=MODEL_PATH)
+        logger.info(f"Model built successfully ({MODEL_BACKBONE})")
         
 except Exception as e:
     logger.error(f"Model creation failed: {e}")
     # Create a dummy model that always returns the first class
     model = None
+model_load_ms = (time.perf_counter() - model_load_start) * 1000.0
+
+def keras_predict(batch):
+    """Run a forward pass through Model.predict (reference path)"""
+    return model.predict(batch, verbose=0)
+
+def build_inference_fn(backend):
+    """Select the forward-pass implementation used for inference. Returns (fn, backend)"""
+    if backend == 'keras':
+        return keras_predict, 'keras'
+    if backend == 'mmap':
+        if isinstance(model, MappedModel):
+            warm_up(model.predict, model.input_shape[1:], (1, BATCH_MAX_SIZE if BATCHING_ENABLED else 1))
+            logger.info("Using mmap inference backend")
+            return model.predict, 'mmap'
+        backend = 'compiled'
+    if backend == 'tflite':
+        try:
+            runner = TFLiteRunner(TFLITE_MODEL_PATH, TF_INTRA_OP_THREADS or None, TFLITE_MAX_INTERPRETERS)
+            warm_up(runner, runner.input_shape[1:], (1, BATCH_MAX_SIZE if BATCHING_ENABLED else 1))
+            logger.info(f"Using tflite inference backend ({os.path.basename(TFLITE_MODEL_PATH)})")
+            return runner, 'tflite'
+        except Exception as e:
+            logger.warning(f"Could not load {TFLITE_MODEL_PATH} ({e}); run 'python app.py convert-tflite' first")
+        backend = 'compiled'
+    if backend in ('compiled', 'xla'):
+        try:
+            forward = compile_forward(model, jit_compile=(backend == 'xla'))
+            warm_up(forward, model.input_shape[1:], (1, BATCH_MAX_SIZE if BATCHING_ENABLED else 1))
+            logger.info(f"Using {backend} inference backend")
+            return forward, backend
+        except Exception as e:
+            logger.warning(f"Could not build {backend} inference backend: {e}")
+    else:
+        logger.warning(f"Unknown inference backend '{backend}'")
+    logger.info("Falling back to Keras predict")
+    return keras_predict, 'keras'
+
+run_model, inference_backend = build_inference_fn(INFERENCE_BACKEND) if model is not None else (None, None)
+
+# Concurrent requests share forward passes through the batch scheduler
+batch_scheduler = None
+if model is not None and BATCHING_ENABLED:
+    batch_scheduler = BatchScheduler(metrics.timed('model_forward')(run_model), BATCH_MAX_SIZE, BATCH_MAX_WAIT_MS)
+
+# Bounded admission in front of inference: bursts beyond the queue fail fast with 503 instead of piling up
+admission = None
+if ADMISSION_ENABLED:
+    admission = AdmissionController(
+        ADMISSION_MAX_IN_FLIGHT or (BATCH_MAX_SIZE if batch_scheduler is not None else os.cpu_count() or 1),
+        ADMISSION_MAX_QUEUE,
+        ADMISSION_QUEUE_TIMEOUT_MS,
+        on_wait=lambda seconds: metrics.record('queue_wait', seconds)
+    )
+rate_limiter = ClientRateLimiter(RATE_LIMIT_PER_MINUTE / 60.0, RATE_LIMIT_BURST) if RATE_LIMIT_PER_MINUTE > 0 else None
+
+@contextmanager
+def inference_slot():
+    """Hold an admission slot while decoding and running the model (raises AdmissionRejected)"""
+    if admission is None:
+        yield
+        return
+    with admission.admit(), metrics.timer('inference_service'):
+        yield
 
 # --- Image Processing ---
+# PIL's own decompression-bomb guard covers any decode path that bypasses the preprocessor
+Image.MAX_IMAGE_PIXELS = MAX_IMAGE_PIXELS
+decode_memory = metrics.histogram(
+    'plantdoc_decode_bytes', 'Estimated memory to decode an accepted image',
+    buckets=(2 ** 18, 2 ** 20, 2 ** 21, 2 ** 22, 2 ** 23, 2 ** 24, 2 ** 25, 2 ** 26, 2 ** 27)
+)
+preprocessor = ImagePreprocessor(
+    (224, 224), max_pixels=MAX_IMAGE_PIXELS, max_decode_bytes=MAX_DECODE_BYTES, observer=decode_memory.observe
+)
+
 def preprocess_image(image_bytes):
-    """Preprocess image for model prediction"""
+    """Preprocess image for model prediction (returns a reused per-thread float32 buffer)"""
     try:
-        image = Image.open(io.BytesIO(image_bytes)).convert('RGB')
-        image = image.resize((224, 224))
-        image_array = np.array(image) / 255.0
-        return np.expand_dims(image_array, axis=0)
+        return preprocessor.preprocess(image_bytes)
     except Exception as e:
         logger.error(f"Image preprocessing failed: {e}")
         raise ValueError(f"Invalid image format: {e}")
 
-def predict_disease(image_bytes):
+def predict_disease(image_bytes, cache_key=None):
     """
-    Run model prediction on image bytes.
-    Returns: {'label': str, 'confidence': float, 'probs': list}
+    Run model prediction on image bytes. Given the prediction cache key of an exact miss, the
+    decoded image is checked for near duplicates before the model runs.
+    Returns: ({'label': str, 'confidence': float, 'probs': list}, cache_key)
     """
     try:
         if model is None:
-            return create_demo_prediction()
+            return create_demo_prediction(), cache_key
             
-        image = preprocess_image(image_bytes)
-        preds = model.predict(image, verbose=0)[0]
-        idx = int(np.argmax(preds))
-        confidence = float(preds[idx])
-        
-        # If confidence is too low (untrained model), simulate reasonable confidence
-        if confidence < 0.1:
-            confidence = 0.7 + (np.random.random() * 0.2)
-        
-        return {
-            'label': CLASS_NAMES[idx], 
-            'confidence': confidence, 
-            'probs': preds.tolist()
-        }
+        with metrics.timer('decode'):
+            image = preprocess_image(image_bytes)
+        if cache_key is not None:
+            with metrics.timer('prediction_cache'):
+                near, cache_key = prediction_cache.lookup_near(cache_key, image[0])
+            if near is not None:
+                return near, cache_key
+        with metrics.timer('model'):
+            preds = run_batch(image)[0]
+        return prediction_from_probs(preds), cache_key
     except Exception as e:
         logger.error(f"Prediction failed: {e}")
+        return create_demo_prediction(), cache_key
+
+def run_batch(batch):
+    """Forward pass for a preprocessed (n, H, W, C) batch, shared with concurrent requests when batching"""
+    if batch_scheduler is not None:
+        return batch_scheduler.predict(batch, timeout=INFERENCE_TIMEOUT)
+    return run_model(batch)
+
+def prediction_from_probs(preds):
+    """Build the prediction dict for one row of class probabilities"""
+    idx = int(np.argmax(preds))
+    confidence = float(preds[idx])
+    
+    # If confidence is too low (untrained model), simulate reasonable confidence
+    if confidence < 0.1:
+        confidence = 0.7 + (np.random.random() * 0.2)
+    
+    return {
+        'label': CLASS_NAMES[idx], 
+        'confidence': confidence, 
+        'probs': preds.tolist()
+    }
+
+# Repeat uploads (including recompressed copies) skip inference entirely
+prediction_cache = None
+if PREDICTION_CACHE_ENABLED:
+    prediction_cache = PredictionCache(PREDICTION_CACHE_SIZE, PREDICTION_CACHE_DISTANCE, PREDICTION_CACHE_DB or None)
+
+def classify_image(image_bytes):
+    """Predict the disease for an upload, reusing a cached result for repeat uploads"""
+    prediction, cache_key = None, None
+    if prediction_cache is not None:
+        with metrics.timer('prediction_cache'):
+            prediction, cache_key = prediction_cache.lookup(image_bytes)
+    if prediction is None:
+        with inference_slot():
+            prediction, cache_key = predict_disease(image_bytes, cache_key)
+        if cache_key is not None and not prediction.get('is_demo') and 'cache_hit' not in prediction:
+            prediction_cache.store(cache_key, prediction)
+    return prediction
+
+def classify_images(images):
+    """
+    Batch counterpart of classify_image. Cache hits are answered directly; the remaining images
+    are decoded together, checked for near duplicates, and share forward passes. Images that
+    cannot be decoded get {'error': ...}.
+    """
+    results, keys, misses = [None] * len(images), [None] * len(images), []
+    for i, image_bytes in enumerate(images):
+        if prediction_cache is not None:
+            with metrics.timer('prediction_cache'):
+                results[i], keys[i] = prediction_cache.lookup(image_bytes)
+        if results[i] is None:
+            misses.append(i)
+    if not misses:
+        return results
+    if model is None:
+        for i in misses:
+            results[i] = create_demo_prediction()
+        return results
+
+    try:
+        with inference_slot():
+            with metrics.timer('decode'):
+                batch, errors = preprocessor.preprocess_batch([images[i] for i in misses])
+            for n, error in errors.items():
+                results[misses[n]] = {'error': f"Invalid image format: {error}"}
+            valid = []
+            for n in range(len(misses)):
+                if n in errors:
+                    continue
+                i = misses[n]
+                if keys[i] is not None:
+                    with metrics.timer('prediction_cache'):
+                        results[i], keys[i] = prediction_cache.lookup_near(keys[i], batch[n])
+                if results[i] is None:
+                    valid.append(n)
+            if not valid:
+                return results
+            try:
+                with metrics.timer('model'):
+                    preds = run_batch(batch if len(valid) == len(misses) else batch[valid])
+            except Exception as e:
+                logger.error(f"Batch prediction failed: {e}")
+                for n in valid:
+                    results[misses[n]] = create_demo_prediction()
+                return results
+    except AdmissionRejected as e:
+        for i in misses:
+            results[i] = {'error': 'Server busy', 'retry_after': e.retry_after}
+        return results
+    for row, n in zip(preds, valid):
+        i = misses[n]
+        results[i] = prediction_from_probs(row)
+        if keys[i] is not None:
+            prediction_cache.store(keys[i], results[i])
+    return results
+
+# Field photos with several leaves are cut into overlapping tiles that share one forward pass
+tiles_per_request = metrics.histogram(
+    'plantdoc_tiles_per_request', 'Tiles cut from each tiled /predict upload', buckets=(1, 2, 4, 8, 16, 32, 64)
+)
+HEALTHY_CLASSES = np.array(['Healthy' in name for name in CLASS_NAMES])
+
+def aggregate_tiles(preds, grid, boxes):
+    """
+    Overall prediction from the mean of the per-tile probabilities, plus a 'tiles' breakdown:
+    each tile's top label and confidence and a heatmap of its probability of any disease class
+    """
+    rows, cols = grid
+    preds = np.asarray(preds, dtype=np.float64)
+    prediction = prediction_from_probs(preds.mean(axis=0))
+    disease = 1.0 - preds[:, HEALTHY_CLASSES].sum(axis=1)
+    prediction['tiles'] = {
+        'rows': rows,
+        'cols': cols,
+        'boxes': boxes,
+        'labels': np.asarray(CLASS_NAMES)[preds.argmax(axis=1)].reshape(rows, cols).tolist(),
+        'confidence': preds.max(axis=1).round(4).reshape(rows, cols).tolist(),
+        'heatmap': disease.clip(0.0, 1.0).round(4).reshape(rows, cols).tolist(),
+    }
+    return prediction
+
+def classify_tiled(upload):
+    """
+    Tiled counterpart of classify_image: up to TILED_MAX_TILES tiles are decoded from one pass
+    over the image and classified as a single batch. Results are not cached.
+    """
+    if model is None:
         return create_demo_prediction()
+    with inference_slot():
+        try:
+            with metrics.timer('decode'):
+                batch, grid, boxes = preprocessor.tiles(upload, TILED_OVERLAP, TILED_MAX_TILES)
+            tiles_per_request.observe(len(batch))
+            with metrics.timer('model'):
+                preds = run_batch(batch)
+        except Exception as e:
+            logger.error(f"Tiled prediction failed: {e}")
+            return create_demo_prediction()
+    return aggregate_tiles(preds, grid, boxes)
+
+# Prediction history for outbreak monitoring, written behind the request path
+event_log = None
+if PREDICTION_LOG_ENABLED:
+    try:
+        event_log = PredictionEventLog(PREDICTION_LOG_DB, PREDICTION_LOG_BATCH, PREDICTION_LOG_FLUSH_MS)
+    except Exception as e:
+        logger.error(f"Prediction event log unavailable: {e}")
+
+# Uploads are archived by content hash in the background; thumbnails are what the model sees
+archiver = None
+if ARCHIVE_ENABLED:
+    try:
+        archiver = UploadArchiver(
+            ARCHIVE_DIR, PREDICTION_LOG_DB,
+            thumbnailer=ImagePreprocessor(
+                (224, 224), max_pixels=MAX_IMAGE_PIXELS, max_decode_bytes=MAX_DECODE_BYTES
+            ).load if ARCHIVE_THUMBNAILS else None,
+            max_queue_bytes=ARCHIVE_QUEUE_BYTES,
+            fsync=ARCHIVE_FSYNC
+        )
+    except Exception as e:
+        logger.error(f"Upload archive unavailable: {e}")
+
+def archive_upload(upload, prediction, source):
+    """Queue an upload (bytes or the request's stream) for the archive; skipped when the queue is full"""
+    if archiver is None or prediction.get('is_demo'):
+        return
+    if isinstance(upload, (bytes, bytearray)):
+        archiver.submit(upload, prediction, source)
+        return
+    size = upload.seek(0, os.SEEK_END)
+    if archiver.has_room(size):
+        upload.seek(0)
+        archiver.submit(upload.read(), prediction, source)
+
+def log_prediction(prediction, source):
+    """Queue a prediction for the event log (demo predictions are not recorded)"""
+    if event_log is not None and not prediction.get('is_demo'):
+        event_log.record(prediction['label'], prediction['confidence'], source, prediction.get('cache_hit') or 'miss')
 
 def create_demo_prediction():
     """Create a demo prediction for testing purposes"""
@@ -181,88 +497,107 @@ def create_demo_prediction():
         'is_demo': True
     }
 
+# --- Shared HTTP Transport ---
+http_transport = HttpTransport(
+    pool_size=HTTP_POOL_SIZE,
+    max_retries=HTTP_MAX_RETRIES,
+    backoff=HTTP_BACKOFF_SECONDS,
+    per_host_limit=HTTP_PER_HOST_LIMIT,
+    timeout=REQUEST_TIMEOUT,
+    headers={'User-Agent': 'AgrisenseBot/1.0 (contact: example@example.com)'}
+)
+
 # --- Wikipedia Integration (Fixed) ---
 class WikipediaHelper:
-    def __init__(self):
-        self.wiki = wikipediaapi.Wikipedia(
-            language='en', 
-            user_agent='AgrisenseBot/1.0 (contact: example@example.com)',
-            extract_format=wikipediaapi.ExtractFormat.WIKI
+    def __init__(self, transport, api_url=WIKI_API_URL, cache_db=None, offline=False):
+        self.offline = offline
+        # Search and page fetches share the pooled transport
+        self.wiki = MediaWikiClient(transport, api_url)
+        # Page info barely changes, so serve it from cache and refresh in the background
+        self.cache = KnowledgeCache(
+            self.fetch_page_info,
+            ttl=WIKI_CACHE_TTL_HOURS * 3600,
+            stale=WIKI_CACHE_STALE_HOURS * 3600,
+            db_path=cache_db,
+            namespace='wikipedia'
         )
+        if offline:
+            # Snapshot entries never expire and nothing is fetched over the network
+            self.cache.ttl = float('inf')
     
     def search_pages(self, query, results=5):
         """Custom search implementation since wikipedia-api search might not work"""
         try:
-            # Use Wikipedia API directly for search
-            search_url = "https://en.wikipedia.org/w/api.php"
-            params = {
-                'action': 'query',
-                'list': 'search',
-                'srsearch': query,
-                'format': 'json',
-                'srlimit': results
-            }
-            response = requests.get(search_url, params=params, timeout=REQUEST_TIMEOUT)
-            data = response.json()
-            
-            pages = []
-            if 'query' in data and 'search' in data['query']:
-                for result in data['query']['search']:
-                    pages.append(result['title'])
-            return pages
+            return self._search(query, results)
         except Exception as e:
             logger.error(f"Wikipedia search failed: {e}")
             return []
 
+    @metrics.timed('wikipedia_search')
+    def _search(self, query, results):
+        # Use Wikipedia API directly for search
+        return self.wiki.search(query, results)
+
+    @metrics.timed('wikipedia')
     def get_page_info(self, disease_name):
-        """Get Wikipedia page information"""
+        """Get Wikipedia page information (cached, treat the result as read-only)"""
         try:
-            # Try exact page first
-            page = self.wiki.page(disease_name)
-            
-            if not page.exists():
-                # Search for similar pages
-                search_results = self.search_pages(disease_name, 3)
-                for result in search_results:
-                    potential_page = self.wiki.page(result)
-                    if potential_page.exists():
-                        page = potential_page
-                        break
-
-            if not page or not page.exists():
-                return {
-                    'title': disease_name, 
-                    'summary': '', 
-                    'sections': {}, 
-                    'page_url': '', 
-                    'source_domain': '',
-                    'exists': False
-                }
-
-            summary = (page.summary or '').strip()
-            if summary and len(summary) > 1200:
-                summary = summary[:1200] + '...'
-
-            sections = self._collect_sections(page)
-            
-            return {
-                'title': page.title,
-                'summary': summary,
-                'sections': sections,
-                'page_url': page.fullurl,
-                'source_domain': 'en.wikipedia.org',
-                'exists': True
-            }
+            return self.cache.get(disease_name)
+        except LookupError:
+            return self._missing_page(disease_name)
         except Exception as e:
             logger.error(f"Wikipedia API error for '{disease_name}': {e}")
-            return {
-                'title': disease_name, 
-                'summary': '', 
-                'sections': {}, 
-                'page_url': '', 
-                'source_domain': '',
-                'exists': False
-            }
+            return self._missing_page(disease_name)
+
+    @metrics.timed('wikipedia')
+    def cached_page_info(self, disease_name):
+        """get_page_info's result when it is cached (fresh or stale), else None (no network call)"""
+        return self.cache.peek(disease_name)
+
+    @metrics.timed('wikipedia_fetch')
+    def fetch_page_info(self, disease_name):
+        """Fetch page information from Wikipedia; network errors propagate so they are not cached"""
+        if self.offline:
+            raise LookupError(f"'{disease_name}' is not in the knowledge snapshot (offline mode)")
+        # Try exact page first
+        page = self.wiki.page(disease_name)
+        
+        if page is None:
+            # Search for similar pages
+            search_results = self._search(disease_name, 3)
+            for result in search_results:
+                page = self.wiki.page(result)
+                if page is not None:
+                    break
+
+        if page is None:
+            return self._missing_page(disease_name)
+
+        summary = (page.summary or '').strip()
+        if summary and len(summary) > 1200:
+            summary = summary[:1200] + '...'
+
+        sections = self._collect_sections(page)
+        
+        return {
+            'title': page.title,
+            'summary': summary,
+            'sections': sections,
+            'page_url': page.fullurl,
+            'source_domain': urlparse(page.fullurl).netloc or 'en.wikipedia.org',
+            'exists': True
+        }
+
+    @staticmethod
+    def _missing_page(disease_name):
+        return {
+            'title': disease_name, 
+            'summary': '', 
+            'sections': {}, 
+            'page_url': '', 
+            'source_domain': '',
+            'exists': False
+        }
 
     def _collect_sections(self, page, want_titles=None, max_length=1200):
         """Collect relevant sections from Wikipedia page"""
@@ -288,52 +623,58 @@ class WikipediaHelper:
         return found
 
 # Initialize Wikipedia helper
-wiki_helper = WikipediaHelper()
+wiki_helper = WikipediaHelper(http_transport, cache_db=DATABASE, offline=OFFLINE_MODE)
 
 # --- Web Scraper with Caching (Fixed Database Schema) ---
+def _create_disease_cache(conn):
+    """Schema v1: replace a pre-migration table only if its columns are wrong"""
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(disease_cache)")]
+    if columns and columns != ['disease', 'treatments', 'sources', 'timestamp']:
+        conn.execute("DROP TABLE disease_cache")
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS disease_cache (
+            disease TEXT PRIMARY KEY,
+            treatments TEXT,
+            sources TEXT,
+            timestamp DATETIME
+        )
+    ''')
+
+# Append new schema versions here; applied migrations are never re-run
+DISEASE_CACHE_MIGRATIONS = [
+    _create_disease_cache,
+]
+
+CACHE_SELECT_SQL = "SELECT treatments, sources, timestamp FROM disease_cache WHERE disease=? AND timestamp > ?"
+CACHE_INSERT_SQL = "INSERT OR REPLACE INTO disease_cache (disease, treatments, sources, timestamp) VALUES (?, ?, ?, ?)"
+
 class WebScraper:
     HEADERS = {
         'User-Agent': 'Mozilla/5.0 (compatible; AgrisenseBot/1.0)',
         'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
     }
+    store = get_store(DATABASE)
+    # Bounded in-memory L1 (LRU) in front of SQLite: disease -> (result, cached_at epoch seconds)
+    _memory = OrderedDict()
+    _memory_lock = threading.Lock()
 
     @staticmethod
     def initialize_database():
-        """Initialize database with correct schema"""
+        """Initialize database schema, migrating existing tables instead of dropping them"""
         try:
-            conn = sqlite3.connect(DATABASE)
-            cursor = conn.cursor()
-            
-            # Drop existing table if it has wrong schema
-            cursor.execute("DROP TABLE IF EXISTS disease_cache")
-            
-            # Create table with correct schema
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS disease_cache (
-                    disease TEXT PRIMARY KEY,
-                    treatments TEXT,
-                    sources TEXT,
-                    timestamp DATETIME
-                )
-            ''')
-            conn.commit()
-            conn.close()
-            logger.info("Database schema initialized successfully")
+            version = WebScraper.store.migrate('disease_cache', DISEASE_CACHE_MIGRATIONS)
+            logger.info(f"Database schema initialized successfully (disease_cache v{version})")
         except Exception as e:
             logger.error(f"Database initialization failed: {e}")
 
     @staticmethod
+    @metrics.timed('treatments')
     def scrape_disease_info(disease_name):
         """Scrape disease treatment information"""
         try:
-            cached = WebScraper._check_cache(disease_name)
+            cached = WebScraper.cached_disease_info(disease_name)
             if cached:
-                logger.info(f"Using cached data for: {disease_name}")
-                return {
-                    'treatments': cached['treatments'], 
-                    'sources': cached.get('sources', []), 
-                    'from_cache': True
-                }
+                return cached
 
             # For now, use default treatments (you can add real scraping later)
             treatments = WebScraper._get_default_treatments(disease_name)
@@ -406,21 +747,35 @@ class WebScraper:
         ])
 
     @staticmethod
+    def cached_disease_info(disease_name):
+        """scrape_disease_info's result when it is cached, else None (no scraping)"""
+        cached = WebScraper._check_cache(disease_name)
+        if not cached:
+            return None
+        logger.info(f"Using cached data for: {disease_name}")
+        return {
+            'treatments': cached['treatments'], 
+            'sources': cached.get('sources', []), 
+            'from_cache': True
+        }
+
+    @staticmethod
+    @metrics.timed('sqlite_cache')
     def _check_cache(disease_name):
-        """Check for cached results"""
+        """Check for cached results (memory first, then SQLite)"""
+        expiry = CACHE_EXPIRY_HOURS * 3600
+        entry = WebScraper._memory_get(disease_name)
+        if entry is not None and time.time() - entry[1] < expiry:
+            return entry[0]
         try:
-            conn = sqlite3.connect(DATABASE)
-            cursor = conn.cursor()
-            cursor.execute(
-                "SELECT treatments, sources, timestamp FROM disease_cache WHERE disease=? AND timestamp > datetime('now', ?)",
-                (disease_name, f"-{CACHE_EXPIRY_HOURS} hours")
-            )
-            row = cursor.fetchone()
-            conn.close()
+            cutoff = (datetime.now() - timedelta(hours=CACHE_EXPIRY_HOURS)).isoformat()
+            row = WebScraper.store.query_one(CACHE_SELECT_SQL, (disease_name, cutoff))
             if row:
                 treatments = json.loads(row[0])
                 sources = json.loads(row[1]) if row[1] else []
-                return {'treatments': treatments, 'sources': sources}
+                result = {'treatments': treatments, 'sources': sources}
+                WebScraper._memory_put(disease_name, (result, datetime.fromisoformat(row[2]).timestamp()))
+                return result
         except Exception as e:
             logger.error(f"Cache check error: {e}")
         return None
@@ -428,44 +783,129 @@ class WebScraper:
     @staticmethod
     def _cache_results(disease_name, treatments, sources):
         """Cache results to database"""
+        WebScraper.cache_many([(disease_name, treatments, sources)])
+
+    @staticmethod
+    def cache_many(items):
+        """Cache (disease_name, treatments, sources) tuples in a single transaction"""
+        now = datetime.now()
+        rows = [
+            (disease_name, json.dumps(treatments), json.dumps(sources), now.isoformat())
+            for disease_name, treatments, sources in items
+        ]
         try:
-            conn = sqlite3.connect(DATABASE)
-            cursor = conn.cursor()
-            cursor.execute(
-                "INSERT OR REPLACE INTO disease_cache (disease, treatments, sources, timestamp) VALUES (?, ?, ?, ?)",
-                (disease_name, json.dumps(treatments), json.dumps(sources), datetime.now().isoformat())
-            )
-            conn.commit()
-            conn.close()
-            logger.info(f"Cached results for: {disease_name}")
+            WebScraper.store.execute_many(CACHE_INSERT_SQL, rows)
+            for disease_name, treatments, sources in items:
+                entry = ({'treatments': treatments, 'sources': sources}, now.timestamp())
+                WebScraper._memory_put(disease_name, entry)
+            logger.info(f"Cached results for: {', '.join(item[0] for item in items)}")
         except Exception as e:
             logger.error(f"Caching failed: {e}")
 
+    @staticmethod
+    def _memory_get(disease_name):
+        with WebScraper._memory_lock:
+            entry = WebScraper._memory.get(disease_name)
+            if entry is not None:
+                WebScraper._memory.move_to_end(disease_name)
+            return entry
+
+    @staticmethod
+    def _memory_put(disease_name, entry):
+        with WebScraper._memory_lock:
+            WebScraper._memory[disease_name] = entry
+            WebScraper._memory.move_to_end(disease_name)
+            while len(WebScraper._memory) > TREATMENT_MEMORY_ENTRIES:
+                WebScraper._memory.popitem(last=False)
+
 # Initialize database
 WebScraper.initialize_database()
 
 # --- Treatment Agent ---
 class TreatmentAgent:
+    # Materialized plans: disease -> plan; rebuilt when the treatments, sources or Wikipedia page change
+    _plans = {}
+    _plans_lock = threading.Lock()
+    _plan_counters = {'hits': 0, 'builds': 0}
+
     @staticmethod
-    def generate_summary_and_plan(disease_name, treatments_list, sources_list, confidence):
+    def generate_summary_and_plan(disease_name, treatments_list, sources_list, confidence, wiki_info=None):
         """Generate comprehensive treatment plan"""
-        wiki_info = wiki_helper.get_page_info(disease_name)
-        
-        # Build summary
-        confidence_percent = confidence * 100
-        summary_parts = [
-            f"{disease_name} detected with {confidence_percent:.1f}% confidence.",
-            wiki_info.get('summary', "Using expert guidance and agricultural best practices.")
-        ]
-        
+        if wiki_info is None:
+            wiki_info = wiki_helper.get_page_info(disease_name)
+        plan = TreatmentAgent.materialize(disease_name, treatments_list, sources_list, wiki_info)
+        return {
+            **plan['fields'],
+            "summary": TreatmentAgent.summarize(plan, disease_name, confidence),
+            "generated_at": datetime.now().isoformat(),
+            "confidence": confidence
+        }
+
+    @staticmethod
+    def materialize(disease_name, treatments_list, sources_list, wiki_info, sections=None, store=True):
+        """
+        Confidence-independent plan for a class, built on first use and reused until its inputs
+        change. 'fields' are the response fields (treat as read-only), 'fragment' is the same
+        fields pre-serialized as JSON object members, and 'summary_tail' follows the confidence line.
+        `sections` are derive_sections() output computed ahead of time (e.g. stored in a snapshot).
+        With store=False (inputs from deadline fallbacks) the plan is built but not cached, so it
+        does not replace the materialized plan for the real inputs.
+        """
+        inputs = (treatments_list, sources_list, wiki_info)
+        with TreatmentAgent._plans_lock:
+            plan = TreatmentAgent._plans.get(disease_name)
+            # Cached knowledge comes back as the same objects, so this is usually an identity check
+            if plan is not None and all(a is b or a == b for a, b in zip(plan['inputs'], inputs)):
+                TreatmentAgent._plan_counters['hits'] += 1
+                return plan
+
+        summary_parts = [wiki_info.get('summary', "Using expert guidance and agricultural best practices.")]
         if treatments_list:
             summary_parts.append("Key recommendations include:")
             for treatment in treatments_list[:2]:
                 shortened = TreatmentAgent._shorten_text(treatment, 100)
                 summary_parts.append(f"• {shortened}")
-        
-        summary = " ".join(summary_parts)
-        
+
+        if sections is None:
+            sections = TreatmentAgent.derive_sections(disease_name, treatments_list, wiki_info)
+        fields = {
+            "description": sections['description'],
+            "recommendations": sections['immediate_steps'] + sections['seven_day_plan'],
+            "sources": sources_list,
+            "generated_by_agent": {
+                "immediate_steps": sections['immediate_steps'],
+                "seven_day_plan": sections['seven_day_plan'],
+                "prevention": sections['prevention']
+            },
+            "wikipedia_page": wiki_info.get('page_url', ''),
+            "wikipedia_title": wiki_info.get('title', '')
+        }
+        plan = {
+            'inputs': inputs,
+            'fields': fields,
+            'fragment': json.dumps(fields)[1:-1],
+            'summary_tail': " ".join(summary_parts)
+        }
+        with TreatmentAgent._plans_lock:
+            if store:
+                TreatmentAgent._plans[disease_name] = plan
+            TreatmentAgent._plan_counters['builds'] += 1
+        return plan
+
+    @staticmethod
+    def summarize(plan, disease_name, confidence):
+        """Splice the per-request confidence into a materialized plan's summary"""
+        summary = f"{disease_name} detected with {confidence * 100:.1f}% confidence. {plan['summary_tail']}"
+        return TreatmentAgent._shorten_text(summary, 800)
+
+    @staticmethod
+    def plan_stats():
+        with TreatmentAgent._plans_lock:
+            return {'entries': len(TreatmentAgent._plans), **TreatmentAgent._plan_counters}
+
+    @staticmethod
+    def derive_sections(disease_name, treatments_list, wiki_info):
+        """Confidence-independent parts of the plan: description and categorized steps"""
         # Build description
         description = TreatmentAgent._build_description(wiki_info, disease_name)
         
@@ -480,22 +920,11 @@ class TreatmentAgent:
         if not prevention:
             prevention = ["Water properly", "Maintain good spacing", "Practice sanitation"]
         
-        recommendations = immediate + short_term
-        
         return {
-            "summary": TreatmentAgent._shorten_text(summary, 800),
             "description": TreatmentAgent._shorten_text(description, 1200),
-            "recommendations": recommendations,
-            "sources": sources_list,
-            "generated_by_agent": {
-                "immediate_steps": immediate,
-                "seven_day_plan": short_term,
-                "prevention": prevention
-            },
-            "generated_at": datetime.now().isoformat(),
-            "wikipedia_page": wiki_info.get('page_url', ''),
-            "wikipedia_title": wiki_info.get('title', ''),
-            "confidence": confidence
+            "immediate_steps": immediate,
+            "seven_day_plan": short_term,
+            "prevention": prevention
         }
 
     @staticmethod
@@ -535,7 +964,190 @@ class TreatmentAgent:
             return text or ""
         return text[:max_length].rsplit(' ', 1)[0] + '...'
 
+# --- Knowledge Snapshot ---
+def collect_disease_knowledge(disease_name):
+    """Gather everything /predict needs for one disease class"""
+    wiki_info = wiki_helper.fetch_page_info(disease_name)
+    scraped_info = WebScraper.scrape_disease_info(disease_name)
+    treatments = scraped_info.get('treatments', [])
+    return {
+        'wikipedia': wiki_info,
+        'treatments': treatments,
+        'sources': scraped_info.get('sources', []),
+        'plan': TreatmentAgent.derive_sections(disease_name, treatments, wiki_info)
+    }
+
+def prefetch_knowledge(output_path=KNOWLEDGE_SNAPSHOT, max_workers=PREFETCH_WORKERS):
+    """Prefetch knowledge for every class and write it to a snapshot file"""
+    snapshot = build_snapshot(CLASS_NAMES, collect_disease_knowledge, max_workers)
+    save_snapshot(snapshot, output_path)
+    return snapshot
+
+def apply_snapshot(snapshot):
+    """Prime the Wikipedia and treatment caches and the treatment plans from a loaded snapshot"""
+    fetched_at = snapshot.get('created_ts')
+    entries = snapshot.get('entries', {})
+    for disease_name, entry in entries.items():
+        wiki_helper.cache.put(disease_name, entry['wikipedia'], fetched_at=fetched_at, persist=False)
+    WebScraper.cache_many([
+        (disease_name, entry['treatments'], entry['sources']) for disease_name, entry in entries.items()
+    ])
+    for disease_name, entry in entries.items():
+        # Plan sections were derived when the snapshot was built
+        TreatmentAgent.materialize(
+            disease_name, entry['treatments'], entry['sources'], entry['wikipedia'], entry.get('plan')
+        )
+    logger.info(f"Knowledge snapshot {snapshot.get('fingerprint', '')[:12]} applied")
+
+# --- Disease Name Resolution ---
+# Free-text names resolve locally to a class, so variants share cache entries and skip Wikipedia search
+disease_index = DiseaseIndex(CLASS_NAMES)
+
+def resolve_disease_name(disease_name):
+    """Returns (cache key, resolution or None); unresolved names are keyed by their normalized display form"""
+    resolution = disease_index.resolve(disease_name)
+    if resolution is not None:
+        return resolution['name'], resolution
+    return display_key(disease_name), None
+
+# --- Request Pipeline ---
+enrichment_pipeline = EnrichmentPipeline(
+    classify=classify_image,
+    fetch_treatments=WebScraper.scrape_disease_info,
+    fetch_wiki=wiki_helper.get_page_info,
+    fallback_treatments=lambda label: {
+        'treatments': WebScraper._get_default_treatments(label), 'sources': [], 'from_cache': False
+    },
+    fallback_wiki=WikipediaHelper._missing_page,
+    max_workers=PIPELINE_WORKERS,
+    deadline_ms=PIPELINE_DEADLINE_MS,
+    top_k=PIPELINE_TOP_K,
+    treatments_cached=WebScraper.cached_disease_info,
+    wiki_cached=wiki_helper.cached_page_info
+)
+
+# --- Instrumentation ---
+metrics.gauge(
+    'plantdoc_inference_queue_depth', 'Requests waiting for a batched forward pass',
+    lambda: batch_scheduler.stats()['queue_depth'] if batch_scheduler is not None else 0
+)
+metrics.gauge(
+    'plantdoc_inference_batches_total', 'Batched forward passes run',
+    lambda: batch_scheduler.stats()['batches'] if batch_scheduler is not None else 0, metric_type='counter'
+)
+metrics.gauge(
+    'plantdoc_prediction_cache_lookups_total', 'Prediction cache lookups by outcome',
+    lambda: {(outcome,): prediction_cache.stats()[outcome] for outcome in ('hits_exact', 'hits_near', 'hits_db', 'misses')}
+    if prediction_cache is not None else {},
+    labelnames=('outcome',), metric_type='counter'
+)
+metrics.gauge(
+    'plantdoc_wikipedia_cache_lookups_total', 'Wikipedia cache lookups by outcome',
+    lambda: {(outcome,): wiki_helper.cache.stats()[outcome] for outcome in ('hits', 'db_hits', 'stale_hits', 'misses', 'coalesced')},
+    labelnames=('outcome',), metric_type='counter'
+)
+metrics.gauge(
+    'plantdoc_admission_in_flight', 'Requests holding an inference slot',
+    lambda: admission.stats()['in_flight'] if admission is not None else 0
+)
+metrics.gauge(
+    'plantdoc_admission_queued', 'Requests waiting for an inference slot',
+    lambda: admission.stats()['queued'] if admission is not None else 0
+)
+metrics.gauge(
+    'plantdoc_admission_rejections_total', 'Requests shed by admission control or the per-client rate limit',
+    lambda: {
+        **({(reason,): admission.stats()[f'rejected_{reason}'] for reason in ('queue_full', 'timeout')}
+           if admission is not None else {}),
+        **({('rate_limited',): rate_limiter.stats()['limited']} if rate_limiter is not None else {}),
+    },
+    labelnames=('reason',), metric_type='counter'
+)
+metrics.gauge(
+    'plantdoc_decode_budget_bytes', 'Per-image decode memory cap', lambda: MAX_DECODE_BYTES
+)
+metrics.gauge(
+    'plantdoc_decode_rejections_total', 'Images rejected by the dimension or decode memory limits',
+    lambda: preprocessor.rejected, metric_type='counter'
+)
+
+@app.before_request
+def start_request_instrumentation():
+    g.timings = metrics.begin_request()
+    g.request_id = request.headers.get('X-Request-ID', '')[:64] or uuid.uuid4().hex[:16]
+    set_request_id(g.request_id)
+    g.sampler = None
+    if PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE:
+        g.sampler = StackSampler(threading.get_ident()).start()
+
+def busy_response(message, retry_after, status=503):
+    response = jsonify({'error': message, 'retry_after': retry_after})
+    response.status_code = status
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+def knowledge_cached(disease_name):
+    """True when /disease_info can be answered without any network fetch"""
+    return wiki_helper.cache.contains(disease_name) and WebScraper._check_cache(disease_name) is not None
+
+@app.before_request
+def enforce_rate_limit():
+    """Per-client token bucket for expensive endpoints; /health, /metrics and cached /disease_info skip it"""
+    if rate_limiter is None or request.endpoint not in RATE_LIMITED_ENDPOINTS:
+        return None
+    if request.endpoint == 'disease_info' and knowledge_cached(resolve_disease_name(request.view_args['disease_name'])[0]):
+        return None
+    client = request.headers.get(CLIENT_ID_HEADER, '').split(',')[0].strip() if CLIENT_ID_HEADER else ''
+    allowed, retry_after = rate_limiter.allow(client or request.remote_addr or 'unknown')
+    if not allowed:
+        return busy_response('Rate limit exceeded', retry_after, 429)
+    return None
+
+@app.after_request
+def finish_request_instrumentation(response):
+    timings = metrics.end_request(request.endpoint or 'unknown', response.status_code)
+    if timings is not None:
+        response.headers['Server-Timing'] = timings.server_timing()
+        access_logger.info(
+            f"{request.method} {request.path} {response.status_code}",
+            extra={
+                'endpoint': request.endpoint,
+                'status': response.status_code,
+                'duration_ms': round((time.perf_counter() - timings.start) * 1000.0, 2),
+                'stage_timings': {stage: round(seconds * 1000.0, 2) for stage, seconds in timings.totals().items()}
+            }
+        )
+    response.headers['X-Request-ID'] = g.get('request_id', '')
+    sampler = g.get('sampler')
+    if sampler is not None:
+        sampler.stop()
+        elapsed_ms = (time.perf_counter() - timings.start) * 1000.0 if timings is not None else 0.0
+        if elapsed_ms >= PROFILE_SLOW_MS:
+            write_profile(sampler, request.endpoint or 'unknown', elapsed_ms)
+    return response
+
+@app.teardown_request
+def clear_request_id(exc):
+    # Pooled server threads must not stamp later, unrelated log records with this request's ID
+    set_request_id(None)
+
+def write_profile(sampler, endpoint, elapsed_ms):
+    """Save a slow request's folded stacks for flamegraph tooling"""
+    try:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        path = os.path.join(PROFILE_DIR, f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}-{endpoint}-{elapsed_ms:.0f}ms.folded")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(sampler.folded())
+        logger.info(f"Slow request profile written to {path}")
+    except Exception as e:
+        logger.error(f"Could not write request profile: {e}")
+
 # --- Flask Routes ---
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus-style metrics"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
@@ -543,9 +1155,51 @@ def health_check():
         'status': 'healthy',
         'timestamp': datetime.now().isoformat(),
         'model_ready': model is not None,
+        'inference_backend': inference_backend,
+        'model_backbone': MODEL_BACKBONE,
+        'model_load_ms': round(model_load_ms, 1),
+        'worker_pid': os.getpid(),
+        'tf_threads': {
+            'intra_op': tf.config.threading.get_intra_op_parallelism_threads(),
+            'inter_op': tf.config.threading.get_inter_op_parallelism_threads()
+        },
         'debug_mode': DEBUG
     })
 
+@app.route('/stats', methods=['GET'])
+def stats():
+    """Runtime statistics for the inference path"""
+    return jsonify({
+        'inference': batch_scheduler.stats() if batch_scheduler is not None else {'enabled': False},
+        'prediction_cache': prediction_cache.stats() if prediction_cache is not None else {'enabled': False},
+        'wikipedia_cache': wiki_helper.cache.stats(),
+        'treatment_plans': TreatmentAgent.plan_stats(),
+        'disease_index': disease_index.stats(),
+        'prediction_log': event_log.stats() if event_log is not None else {'enabled': False},
+        'upload_archive': archiver.stats() if archiver is not None else {'enabled': False},
+        'logging': log_handler.stats() if log_handler is not None else {'enabled': False},
+        'admission': admission.stats() if admission is not None else {'enabled': False},
+        'rate_limit': rate_limiter.stats() if rate_limiter is not None else {'enabled': False},
+        'timestamp': datetime.now().isoformat()
+    })
+
+def render_prediction(prediction, plan, alternatives, partial, **extra):
+    """
+    JSON text of a /predict or /predict/batch result: the class's pre-serialized plan fragment
+    followed by the per-request fields (and any extra ones)
+    """
+    fields = {
+        'disease': prediction['label'],
+        'confidence': prediction['confidence'],
+        'summary': TreatmentAgent.summarize(plan, prediction['label'], prediction['confidence']),
+        'timestamp': datetime.now().isoformat(),
+        'prediction_cached': prediction.get('cache_hit', False),
+        'alternatives': alternatives,
+        'partial': partial,
+        **extra
+    }
+    return '{' + plan['fragment'] + ', ' + json.dumps(fields)[1:-1] + '}'
+
 @app.route('/predict', methods=['POST'])
 def predict():
     """Main prediction endpoint"""
@@ -555,61 +1209,262 @@ def predict():
     file = request.files['file']
     if file.filename == '':
         return jsonify({'error': 'No file selected'}), 400
+    tiled = (request.form.get('mode') or request.args.get('mode', '')).lower() == 'tiled'
+    source = 'predict_tiled' if tiled else 'predict'
     
     try:
-        image_bytes = file.read()
-        if len(image_bytes) == 0:
+        # The spooled upload stream is hashed and decoded in place instead of being read into a bytes copy
+        upload = file.stream
+        with metrics.timer('upload_read'):
+            size = upload.seek(0, os.SEEK_END)
+            upload.seek(0)
+        if size == 0:
             return jsonify({'error': 'Empty file content'}), 400
         
-        logger.info(f"Processing image: {file.filename}")
+        # Reject oversized images from their header before any pixel data is decoded
+        try:
+            with metrics.timer('image_header'):
+                header = preprocessor.inspect(upload)
+            logger.info(f"Processing image: {file.filename} ({header['format']} {header['width']}x{header['height']})")
+        except ImageTooLargeError as e:
+            logger.warning(f"Rejected {file.filename}: {e}")
+            return jsonify({'error': 'Image too large', 'details': str(e)}), 413
+        except Exception as e:
+            logger.info(f"Processing image: {file.filename} (unreadable header: {e})")
         
-        # Make prediction
-        prediction = predict_disease(image_bytes)
+        # Make prediction while treatment and Wikipedia lookups run concurrently
+        prediction, scraped_info, wiki_info, alternatives, partial, timings = enrichment_pipeline.run(
+            upload, CLASS_NAMES, classify_tiled if tiled else None
+        )
         disease_label = prediction['label']
         confidence = prediction['confidence']
         
         logger.info(f"Predicted: {disease_label} ({confidence:.1%})")
+        log_prediction(prediction, source)
+        archive_upload(upload, prediction, source)
         
-        # Get treatment information
-        scraped_info = WebScraper.scrape_disease_info(disease_label)
         treatments = scraped_info.get('treatments', [])
         sources = scraped_info.get('sources', [])
         
-        # Generate treatment plan
-        treatment_plan = TreatmentAgent.generate_summary_and_plan(
-            disease_label, treatments, sources, confidence
-        )
+        # Treatment plan (materialized once per class and knowledge version, never from fallbacks)
+        with timings.stage('agent'), metrics.timer('agent'):
+            plan = TreatmentAgent.materialize(disease_label, treatments, sources, wiki_info, store=not partial)
         
         # Prepare response
-        response = {
-            'disease': disease_label,
-            'confidence': confidence,
-            'description': treatment_plan.get('description'),
-            'summary': treatment_plan.get('summary'),
-            'recommendations': treatment_plan.get('recommendations'),
-            'sources': treatment_plan.get('sources'),
-            'generated_by_agent': treatment_plan.get('generated_by_agent'),
-            'wikipedia_title': treatment_plan.get('wikipedia_title'),
-            'wikipedia_page': treatment_plan.get('wikipedia_page'),
-            'timestamp': datetime.now().isoformat(),
-            'cache_used': scraped_info.get('from_cache', False)
-        }
-        
-        return jsonify(response)
+        body = render_prediction(
+            prediction, plan, alternatives, partial,
+            cache_used=scraped_info.get('from_cache', False), stage_timings=timings.as_dict(),
+            **({'tiles': prediction.get('tiles')} if tiled else {})
+        )
+        return Response(body, mimetype='application/json')
         
+    except AdmissionRejected as e:
+        logger.warning(f"Shed {file.filename}: {e}")
+        return busy_response('Server busy', e.retry_after)
     except Exception as e:
         logger.error(f"Prediction error: {e}")
         return jsonify({'error': 'Prediction failed', 'details': str(e)}), 500
 
+def read_batch_uploads(files):
+    """
+    Index uploaded files (zip archives included) without reading any image data. Returns
+    (items, handles, total_bytes): items are (filename, load, error) where load() returns the
+    image bytes, handles are the upload streams and ZipFiles to close once the response has
+    streamed, and total_bytes is the declared uncompressed size of every readable image.
+    """
+    items, handles, total = [], [], 0
+    for file in files:
+        # Detach the stream: Flask closes request.files when the view returns, before the body streams
+        stream, file.stream = file.stream, io.BytesIO()
+        handles.append(stream)
+        size = stream.seek(0, os.SEEK_END)
+        stream.seek(0)
+        magic = stream.read(4)
+        stream.seek(0)
+        if file.filename.lower().endswith('.zip') or magic == b'PK\x03\x04':
+            try:
+                # Entry sizes come from the central directory; nothing is decompressed here
+                archive = zipfile.ZipFile(stream)
+            except zipfile.BadZipFile as e:
+                items.append((file.filename, None, f"Invalid zip archive: {e}"))
+                continue
+            handles.append(archive)
+            for info in archive.infolist():
+                if info.is_dir() or not info.filename.lower().endswith(BATCH_IMAGE_EXTENSIONS):
+                    continue
+                if info.file_size > MAX_FILE_SIZE:
+                    items.append((info.filename, None, 'File too large'))
+                else:
+                    total += info.file_size
+                    items.append((info.filename, functools.partial(archive.read, info), None))
+        elif size == 0:
+            items.append((file.filename, None, 'Empty file content'))
+        elif size > MAX_FILE_SIZE:
+            items.append((file.filename, None, 'File too large'))
+        else:
+            total += size
+            items.append((file.filename, stream.read, None))
+    return items, handles, total
+
+def close_uploads(handles):
+    for handle in reversed(handles):
+        handle.close()
+
+@app.route('/predict/batch', methods=['POST'])
+def predict_batch():
+    """
+    Classify many images in one request (multipart 'files' and/or zip archives) and stream one
+    NDJSON line per image as soon as its result is ready, then a final summary line. Images are
+    read (and unzipped) one chunk at a time while the response streams.
+    """
+    request.max_content_length = MAX_BATCH_UPLOAD_SIZE
+    files = request.files.getlist('files') + request.files.getlist('file')
+    if not files:
+        return jsonify({'error': 'No files uploaded'}), 400
+    with metrics.timer('upload_read'):
+        items, handles, total_bytes = read_batch_uploads(files)
+    if len(items) > MAX_BATCH_FILES:
+        close_uploads(handles)
+        return jsonify({'error': f'Too many images ({len(items)} > {MAX_BATCH_FILES})'}), 413
+    if total_bytes > MAX_BATCH_UNCOMPRESSED:
+        close_uploads(handles)
+        limit_mb = MAX_BATCH_UNCOMPRESSED / 2**20
+        return jsonify({'error': f'Batch too large ({total_bytes / 2**20:.0f}MB > {limit_mb:.0f}MB uncompressed)'}), 413
+    if admission is not None and admission.saturated():
+        close_uploads(handles)
+        return busy_response('Server busy', admission.retry_after())
+    logger.info(f"Processing batch of {len(items)} images")
+
+    def generate():
+        start = time.perf_counter()
+        enrichments, pending, errors = {}, [], 0
+        chunk_size = BATCH_MAX_SIZE if BATCHING_ENABLED else 16
+
+        def emit(index, name, prediction):
+            try:
+                enrichment = enrichments[prediction['label']]
+                scraped_info, wiki_info, partial = enrichment.result()
+                with metrics.timer('agent'):
+                    plan = TreatmentAgent.materialize(
+                        prediction['label'], scraped_info.get('treatments', []), scraped_info.get('sources', []),
+                        wiki_info, store=not partial
+                    )
+                return render_prediction(
+                    prediction, plan, enrichment_pipeline.alternatives(prediction, CLASS_NAMES), partial,
+                    index=index, filename=name, cache_used=scraped_info.get('from_cache', False)
+                ) + '\n'
+            except Exception as e:
+                logger.error(f"Batch prediction error for {name}: {e}")
+                line = {'index': index, 'filename': name, 'error': 'Prediction failed', 'details': str(e)}
+            return json.dumps(line) + '\n'
+
+        for offset in range(0, len(items), chunk_size):
+            readable = []
+            for n, (name, load, error) in enumerate(items[offset:offset + chunk_size]):
+                if error is None:
+                    try:
+                        with metrics.timer('upload_read'):
+                            data = load()  # zipfile stops inflating an entry at its declared size
+                    except Exception as e:
+                        error = f"Could not read upload: {e}"
+                if error is not None:
+                    errors += 1
+                    yield json.dumps({'index': offset + n, 'filename': name, 'error': error}) + '\n'
+                else:
+                    readable.append((offset + n, name, data))
+
+            predictions = classify_images([data for _, _, data in readable])
+            for (index, name, data), prediction in zip(readable, predictions):
+                if 'error' in prediction:
+                    errors += 1
+                    yield json.dumps({'index': index, 'filename': name, **prediction}) + '\n'
+                    continue
+                log_prediction(prediction, 'batch')
+                archive_upload(data, prediction, 'batch')
+                # One enrichment per distinct disease, shared by every image predicted as it
+                if prediction['label'] not in enrichments:
+                    enrichments[prediction['label']] = enrichment_pipeline.enrich(prediction['label'])
+                pending.append((index, name, prediction))
+
+            # Stream whatever is ready before decoding the next chunk
+            waiting = []
+            for entry in pending:
+                if enrichments[entry[2]['label']].done():
+                    yield emit(*entry)
+                else:
+                    waiting.append(entry)
+            pending = waiting
+
+        for entry in pending:
+            yield emit(*entry)
+        yield json.dumps({'summary': {
+            'images': len(items),
+            'errors': errors,
+            'distinct_diseases': len(enrichments),
+            'elapsed_ms': round((time.perf_counter() - start) * 1000.0, 3)
+        }}) + '\n'
+
+    def stream():
+        try:
+            yield from generate()
+        finally:
+            close_uploads(handles)
+
+    return Response(stream_with_context(stream()), mimetype='application/x-ndjson')
+
+@app.route('/analytics/daily', methods=['GET'])
+def analytics_daily():
+    """Predictions per disease per day, from the rollup table"""
+    if event_log is None:
+        return jsonify({'error': 'Prediction log disabled'}), 404
+    days = min(max(request.args.get('days', 30, type=int), 1), 366)
+    disease = request.args.get('disease')
+    disease = resolve_disease_name(disease)[0] if disease else None
+    return jsonify({'days': days, 'disease': disease, 'counts': event_log.daily_counts(days, disease)})
+
+@app.route('/analytics/confidence', methods=['GET'])
+def analytics_confidence():
+    """Confidence distribution of predictions, overall or for one disease"""
+    if event_log is None:
+        return jsonify({'error': 'Prediction log disabled'}), 404
+    disease = request.args.get('disease')
+    disease = resolve_disease_name(disease)[0] if disease else None
+    return jsonify({'disease': disease, 'buckets': event_log.confidence_distribution(disease)})
+
+@app.route('/analytics/recent', methods=['GET'])
+def analytics_recent():
+    """Most recent predictions, optionally for one disease"""
+    if event_log is None:
+        return jsonify({'error': 'Prediction log disabled'}), 404
+    limit = min(max(request.args.get('limit', 50, type=int), 1), 1000)
+    disease = request.args.get('disease')
+    disease = resolve_disease_name(disease)[0] if disease else None
+    return jsonify({'disease': disease, 'events': event_log.recent(limit, disease)})
+
+@app.route('/archive/<digest>', methods=['GET'])
+def archived_upload(digest):
+    """Archived upload metadata (by SHA-256) and the predictions made for it"""
+    if archiver is None:
+        return jsonify({'error': 'Upload archive disabled'}), 404
+    entry = archiver.lookup(digest.lower())
+    if entry is None:
+        return jsonify({'error': 'Not archived'}), 404
+    return jsonify(entry)
+
 @app.route('/disease_info/<disease_name>', methods=['GET'])
 def disease_info(disease_name):
     """Get disease information"""
     try:
-        scraped_info = WebScraper.scrape_disease_info(disease_name)
-        wiki_info = wiki_helper.get_page_info(disease_name)
+        key, resolution = resolve_disease_name(disease_name)
+        if not key:
+            return jsonify({'error': 'Empty disease name'}), 400
+        scraped_info = WebScraper.scrape_disease_info(key)
+        wiki_info = wiki_helper.get_page_info(key)
         
         return jsonify({
-            'disease': disease_name,
+            'disease': key,
+            'query': disease_name,
+            'resolved': resolution,
             'wikipedia': wiki_info,
             'treatments': scraped_info.get('treatments', []),
             'sources': scraped_info.get('sources', []),
@@ -625,9 +1480,16 @@ def home():
         'message': 'Plant Disease Detection API',
         'version': '1.0',
         'endpoints': {
-            'POST /predict': 'Analyze plant disease from image',
+            'POST /predict': 'Analyze plant disease from image (mode=tiled for photos with several leaves)',
+            'POST /predict/batch': 'Analyze many images (multipart files or a zip), streamed as NDJSON',
             'GET /disease_info/<name>': 'Get information about specific disease',
-            'GET /health': 'API health check'
+            'GET /health': 'API health check',
+            'GET /stats': 'Inference, batching and cache statistics',
+            'GET /analytics/daily': 'Predictions per disease per day (?days=&disease=)',
+            'GET /analytics/confidence': 'Confidence distribution (?disease=)',
+            'GET /analytics/recent': 'Most recent predictions (?limit=&disease=)',
+            'GET /archive/<sha256>': 'Archived upload and the predictions made for it',
+            'GET /metrics': 'Prometheus-style stage and request metrics'
         }
     })
 
@@ -635,11 +1497,57 @@ def home():
 def initialize_application():
     """Initialize application components"""
     os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+    snapshot = load_snapshot(KNOWLEDGE_SNAPSHOT)
+    if snapshot is not None:
+        apply_snapshot(snapshot)
+    elif OFFLINE_MODE:
+        logger.warning("Offline mode without a knowledge snapshot: Wikipedia content will be empty")
     logger.info("Application initialization complete")
     logger.info(f"Server running on port {PORT}")
 
-if __name__ == '__main__':
+def main():
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description='Plant Disease Detection API')
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.add_parser('serve', help='Run the API server (default)')
+    prefetch_parser = subparsers.add_parser('prefetch', help='Build the offline knowledge snapshot')
+    prefetch_parser.add_argument('--output', default=KNOWLEDGE_SNAPSHOT)
+    prefetch_parser.add_argument('--workers', type=int, default=PREFETCH_WORKERS)
+    export_parser = subparsers.add_parser('export-weights', help='Export model weights for the mmap backend')
+    export_parser.add_argument('--output', default=MAPPED_WEIGHTS_PATH)
+    convert_parser = subparsers.add_parser('convert-tflite', help='Convert the model for the tflite backend')
+    convert_parser.add_argument('--mode', choices=QUANTIZATION_MODES, default='float16')
+    convert_parser.add_argument('--output', default=TFLITE_MODEL_PATH)
+    convert_parser.add_argument('--calibration-dir', nargs='+', default=[UPLOAD_FOLDER, BASE_DIR],
+                                help='Directories of leaf images used to calibrate int8 quantization')
+    convert_parser.add_argument('--samples', type=int, default=100)
+    args = parser.parse_args()
+
+    if args.command == 'convert-tflite':
+        if model is None or isinstance(model, MappedModel):
+            raise SystemExit("convert-tflite needs the Keras model; unset INFERENCE_BACKEND=mmap")
+        representative = None
+        if args.mode == 'int8':
+            representative = representative_dataset(find_images(args.calibration_dir), preprocessor, args.samples)
+        convert_model(model, args.output, args.mode, representative)
+        return
+
+    if args.command == 'export-weights':
+        if model is None or isinstance(model, MappedModel):
+            raise SystemExit("export-weights needs the Keras model; unset INFERENCE_BACKEND=mmap")
+        export_weights(model, args.output)
+        return
+
+    if args.command == 'prefetch':
+        snapshot = prefetch_knowledge(args.output, args.workers)
+        if snapshot['errors']:
+            logger.warning(f"{len(snapshot['errors'])} diseases could not be prefetched")
+        return
+
     initialize_application()
-    logger.info("Starting Flask server...")
+    logger.info("Starting Flask development server (use serve.py for multi-worker production serving)...")
     app.run(host='0.0.0.0', port=PORT, debug=DEBUG)
+
+if __name__ == '__main__':
+    main()
     
\ No newline at end of file
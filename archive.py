@@ -0,0 +1,282 @@
+# archive.py - Content-addressed upload archive written by a background thread
+import atexit
+import hashlib
+import io
+import logging
+import os
+import queue
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from PIL import Image
+
+from storage import get_store
+
+logger = logging.getLogger(__name__)
+
+EXTENSIONS = {'JPEG': '.jpg', 'PNG': '.png', 'WEBP': '.webp', 'GIF': '.gif', 'BMP': '.bmp', 'TIFF': '.tif'}
+
+ARCHIVE_MIGRATIONS = [
+    '''
+    CREATE TABLE IF NOT EXISTS archived_uploads (
+        digest TEXT PRIMARY KEY,
+        path TEXT,
+        thumbnail TEXT,
+        size INTEGER,
+        format TEXT,
+        width INTEGER,
+        height INTEGER,
+        first_seen REAL,
+        last_seen REAL,
+        upload_count INTEGER
+    );
+    CREATE TABLE IF NOT EXISTS archived_predictions (
+        digest TEXT,
+        ts REAL,
+        disease TEXT,
+        confidence REAL,
+        source TEXT
+    );
+    CREATE INDEX IF NOT EXISTS idx_archived_predictions_digest ON archived_predictions (digest);
+    CREATE INDEX IF NOT EXISTS idx_archived_predictions_disease ON archived_predictions (disease, ts)
+    ''',
+]
+
+UPLOAD_INSERT_SQL = '''
+    INSERT INTO archived_uploads
+        (digest, path, thumbnail, size, format, width, height, first_seen, last_seen, upload_count)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 1)
+    ON CONFLICT (digest) DO UPDATE SET last_seen = excluded.last_seen, upload_count = upload_count + 1
+'''
+PREDICTION_INSERT_SQL = '''
+    INSERT INTO archived_predictions (digest, ts, disease, confidence, source) VALUES (?, ?, ?, ?, ?)
+'''
+
+_STOP = object()
+
+
+def shard_path(root, digest, extension):
+    """root/ab/cd/abcd...ext: two levels of 256 directories keep every directory small"""
+    return os.path.join(root, digest[:2], digest[2:4], digest + extension)
+
+
+def _fsync_paths(paths):
+    for path in paths:
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+class UploadArchiver:
+    """
+    Retains uploaded images for retraining without disk I/O on the request path.
+
+    submit() does no disk I/O: it enqueues the bytes and the prediction, and drops
+    them (counted) when the queue is full or holds more than `max_queue_bytes`. A writer
+    thread hashes each image, stores new content once under root/ab/cd/<sha256>.<ext>
+    (optionally with a 224x224 JPEG thumbnail under root/thumbs/), and links every upload
+    to its prediction in SQLite. A batch's files are written first, then fsync'd together
+    (files and their directories), and only then are its rows committed.
+    """
+
+    def __init__(self, root, db_path, thumbnailer=None, batch_size=32, flush_interval_ms=1000,
+                 max_queue=256, max_queue_bytes=64 * 1024 * 1024, fsync=True, max_known=10000):
+        self.root = root
+        self.thumbnailer = thumbnailer  # callable(bytes) -> PIL image at thumbnail size, or None
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.max_queue_bytes = max_queue_bytes
+        self.fsync = fsync
+        self._store = get_store(db_path)
+        self._store.migrate('upload_archive', ARCHIVE_MIGRATIONS)
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._queued_bytes = 0
+        self.max_known = max_known
+        self._known = OrderedDict()  # recently archived digests (LRU); older ones fall back to os.path.exists
+        self._counters = Counter()
+        self._lock = threading.Lock()
+        self._writer = None
+        self._writer_pid = None
+
+    def has_room(self, size):
+        """Cheap pre-check so callers can skip copying an upload that would be dropped"""
+        with self._lock:
+            return not self._queue.full() and self._queued_bytes + size <= self.max_queue_bytes
+
+    def submit(self, data, prediction, source='predict'):
+        """Queue an upload and its prediction for archiving; returns False if it was dropped"""
+        self._ensure_writer()
+        with self._lock:
+            if self._queued_bytes + len(data) > self.max_queue_bytes:
+                self._counters['dropped'] += 1
+                return False
+            self._queued_bytes += len(data)
+        try:
+            self._queue.put_nowait((bytes(data), prediction['label'], prediction['confidence'], source, time.time()))
+            return True
+        except queue.Full:
+            with self._lock:
+                self._queued_bytes -= len(data)
+                self._counters['dropped'] += 1
+            return False
+
+    def flush(self, timeout=10.0):
+        """Wait until everything submitted so far is on disk"""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return not self._queue.unfinished_tasks
+
+    def close(self):
+        """Write out queued uploads and stop the writer (registered to run at exit)"""
+        if self._writer is not None and self._writer.is_alive():
+            try:
+                self._queue.put(_STOP, timeout=5.0)
+            except queue.Full:
+                return
+            self._writer.join(timeout=10.0)
+
+    def lookup(self, digest):
+        """Archived file metadata and every prediction made for it, or None"""
+        row = self._store.query_one(
+            'SELECT path, thumbnail, size, format, width, height, first_seen, last_seen, upload_count '
+            'FROM archived_uploads WHERE digest = ?', (digest,)
+        )
+        if row is None:
+            return None
+        predictions = self._store.query_all(
+            'SELECT ts, disease, confidence, source FROM archived_predictions WHERE digest = ? ORDER BY ts',
+            (digest,)
+        )
+        return {
+            'digest': digest,
+            'path': os.path.relpath(row[0], self.root),
+            'thumbnail': os.path.relpath(row[1], self.root) if row[1] else None,
+            'size': row[2], 'format': row[3], 'width': row[4], 'height': row[5],
+            'first_seen': row[6], 'last_seen': row[7], 'upload_count': row[8],
+            'predictions': [
+                {'timestamp': ts, 'disease': disease, 'confidence': confidence, 'source': source}
+                for ts, disease, confidence, source in predictions
+            ],
+        }
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+            queued_bytes = self._queued_bytes
+        return {
+            'enabled': True,
+            'queued': self._queue.qsize(),
+            'queued_bytes': queued_bytes,
+            **{name: counters.get(name, 0) for name in
+               ('archived', 'duplicates', 'thumbnails', 'batches', 'dropped', 'write_errors')},
+            'last_batch_ms': counters.get('last_batch_ms', 0.0),
+        }
+
+    def _ensure_writer(self):
+        # Started lazily, and again in a forked worker (threads do not survive fork)
+        if self._writer_pid == os.getpid():
+            return
+        with self._lock:
+            if self._writer_pid != os.getpid():
+                self._writer = threading.Thread(target=self._run, name='upload-archiver', daemon=True)
+                self._writer.start()
+                if self._writer_pid is None:
+                    atexit.register(self.close)
+                self._writer_pid = os.getpid()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                self._queue.task_done()
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            stop = False
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+            try:
+                self._write(batch)
+            except Exception as e:
+                self._count('write_errors')
+                logger.error(f"Could not archive {len(batch)} uploads: {e}")
+            finally:
+                with self._lock:
+                    self._queued_bytes -= sum(len(entry[0]) for entry in batch)
+                for _ in range(len(batch) + stop):
+                    self._queue.task_done()
+            if stop:
+                return
+
+    def _write(self, batch):
+        start = time.perf_counter()
+        uploads, links, written = [], [], []
+        for data, disease, confidence, source, ts in batch:
+            digest = hashlib.sha256(data).hexdigest()
+            links.append((digest, ts, disease, confidence, source))
+            if digest in self._known:
+                self._known.move_to_end(digest)
+                uploads.append((digest, None, None, len(data), None, None, None, ts, ts))
+                self._count('duplicates')
+                continue
+            try:
+                image = Image.open(io.BytesIO(data))  # Header only
+                image_format, width, height = image.format, image.width, image.height
+            except Exception:
+                image_format, width, height = None, None, None
+            path = shard_path(self.root, digest, EXTENSIONS.get(image_format, '.bin'))
+            thumbnail = None
+            if os.path.exists(path):
+                self._count('duplicates')
+            else:
+                written.append(self._write_file(path, data))
+                self._count('archived')
+                if self.thumbnailer is not None and image_format is not None:
+                    try:
+                        thumbnail = shard_path(os.path.join(self.root, 'thumbs'), digest, '.jpg')
+                        buffer = io.BytesIO()
+                        self.thumbnailer(data).save(buffer, 'JPEG', quality=90)
+                        written.append(self._write_file(thumbnail, buffer.getvalue()))
+                        self._count('thumbnails')
+                    except Exception as e:
+                        thumbnail = None
+                        logger.warning(f"Thumbnail failed for {digest[:12]}: {e}")
+            self._known[digest] = True
+            while len(self._known) > self.max_known:
+                self._known.popitem(last=False)
+            uploads.append((digest, path, thumbnail, len(data), image_format, width, height, ts, ts))
+
+        if self.fsync and written:
+            # One pass over the batch's files, then each touched directory, instead of fsync per write
+            _fsync_paths(written)
+            _fsync_paths(sorted({os.path.dirname(path) for path in written}))
+        with self._store.transaction() as conn:
+            conn.executemany(UPLOAD_INSERT_SQL, uploads)
+            conn.executemany(PREDICTION_INSERT_SQL, links)
+        with self._lock:
+            self._counters['batches'] += 1
+            self._counters['last_batch_ms'] = (time.perf_counter() - start) * 1000.0
+
+    @staticmethod
+    def _write_file(path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        return path
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
@@ -0,0 +1,57 @@
+# benchmarks - Reproducible performance measurements for the Plant Disease Detection backend
+import json
+import os
+import platform
+import subprocess
+from datetime import datetime
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(BASE_DIR, 'benchmarks', 'results')
+
+
+def summarize(samples_ms):
+    """Latency summary (ms) for a list of samples"""
+    samples = np.asarray(samples_ms, dtype=np.float64)
+    if samples.size == 0:
+        return {'count': 0}
+    return {
+        'count': int(samples.size),
+        'mean': float(samples.mean()),
+        'p50': float(np.percentile(samples, 50)),
+        'p95': float(np.percentile(samples, 95)),
+        'p99': float(np.percentile(samples, 99)),
+        'min': float(samples.min()),
+        'max': float(samples.max()),
+    }
+
+
+def git_revision():
+    """Short hash of the current commit, or '' outside a git checkout"""
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return ''
+
+
+def save_results(name, results, output=None):
+    """Write benchmark results as JSON, tagged with the commit and host they came from"""
+    payload = {
+        'benchmark': name,
+        'revision': git_revision(),
+        'host': platform.node(),
+        'cpu_count': os.cpu_count(),
+        'python': platform.python_version(),
+        'created_at': datetime.now().isoformat(),
+        'results': results,
+    }
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        output = os.path.join(RESULTS_DIR, f"{name}-{payload['revision'] or 'local'}-{stamp}.json")
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, indent=2)
+    return output
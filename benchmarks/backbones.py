@@ -0,0 +1,90 @@
+# benchmarks/backbones.py - Params, FLOPs, load time and per-batch latency of every registered backbone
+#
+# Each backbone is built, its (random) weights are saved to a scratch .weights.h5 file and loaded into a
+# fresh instance to time the cold-load path, then batches are run through the compiled forward pass.
+# Backbones whose batch-1 p99 fits --budget-ms are listed as candidates.
+#
+# Usage: python -m benchmarks.backbones [--backbones simple_cnn mobilenet_v2] [--batch-sizes 1 8] [--budget-ms 50]
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks import save_results, summarize
+
+
+def batch_latency(predict_fn, batch, iterations, warmup=3):
+    """Latency samples (ms) for whole batches"""
+    for _ in range(warmup):
+        predict_fn(batch)
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        predict_fn(batch)
+        samples.append((time.perf_counter() - start) * 1000.0)
+    return samples
+
+
+def main():
+    from inference import compile_forward
+    from models import BACKBONES, CLASS_NAMES, build_model, count_flops
+
+    parser = argparse.ArgumentParser(description='Compare registered backbones for CPU serving')
+    parser.add_argument('--backbones', nargs='+', default=list(BACKBONES))
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 8])
+    parser.add_argument('--iterations', type=int, default=30)
+    parser.add_argument('--budget-ms', type=float, default=50.0, help='p99 latency budget for a single image')
+    parser.add_argument('--output', help='JSON results path (default: benchmarks/results/)')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    results = {'config': vars(args), 'backbones': {}}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in args.backbones:
+            start = time.perf_counter()
+            model, _ = build_model(name, len(CLASS_NAMES))
+            build_ms = (time.perf_counter() - start) * 1000.0
+            weights_path = os.path.join(tmp, f'{name}.weights.h5')
+            model.save_weights(weights_path)
+
+            start = time.perf_counter()
+            model, loaded = build_model(name, len(CLASS_NAMES), weights_path=weights_path)
+            load_ms = (time.perf_counter() - start) * 1000.0
+            if not loaded:
+                raise SystemExit(f"{name}: saved weights could not be reloaded")
+
+            forward = compile_forward(model)
+            stats = {
+                'params': int(model.count_params()),
+                'flops': count_flops(model),
+                'weights_mb': os.path.getsize(weights_path) / 1e6,
+                'build_ms': build_ms,
+                'load_ms': load_ms,
+                'latency_ms': {},
+            }
+            for size in args.batch_sizes:
+                batch = rng.random((size,) + tuple(model.input_shape[1:]), dtype=np.float32)
+                stats['latency_ms'][str(size)] = summarize(batch_latency(forward, batch, args.iterations))
+            results['backbones'][name] = stats
+
+            flops = f"{stats['flops'] / 1e9:.2f}G" if stats['flops'] else 'n/a'
+            latency = ' '.join(
+                f"b{size}: p50={s['p50']:.1f} p99={s['p99']:.1f}ms" for size, s in stats['latency_ms'].items()
+            )
+            print(f"{name:<20} params={stats['params'] / 1e6:6.2f}M flops={flops:>7} "
+                  f"load={load_ms:7.1f}ms {latency}")
+
+    first = str(args.batch_sizes[0])
+    candidates = sorted(
+        (stats['latency_ms'][first]['p99'], name) for name, stats in results['backbones'].items()
+        if stats['latency_ms'][first]['p99'] <= args.budget_ms
+    )
+    results['within_budget'] = [name for _, name in candidates]
+    print(f"Within p99 budget of {args.budget_ms:.0f}ms at batch {first}: {', '.join(results['within_budget']) or 'none'}")
+    print(f"Results written to {save_results('backbones', results, args.output)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+# benchmarks/cache.py - Disease cache hit latency: per-call sqlite3.connect vs pooled WAL store vs in-memory L1
+#
+# Usage: python -m benchmarks.cache [--iterations 2000]
+import argparse
+import json
+import os
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from benchmarks import save_results, summarize
+
+
+def legacy_check_cache(database, disease_name, expiry_hours=24):
+    """The original WebScraper._check_cache: one connection per lookup"""
+    conn = sqlite3.connect(database)
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT treatments, sources, timestamp FROM disease_cache WHERE disease=? AND timestamp > datetime('now', ?)",
+        (disease_name, f"-{expiry_hours} hours")
+    )
+    row = cursor.fetchone()
+    conn.close()
+    if row:
+        return {'treatments': json.loads(row[0]), 'sources': json.loads(row[1]) if row[1] else []}
+    return None
+
+
+def measure(fn, iterations):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000.0)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare disease cache hit latency before and after pooling')
+    parser.add_argument('--iterations', type=int, default=2000)
+    parser.add_argument('--output', help='JSON results path (default: benchmarks/results/)')
+    args = parser.parse_args()
+
+    import app
+    from storage import SQLiteStore
+
+    disease = 'Tomato Early Blight'
+    treatments = app.WebScraper._get_default_treatments(disease)
+    with tempfile.TemporaryDirectory() as tmp:
+        database = os.path.join(tmp, 'bench.db')
+        app.WebScraper.store = SQLiteStore(database)
+        app.WebScraper.initialize_database()
+        app.WebScraper.cache_many([(disease, treatments, [])])
+
+        def pooled_hit():
+            cutoff = (datetime.now() - timedelta(hours=app.CACHE_EXPIRY_HOURS)).isoformat()
+            return app.WebScraper.store.query_one(app.CACHE_SELECT_SQL, (disease, cutoff))
+
+        results = {
+            'legacy_connect_per_call': summarize(measure(lambda: legacy_check_cache(database, disease), args.iterations)),
+            'pooled_wal': summarize(measure(pooled_hit, args.iterations)),
+            'memory_l1': summarize(measure(lambda: app.WebScraper._check_cache(disease), args.iterations)),
+        }
+
+        rows = [(f"{disease} {i}", treatments, []) for i in range(500)]
+        start = time.perf_counter()
+        for row in rows:
+            app.WebScraper._cache_results(*row)
+        single = (time.perf_counter() - start) * 1000.0
+        start = time.perf_counter()
+        app.WebScraper.cache_many(rows)
+        batched = (time.perf_counter() - start) * 1000.0
+        results['write_500'] = {'one_transaction_each_ms': single, 'batched_ms': batched}
+
+    for name, stats in results.items():
+        if 'p50' in stats:
+            print(f"{name:<26} p50={stats['p50'] * 1000:.1f}us p99={stats['p99'] * 1000:.1f}us")
+    print(f"500 writes: individually {single:.1f}ms, batched {batched:.1f}ms")
+    print(f"Results written to {save_results('cache', results, args.output)}")
+
+
+if __name__ == '__main__':
+    main()
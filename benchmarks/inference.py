@@ -0,0 +1,55 @@
+# benchmarks/inference.py - Per-image latency of the Keras predict path vs the compiled forward path
+#
+# Usage: python -m benchmarks.inference [--iterations 50] [--batch-sizes 1 8] [--backends keras compiled xla]
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks import save_results, summarize
+
+
+def measure(predict_fn, batch, iterations, warmup=3):
+    """Per-image latency samples (ms) for repeated calls on the same batch"""
+    for _ in range(warmup):
+        predict_fn(batch)
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        predict_fn(batch)
+        samples.append((time.perf_counter() - start) * 1000.0 / len(batch))
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare per-image inference latency across backends')
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 8])
+    parser.add_argument('--backends', nargs='+', default=['keras', 'compiled', 'xla'])
+    parser.add_argument('--output', help='JSON results path (default: benchmarks/results/)')
+    args = parser.parse_args()
+
+    import app
+    if app.model is None:
+        raise SystemExit("Model could not be built; nothing to benchmark")
+
+    rng = np.random.default_rng(0)
+    results = {}
+    for backend in args.backends:
+        predict_fn, actual = app.build_inference_fn(backend)
+        if actual != backend:
+            print(f"{backend}: unavailable, skipped")
+            continue
+        results[backend] = {}
+        for size in args.batch_sizes:
+            batch = rng.random((size, 224, 224, 3), dtype=np.float32)
+            stats = summarize(measure(predict_fn, batch, args.iterations))
+            results[backend][str(size)] = stats
+            print(f"{backend:>9} batch={size:<3} per-image mean={stats['mean']:.2f}ms "
+                  f"p50={stats['p50']:.2f}ms p95={stats['p95']:.2f}ms")
+
+    print(f"Results written to {save_results('inference', results, args.output)}")
+
+
+if __name__ == '__main__':
+    main()
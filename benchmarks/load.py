@@ -0,0 +1,202 @@
+# benchmarks/load.py - End-to-end load and latency benchmark for the Flask API
+#
+# Starts a local Wikipedia stub and `python app.py serve` with every database, log and archive in a scratch
+# directory, then sweeps concurrency levels over /predict, /disease_info/<name> and /health. The prediction
+# cache is disabled so /predict measures inference; pass --server-env PREDICTION_CACHE_ENABLED=true to
+# measure cache hits instead.
+#
+# Usage: python -m benchmarks.load [--concurrency 1 4 16] [--requests 200] [--server-env KEY=VALUE ...]
+import argparse
+import glob
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+
+import requests
+
+from benchmarks import BASE_DIR, save_results, summarize
+from benchmarks.wiki_stub import start_stub
+
+CLASS_SAMPLE = [
+    "Apple Scab", "Tomato Early Blight", "Potato Late Blight", "Corn Common Rust",
+    "Grape Black Rot", "Tomato Healthy", "Squash Powdery Mildew", "Peach Bacterial Spot",
+]
+
+
+def sample_images():
+    paths = sorted(glob.glob(os.path.join(BASE_DIR, 'uploads', '*.jpg')))
+    paths += [os.path.join(BASE_DIR, name) for name in ('test_leaf.jpg', 'OIP.jpeg')]
+    images = []
+    for path in paths:
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                images.append((os.path.basename(path), f.read()))
+    return images
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def workers_ready(log_path):
+    with open(log_path, 'r', errors='replace') as f:
+        return f.read().count('Application initialization complete')
+
+
+def scratch_env(tmp, wiki_api_url):
+    """Server settings that keep every file the app writes inside `tmp`, with the prediction cache off"""
+    return {
+        'WIKI_API_URL': wiki_api_url,
+        'DATABASE': os.path.join(tmp, 'bench.db'),
+        'PREDICTION_LOG_DB': os.path.join(tmp, 'plantdoc.db'),
+        'KNOWLEDGE_SNAPSHOT': os.path.join(tmp, 'no_snapshot.json'),
+        'ARCHIVE_DIR': os.path.join(tmp, 'archive'),
+        'LOG_FILE': os.path.join(tmp, 'app.log'),
+        'PROFILE_DIR': os.path.join(tmp, 'profiles'),
+        'PREDICTION_CACHE_ENABLED': 'false',
+    }
+
+
+def start_server(port, env_overrides, log_path, command=None, workers=1):
+    """Start the API (by default `app.py serve`) and wait until `workers` processes have initialized"""
+    env = dict(os.environ, PORT=str(port), FLASK_DEBUG='false', **env_overrides)
+    log = open(log_path, 'w')
+    process = subprocess.Popen(
+        [sys.executable] + (command or [os.path.join(BASE_DIR, 'app.py'), 'serve']),
+        cwd=BASE_DIR, env=env, stdout=log, stderr=subprocess.STDOUT
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 180
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"Server exited early, see {log_path}")
+        try:
+            if requests.get(f"{base_url}/health", timeout=1).status_code == 200 and workers_ready(log_path) >= workers:
+                return process, base_url
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    process.terminate()
+    raise SystemExit(f"Server did not become healthy, see {log_path}")
+
+
+class LoadRunner:
+    def __init__(self, base_url, images):
+        self.base_url = base_url
+        self.images = images
+        self._local = threading.local()
+
+    def session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def call(self, endpoint, i):
+        """Issue one request; returns (latency_ms, ok, stage_timings)"""
+        start = time.perf_counter()
+        stages = {}
+        try:
+            if endpoint == 'predict':
+                name, data = self.images[i % len(self.images)]
+                response = self.session().post(f"{self.base_url}/predict", files={'file': (name, data)}, timeout=60)
+                if response.ok:
+                    stages = response.json().get('stage_timings') or {}
+            elif endpoint == 'disease_info':
+                disease = CLASS_SAMPLE[i % len(CLASS_SAMPLE)]
+                response = self.session().get(f"{self.base_url}/disease_info/{quote(disease)}", timeout=60)
+            else:
+                response = self.session().get(f"{self.base_url}/health", timeout=60)
+            ok = response.ok
+        except requests.RequestException:
+            ok = False
+        return (time.perf_counter() - start) * 1000.0, ok, stages
+
+    def sweep(self, endpoint, concurrency, total):
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            outcomes = list(executor.map(lambda i: self.call(endpoint, i), range(total)))
+        elapsed = time.perf_counter() - start
+
+        stage_samples = defaultdict(list)
+        for _, _, stages in outcomes:
+            for stage, timing in stages.items():
+                stage_samples[stage].append(timing['duration_ms'])
+        return {
+            'latency_ms': summarize([latency for latency, ok, _ in outcomes if ok]),
+            'errors': sum(1 for _, ok, _ in outcomes if not ok),
+            'throughput_rps': total / elapsed,
+            'stages_ms': {stage: summarize(samples) for stage, samples in sorted(stage_samples.items())},
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='End-to-end API load benchmark')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--requests', type=int, default=200, help='Requests per endpoint per concurrency level')
+    parser.add_argument('--endpoints', nargs='+', default=['predict', 'disease_info', 'health'])
+    parser.add_argument('--wiki-latency-ms', type=float, default=50.0)
+    parser.add_argument('--server-env', nargs='*', default=[], help='Extra KEY=VALUE settings for the server')
+    parser.add_argument('--server-url', help='Benchmark an already running server instead of starting one')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='JSON results path (default: benchmarks/results/)')
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    images = sample_images()
+    stub = start_stub(latency_ms=args.wiki_latency_ms)
+    env_overrides = dict(item.split('=', 1) for item in args.server_env)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        process, prediction_cache = None, None  # Unknown for an external server
+        if args.server_url:
+            base_url = args.server_url
+        else:
+            env = scratch_env(tmp, stub.api_url)
+            env.update(env_overrides)
+            prediction_cache = env['PREDICTION_CACHE_ENABLED'].lower() == 'true'
+            process, base_url = start_server(free_port(), env, os.path.join(tmp, 'server.log'))
+
+        runner = LoadRunner(base_url, images)
+        results = {
+            'config': {
+                'concurrency': args.concurrency,
+                'requests': args.requests,
+                'wiki_latency_ms': args.wiki_latency_ms,
+                'server_env': env_overrides,
+                'prediction_cache': prediction_cache,
+                'images': [name for name, _ in images],
+            },
+            'endpoints': defaultdict(dict),
+        }
+        try:
+            for endpoint in args.endpoints:
+                runner.call(endpoint, 0)  # Warm-up
+                for concurrency in args.concurrency:
+                    stats = runner.sweep(endpoint, concurrency, args.requests)
+                    results['endpoints'][endpoint][str(concurrency)] = stats
+                    latency = stats['latency_ms']
+                    print(f"{endpoint:<13} c={concurrency:<3} {stats['throughput_rps']:8.1f} req/s "
+                          f"p50={latency.get('p50', 0):.1f}ms p95={latency.get('p95', 0):.1f}ms "
+                          f"p99={latency.get('p99', 0):.1f}ms errors={stats['errors']}")
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait(timeout=30)
+            stub.shutdown()
+
+    print(f"Results written to {save_results('load', results, args.output)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+# benchmarks/preprocess.py - Parity and cost of ImagePreprocessor against the original preprocess_image
+#
+# Usage: python -m benchmarks.preprocess [--iterations 20] [--large-size 4032 3024]
+import argparse
+import glob
+import io
+import os
+import time
+import tracemalloc
+
+import numpy as np
+from PIL import Image
+
+from benchmarks import BASE_DIR, save_results, summarize
+from preprocessing import ImagePreprocessor
+
+
+def legacy_preprocess(image_bytes):
+    """The original app.preprocess_image implementation, kept as the parity reference"""
+    image = Image.open(io.BytesIO(image_bytes)).convert('RGB')
+    image = image.resize((224, 224))
+    image_array = np.array(image) / 255.0
+    return np.expand_dims(image_array, axis=0)
+
+
+def sample_images(large_size):
+    """Repository sample images plus a synthetic phone-sized JPEG"""
+    paths = sorted(glob.glob(os.path.join(BASE_DIR, 'uploads', '*.jpg')))
+    paths += [os.path.join(BASE_DIR, name) for name in ('test_leaf.jpg', 'OIP.jpeg', 'test.jpeg')]
+    images = {}
+    for path in paths:
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                images[os.path.relpath(path, BASE_DIR)] = f.read()
+
+    with open(os.path.join(BASE_DIR, 'test_leaf.jpg'), 'rb') as f:
+        large = Image.open(f).convert('RGB').resize(tuple(large_size), Image.Resampling.BICUBIC)
+    buffer = io.BytesIO()
+    large.save(buffer, format='JPEG', quality=90)
+    images[f'synthetic_{large_size[0]}x{large_size[1]}.jpg'] = buffer.getvalue()
+    return images
+
+
+def measure(fn, image_bytes, iterations):
+    """Latency samples (ms) and peak tracemalloc-visible (Python/NumPy) allocation for fn(image_bytes)"""
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn(image_bytes)
+        samples.append((time.perf_counter() - start) * 1000.0)
+    tracemalloc.start()
+    fn(image_bytes)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return samples, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare ImagePreprocessor against the original preprocessing')
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--large-size', type=int, nargs=2, default=[4032, 3024])
+    parser.add_argument('--skip-model', action='store_true', help='Only compare pixels, not predicted classes')
+    parser.add_argument('--output', help='JSON results path (default: benchmarks/results/)')
+    args = parser.parse_args()
+
+    run_model = None
+    if not args.skip_model:
+        import app
+        run_model = app.run_model
+
+    preprocessor = ImagePreprocessor((224, 224))
+    results = {}
+    mismatches = 0
+    for name, image_bytes in sample_images(args.large_size).items():
+        reference = legacy_preprocess(image_bytes)
+        candidate = preprocessor.preprocess(image_bytes).copy()
+        entry = {
+            'bytes': len(image_bytes),
+            'source_size': list(Image.open(io.BytesIO(image_bytes)).size),
+            'dtype': str(candidate.dtype),
+            'max_abs_diff': float(np.abs(reference - candidate).max()),
+        }
+        if run_model is not None:
+            reference_class = int(np.argmax(run_model(reference.astype(np.float32))[0]))
+            candidate_class = int(np.argmax(run_model(candidate)[0]))
+            entry['class_match'] = reference_class == candidate_class
+            mismatches += not entry['class_match']
+
+        legacy_samples, legacy_peak = measure(legacy_preprocess, image_bytes, args.iterations)
+        lean_samples, lean_peak = measure(preprocessor.preprocess, image_bytes, args.iterations)
+        entry['legacy'] = dict(summarize(legacy_samples), peak_alloc_bytes=legacy_peak)
+        entry['lean'] = dict(summarize(lean_samples), peak_alloc_bytes=lean_peak)
+        results[name] = entry
+
+        print(f"{name:<40} {entry['source_size'][0]}x{entry['source_size'][1]:<6} "
+              f"legacy={entry['legacy']['p50']:.2f}ms/{legacy_peak / 1e6:.1f}MB "
+              f"lean={entry['lean']['p50']:.2f}ms/{lean_peak / 1e6:.1f}MB "
+              f"max_diff={entry['max_abs_diff']:.3f} class_match={entry.get('class_match', 'n/a')}")
+
+    print(f"Results written to {save_results('preprocess', results, args.output)}")
+    if mismatches:
+        raise SystemExit(f"{mismatches} image(s) changed predicted class")
+
+
+if __name__ == '__main__':
+    main()
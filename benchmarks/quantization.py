@@ -0,0 +1,155 @@
+# benchmarks/quantization.py - Accuracy agreement, latency and memory of TFLite conversions vs the Keras model
+#
+# Converts the current model to float32/float16/int8 TFLite (int8 calibrated on local leaf images) and
+# compares every variant with the compiled Keras forward pass on an evaluation set built from the same
+# local images (with different crops than calibration). Each variant is also run behind the batch
+# scheduler with concurrent single-image clients, so latency covers the batch sizes it really produces.
+#
+# Usage: python -m benchmarks.quantization [--modes float32 float16 int8] [--eval-samples 64] [--iterations 30]
+#            [--clients 8] [--requests 25] [--think-ms 100] [--max-interpreters 4]
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from benchmarks import BASE_DIR, save_results, summarize
+from benchmarks.inference import measure
+
+
+def rss_mb():
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024.0
+    return 0.0
+
+
+def agreement(reference, candidate):
+    """Top-1 agreement, top-5 overlap and probability error of candidate vs reference outputs"""
+    top1 = reference.argmax(axis=1) == candidate.argmax(axis=1)
+    ref_top5 = np.argsort(-reference, axis=1)[:, :5]
+    cand_top5 = np.argsort(-candidate, axis=1)[:, :5]
+    overlap = [len(set(a) & set(b)) / 5.0 for a, b in zip(ref_top5, cand_top5)]
+    diff = np.abs(reference - candidate)
+    return {
+        'top1_agreement': float(top1.mean()),
+        'top5_overlap': float(np.mean(overlap)),
+        'max_abs_diff': float(diff.max()),
+        'mean_abs_diff': float(diff.mean()),
+    }
+
+
+def scheduled(predict_fn, images, clients, requests, max_batch_size, max_wait_ms, think_ms):
+    """
+    Per-request latency (ms) and batch-size histogram with `clients` threads sending single images,
+    each pausing a random 0-2x `think_ms` between requests so batch sizes vary as they do in service
+    """
+    from inference import BatchScheduler
+
+    scheduler = BatchScheduler(predict_fn, max_batch_size, max_wait_ms)
+    samples, lock = [], threading.Lock()
+
+    def client(offset):
+        rng = np.random.default_rng(offset)
+        for i in range(requests):
+            time.sleep(rng.uniform(0.0, 2.0 * think_ms) / 1000.0)
+            image = images[(offset + i) % len(images)][np.newaxis]
+            start = time.perf_counter()
+            scheduler.predict(image)
+            with lock:
+                samples.append((time.perf_counter() - start) * 1000.0)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, scheduler.stats()['batch_size_histogram']
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare TFLite conversions with the Keras model')
+    parser.add_argument('--modes', nargs='+', default=['float32', 'float16', 'int8'])
+    parser.add_argument('--images', nargs='+', default=[os.path.join(BASE_DIR, 'uploads'), BASE_DIR])
+    parser.add_argument('--calibration-samples', type=int, default=100)
+    parser.add_argument('--eval-samples', type=int, default=64)
+    parser.add_argument('--iterations', type=int, default=30)
+    parser.add_argument('--clients', type=int, default=8, help='Concurrent clients for the scheduled run')
+    parser.add_argument('--requests', type=int, default=25, help='Requests per client in the scheduled run')
+    parser.add_argument('--think-ms', type=float, default=100.0, help='Mean pause between a client\'s requests')
+    parser.add_argument('--max-interpreters', type=int, default=4, help='Allocated interpreters kept per runner')
+    parser.add_argument('--output', help='JSON results path (default: benchmarks/results/)')
+    args = parser.parse_args()
+
+    os.environ.setdefault('INFERENCE_BACKEND', 'keras')
+    import app
+    from inference import compile_forward
+    from quantization import TFLiteRunner, convert_model, find_images, representative_dataset
+
+    if app.model is None or not hasattr(app.model, 'layers'):
+        raise SystemExit("Keras model unavailable; nothing to convert")
+
+    paths = find_images(args.images)
+    evaluation = np.concatenate([
+        sample[0] for sample in representative_dataset(paths, app.preprocessor, args.eval_samples, seed=1)()
+    ])
+    single = evaluation[:1]
+
+    forward = compile_forward(app.model)
+    reference = forward(evaluation)
+    results = {
+        'config': {
+            'modes': args.modes, 'images': len(paths), 'eval_samples': len(evaluation),
+            'clients': args.clients, 'requests': args.requests, 'think_ms': args.think_ms,
+            'max_interpreters': args.max_interpreters,
+        },
+        'keras': {
+            'weights_mb': app.model.count_params() * 4 / 1e6,
+            'latency_ms': summarize(measure(forward, single, args.iterations)),
+        },
+        'tflite': {},
+    }
+    print(f"keras     weights {results['keras']['weights_mb']:7.1f}MB  "
+          f"p50 {results['keras']['latency_ms']['p50']:6.1f}ms")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in args.modes:
+            representative = None
+            if mode == 'int8':
+                representative = representative_dataset(paths, app.preprocessor, args.calibration_samples)
+            path = convert_model(app.model, os.path.join(tmp, f'model-{mode}.tflite'), mode, representative)
+
+            before = rss_mb()
+            runner = TFLiteRunner(path, max_interpreters=args.max_interpreters)
+            outputs = np.concatenate([runner(evaluation[i:i + 1]) for i in range(len(evaluation))])
+            latency = summarize(measure(runner, single, args.iterations))
+            # One unmeasured round first, so the measured one sees the warm interpreters a running server has
+            scheduled(runner, evaluation, args.clients, 2, app.BATCH_MAX_SIZE, app.BATCH_MAX_WAIT_MS, args.think_ms)
+            samples, sizes = scheduled(
+                runner, evaluation, args.clients, args.requests, app.BATCH_MAX_SIZE, app.BATCH_MAX_WAIT_MS,
+                args.think_ms
+            )
+            stats = {
+                'file_mb': os.path.getsize(path) / 1e6,
+                'rss_growth_mb': rss_mb() - before,
+                'latency_ms': latency,
+                'scheduled_latency_ms': summarize(samples),
+                'scheduled_batch_sizes': sizes,
+                'interpreters': runner.stats(),
+                **agreement(reference, outputs),
+            }
+            results['tflite'][mode] = stats
+            print(f"{mode:<9} file {stats['file_mb']:7.1f}MB  rss +{stats['rss_growth_mb']:6.1f}MB  "
+                  f"p50 {stats['latency_ms']['p50']:6.1f}ms  scheduled p50 {stats['scheduled_latency_ms']['p50']:6.1f}ms "
+                  f"p95 {stats['scheduled_latency_ms']['p95']:6.1f}ms  top1 {stats['top1_agreement']:.1%}  "
+                  f"top5 {stats['top5_overlap']:.1%}  max|dp| {stats['max_abs_diff']:.4f}")
+            del runner
+
+    print(f"Results written to {save_results('quantization', results, args.output)}")
+
+
+if __name__ == '__main__':
+    main()
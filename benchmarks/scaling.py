@@ -0,0 +1,85 @@
+# benchmarks/scaling.py - Throughput scaling of the preforked server (serve.py) from 1 to N workers
+#
+# For each worker count, starts `serve.py --workers W` against a scratch database and the Wikipedia stub,
+# then drives /predict at a fixed concurrency per worker. The prediction cache is disabled so every
+# request runs a forward pass.
+#
+# Usage: python -m benchmarks.scaling [--workers 1 2 4] [--concurrency-per-worker 4] [--requests 200] [--pin-cpus]
+import argparse
+import os
+import tempfile
+
+from benchmarks import BASE_DIR, save_results
+from benchmarks.load import LoadRunner, free_port, sample_images, scratch_env, start_server
+from benchmarks.wiki_stub import start_stub
+
+
+def default_worker_counts():
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else (os.cpu_count() or 1)
+    counts, workers = [], 1
+    while workers < cpus:
+        counts.append(workers)
+        workers *= 2
+    return counts + [cpus]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Multi-worker throughput scaling benchmark')
+    parser.add_argument('--workers', type=int, nargs='+', default=default_worker_counts())
+    parser.add_argument('--concurrency-per-worker', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=200, help='/predict requests per worker count')
+    parser.add_argument('--threads', type=int, default=8, help='Request threads per worker')
+    parser.add_argument('--pin-cpus', action='store_true')
+    parser.add_argument('--wiki-latency-ms', type=float, default=0.0)
+    parser.add_argument('--output', help='JSON results path (default: benchmarks/results/)')
+    args = parser.parse_args()
+
+    images = sample_images()
+    stub = start_stub(latency_ms=args.wiki_latency_ms)
+    results = {
+        'config': {
+            'workers': args.workers,
+            'concurrency_per_worker': args.concurrency_per_worker,
+            'requests': args.requests,
+            'threads': args.threads,
+            'pin_cpus': args.pin_cpus,
+        },
+        'runs': {},
+    }
+
+    baseline = None
+    try:
+        for workers in args.workers:
+            with tempfile.TemporaryDirectory() as tmp:
+                env = scratch_env(tmp, stub.api_url)
+                port = free_port()
+                command = [os.path.join(BASE_DIR, 'serve.py'), '--workers', str(workers),
+                           '--threads', str(args.threads), '--bind', f'127.0.0.1:{port}']
+                if args.pin_cpus:
+                    command.append('--pin-cpus')
+                process, base_url = start_server(port, env, os.path.join(tmp, 'server.log'), command, workers)
+                try:
+                    runner = LoadRunner(base_url, images)
+                    for i in range(workers * args.concurrency_per_worker):
+                        runner.call('predict', i)  # Warm-up, reaching every worker
+                    stats = runner.sweep('predict', workers * args.concurrency_per_worker, args.requests)
+                finally:
+                    process.terminate()
+                    process.wait(timeout=60)
+
+            baseline = baseline or stats['throughput_rps']
+            stats['speedup'] = stats['throughput_rps'] / baseline
+            stats['efficiency'] = stats['speedup'] / (workers / args.workers[0])
+            results['runs'][str(workers)] = stats
+            latency = stats['latency_ms']
+            print(f"workers={workers:<3} {stats['throughput_rps']:8.1f} req/s speedup={stats['speedup']:.2f}x "
+                  f"efficiency={stats['efficiency']:.0%} p50={latency.get('p50', 0):.1f}ms "
+                  f"p95={latency.get('p95', 0):.1f}ms errors={stats['errors']}")
+    finally:
+        stub.shutdown()
+
+    print(f"Results written to {save_results('scaling', results, args.output)}")
+
+
+if __name__ == '__main__':
+    main()
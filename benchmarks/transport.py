@@ -0,0 +1,62 @@
+# benchmarks/transport.py - Connection reuse and throughput of HttpTransport vs bare requests.get
+#
+# Usage: python -m benchmarks.transport [--requests 400] [--concurrency 1 8 32] [--latency-ms 5]
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from benchmarks import save_results, summarize
+from benchmarks.wiki_stub import start_stub
+from http_transport import HttpTransport
+from mediawiki import MediaWikiClient
+
+
+def run(fetch, total, concurrency):
+    def timed(i):
+        start = time.perf_counter()
+        fetch(i)
+        return (time.perf_counter() - start) * 1000.0
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        samples = list(executor.map(timed, range(total)))
+    return samples, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark pooled vs unpooled Wikipedia HTTP calls')
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--latency-ms', type=float, default=5.0)
+    parser.add_argument('--output', help='JSON results path (default: benchmarks/results/)')
+    args = parser.parse_args()
+
+    server = start_stub(latency_ms=args.latency_ms)
+    params = {'action': 'query', 'list': 'search', 'srsearch': 'Apple Scab', 'format': 'json', 'srlimit': 3}
+    transport = HttpTransport(pool_size=32, per_host_limit=32)
+    client = MediaWikiClient(transport, server.api_url)
+
+    variants = {
+        'bare_requests_get': lambda i: requests.get(server.api_url, params=params, timeout=8).json(),
+        'pooled_search': lambda i: client.search('Apple Scab', 3),
+        'pooled_page': lambda i: client.page(f"Disease {i % 38}"),
+    }
+    results = {}
+    for name, fetch in variants.items():
+        results[name] = {}
+        for concurrency in args.concurrency:
+            server.reset()
+            samples, elapsed = run(fetch, args.requests, concurrency)
+            stats = dict(summarize(samples), throughput_rps=args.requests / elapsed, **server.stats())
+            results[name][str(concurrency)] = stats
+            print(f"{name:<18} c={concurrency:<3} {stats['throughput_rps']:8.1f} req/s "
+                  f"p50={stats['p50']:.2f}ms p99={stats['p99']:.2f}ms connections={stats['connections']}")
+
+    server.shutdown()
+    print(f"Results written to {save_results('transport', results, args.output)}")
+
+
+if __name__ == '__main__':
+    main()
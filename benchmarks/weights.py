@@ -0,0 +1,131 @@
+# benchmarks/weights.py - Worker memory and cold-load time: load_weights (private heap) vs mapped weights
+#
+# Exports one set of weights both as a Keras .weights.h5 file and as the flat mmap format, then starts
+# several concurrent worker-like processes per backend (each imports app.py and runs one prediction).
+# Memory comes from /proc/<pid>/smaps_rollup while all processes of a backend are alive, so Pss shows
+# how shared pages are split between them. Outputs of both backends are compared on the same input.
+# With --drop-caches (root only) the page cache is emptied before each backend starts, so model load
+# times include reading the weights from disk instead of the copy export just left in memory.
+#
+# Usage: python -m benchmarks.weights [--processes 2] [--backends compiled mmap] [--drop-caches]
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from benchmarks import BASE_DIR, save_results
+
+EXPORT_SCRIPT = """
+import app
+app.model.save_weights(app.MODEL_PATH)
+app.export_weights(app.model, app.MAPPED_WEIGHTS_PATH)
+"""
+
+WORKER_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import app
+import numpy as np
+import_ms = (time.perf_counter() - start) * 1000.0
+batch = np.random.default_rng(0).random((1, 224, 224, 3), dtype=np.float32)
+probs = app.run_model(batch)[0]
+memory = {}
+with open('/proc/self/smaps_rollup') as f:
+    for line in f:
+        parts = line.split()
+        if len(parts) == 3 and parts[2] == 'kB':
+            memory[parts[0].rstrip(':')] = int(parts[1]) / 1024.0
+print(json.dumps({
+    'backend': app.inference_backend,
+    'import_ms': import_ms,
+    'model_load_ms': app.model_load_ms,
+    'memory_mb': {key: memory.get(key, 0.0) for key in ('Rss', 'Pss', 'Shared_Clean', 'Private_Clean', 'Private_Dirty')},
+    'probs': probs.tolist(),
+}), flush=True)
+sys.stdin.read()  # Stay alive until every process of this backend has reported
+"""
+
+
+def drop_page_cache():
+    os.sync()
+    with open('/proc/sys/vm/drop_caches', 'w') as f:
+        f.write('3\n')
+
+
+def run_workers(backend, count, env, drop_caches=False):
+    env = dict(env, INFERENCE_BACKEND=backend, BATCHING_ENABLED='false')
+    if drop_caches:
+        drop_page_cache()
+    processes = [
+        subprocess.Popen([sys.executable, '-c', WORKER_SCRIPT], cwd=BASE_DIR, env=env,
+                         stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+        for _ in range(count)
+    ]
+    reports = []
+    try:
+        for process in processes:
+            line = process.stdout.readline()
+            if not line:
+                raise SystemExit(f"{backend} worker exited without reporting")
+            reports.append(json.loads(line))
+    finally:
+        for process in processes:
+            process.stdin.close()
+            process.wait(timeout=60)
+    return reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare worker RSS and cold-load time across weight loaders')
+    parser.add_argument('--processes', type=int, default=2, help='Concurrent processes per backend')
+    parser.add_argument('--backends', nargs='+', default=['compiled', 'mmap'])
+    parser.add_argument('--drop-caches', action='store_true', help='Empty the page cache before each backend (root)')
+    parser.add_argument('--output', help='JSON results path (default: benchmarks/results/)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(
+            os.environ,
+            PYTHONPATH=BASE_DIR,
+            FLASK_DEBUG='false',
+            INFERENCE_BACKEND='keras',
+            DATABASE=os.path.join(tmp, 'bench.db'),
+            KNOWLEDGE_SNAPSHOT=os.path.join(tmp, 'no_snapshot.json'),
+            MODEL_PATH=os.path.join(tmp, 'model.weights.h5'),
+            MAPPED_WEIGHTS_PATH=os.path.join(tmp, 'model.bin'),
+        )
+        subprocess.run([sys.executable, '-c', EXPORT_SCRIPT], cwd=BASE_DIR, env=env, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+        results = {
+            'config': {'processes': args.processes, 'backends': args.backends, 'drop_caches': args.drop_caches},
+            'backends': {},
+        }
+        outputs = {}
+        for backend in args.backends:
+            reports = run_workers(backend, args.processes, env, args.drop_caches)
+            outputs[backend] = reports[0].pop('probs')
+            for report in reports[1:]:
+                report.pop('probs')
+            results['backends'][backend] = reports
+            for i, report in enumerate(reports):
+                memory = report['memory_mb']
+                print(f"{backend:<9} ({report['backend']}) #{i}: model load {report['model_load_ms']:7.1f}ms "
+                      f"import {report['import_ms']:7.1f}ms  Rss {memory['Rss']:6.1f}MB Pss {memory['Pss']:6.1f}MB "
+                      f"private {memory['Private_Clean'] + memory['Private_Dirty']:6.1f}MB")
+
+        if len(outputs) > 1:
+            reference, *others = outputs.values()
+            results['max_abs_diff'] = {
+                backend: max(abs(a - b) for a, b in zip(reference, probs))
+                for backend, probs in list(outputs.items())[1:]
+            }
+            print(f"Max |prob difference| vs {args.backends[0]}: {results['max_abs_diff']}")
+
+    print(f"Results written to {save_results('weights', results, args.output)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+# benchmarks/wiki_stub.py - Local stand-in for the Wikipedia API used by the benchmarks
+#
+# Usage: python -m benchmarks.wiki_stub [--port 8765] [--latency-ms 20]
+# Point the server at it with WIKI_API_URL=http://127.0.0.1:8765/w/api.php
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, urlparse
+
+
+def _extract(title):
+    return (
+        f"{title} is a plant disease used for offline benchmarking. " * 8
+        + f"\n\n== Symptoms ==\nLesions and discoloration typical of {title}. " * 4
+        + f"\n\n== Management ==\nRemove infected tissue and rotate crops. " * 4
+        + "\n\n=== Chemical control ===\nApply a registered fungicide."
+    )
+
+
+class WikiStubServer(ThreadingHTTPServer):
+    """Threaded HTTP/1.1 server answering the MediaWiki search and extract queries the app makes"""
+    daemon_threads = True
+
+    def __init__(self, address, latency_ms=0.0):
+        super().__init__(address, WikiStubHandler)
+        self.latency = latency_ms / 1000.0
+        self.connections = 0
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    @property
+    def api_url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}/w/api.php"
+
+    def count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def stats(self):
+        with self._lock:
+            return {'connections': self.connections, 'requests': self.requests}
+
+    def reset(self):
+        with self._lock:
+            self.connections = self.requests = 0
+
+
+class WikiStubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Send headers and body in one segment; split writes stall keep-alive clients on delayed ACKs
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        self.server.count('connections')
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.server.count('requests')
+        url = urlparse(self.path)
+        if url.path == '/stats':
+            return self._send(self.server.stats())
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        if params.get('list') == 'search':
+            query = params.get('srsearch', '')
+            return self._send({'query': {'search': [{'title': query}]}})
+
+        title = params.get('titles', '')
+        if not title or 'missing' in title.lower():
+            return self._send({'query': {'pages': {'-1': {'title': title, 'missing': ''}}}})
+        return self._send({'query': {'pages': {str(abs(hash(title)) % 10**8): {
+            'title': title,
+            'fullurl': f"https://en.wikipedia.org/wiki/{quote(title.replace(' ', '_'))}",
+            'extract': _extract(title),
+        }}}})
+
+    def _send(self, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_stub(port=0, latency_ms=0.0):
+    """Start a stub server on a background thread and return it"""
+    server = WikiStubServer(('127.0.0.1', port), latency_ms)
+    threading.Thread(target=server.serve_forever, name='wiki-stub', daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local stand-in for the Wikipedia API')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    args = parser.parse_args()
+    server = WikiStubServer(('127.0.0.1', args.port), args.latency_ms)
+    print(f"Wikipedia stub listening on {server.api_url}")
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
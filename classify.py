@@ -0,0 +1,417 @@
+# classify.py - Batch/offline classification of image directories and archives
+#
+# Images are read in a stable order from directories, .zip and .tar(.gz) archives or single files by a
+# producer thread, decoded on a thread pool straight into preallocated batch buffers and run through the
+# model one batch at a time. At most --prefetch batches are in flight, so memory stays bounded no matter
+# how many images there are. Results are appended to CSV, JSONL or SQLite; with --resume a run continues
+# after the last checkpointed batch.
+#
+# Usage: python classify.py uploads/ photos.zip --output results.csv [--format csv] [--batch-size 32]
+#        [--decode-workers 4] [--prefetch 2] [--backbone simple_cnn] [--weights plant_disease_model.h5]
+#        [--backend compiled|keras|tflite] [--require-weights] [--resume]
+import argparse
+import csv
+import json
+import logging
+import os
+import queue
+import sys
+import tarfile
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+from models import CLASS_NAMES
+from preprocessing import ImagePreprocessor
+from storage import get_store
+
+logger = logging.getLogger('classify')
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.gif', '.webp')
+CHECKPOINT_VERSION = 1
+
+CLASSIFICATIONS_MIGRATIONS = [
+    '''
+    CREATE TABLE IF NOT EXISTS classifications (
+        source TEXT PRIMARY KEY,
+        label TEXT,
+        confidence REAL,
+        alternatives TEXT,
+        error TEXT,
+        classified_at TEXT
+    )
+    ''',
+]
+
+
+# --- Inputs ---
+def _is_image(name):
+    return name.lower().endswith(IMAGE_EXTENSIONS)
+
+
+def _file_reader(path):
+    def read():
+        with open(path, 'rb') as f:
+            return f.read()
+    return read
+
+
+def iter_sources(paths):
+    """
+    Yield (source_id, read) for every image under paths, in a stable order. read() returns the
+    image bytes; tar members must be read before the generator is advanced.
+    """
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    if _is_image(name):
+                        full_path = os.path.join(root, name)
+                        yield full_path, _file_reader(full_path)
+        elif zipfile.is_zipfile(path):
+            with zipfile.ZipFile(path) as archive:
+                for info in archive.infolist():
+                    if not info.is_dir() and _is_image(info.filename):
+                        yield f"{path}!{info.filename}", (lambda info=info: archive.read(info))
+        elif os.path.isfile(path) and tarfile.is_tarfile(path):
+            with tarfile.open(path, 'r:*') as archive:
+                for member in archive:
+                    if member.isfile() and _is_image(member.name):
+                        yield f"{path}!{member.name}", (lambda member=member: archive.extractfile(member).read())
+        elif os.path.isfile(path) and _is_image(path):
+            yield path, _file_reader(path)
+        else:
+            logger.warning(f"Skipping {path}: not an image, directory or archive")
+
+
+# --- Outputs ---
+class CsvWriter:
+    fields = ('source', 'label', 'confidence', 'alternatives', 'error')
+
+    def __init__(self, path, offset=None):
+        self.file = open(path, 'r+' if offset is not None else 'w', newline='', encoding='utf-8')
+        if offset is not None:
+            self.file.seek(offset)
+            self.file.truncate()
+        self.writer = csv.DictWriter(self.file, fieldnames=self.fields)
+        if offset is None:
+            self.writer.writeheader()
+
+    def write(self, rows):
+        for row in rows:
+            self.writer.writerow(dict(row, alternatives=json.dumps(row['alternatives'])))
+
+    def flush(self):
+        """Flush to disk; returns the offset a resumed run truncates back to"""
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+
+class JsonlWriter(CsvWriter):
+    def __init__(self, path, offset=None):
+        if path == '-':
+            self.file = sys.stdout
+            return
+        self.file = open(path, 'r+' if offset is not None else 'w', encoding='utf-8')
+        if offset is not None:
+            self.file.seek(offset)
+            self.file.truncate()
+
+    def write(self, rows):
+        for row in rows:
+            self.file.write(json.dumps(row, ensure_ascii=False) + '\n')
+
+    def flush(self):
+        if self.file is sys.stdout:
+            self.file.flush()
+            return None
+        return super().flush()
+
+    def close(self):
+        if self.file is not sys.stdout:
+            self.file.close()
+
+
+class SQLiteWriter:
+    """Rows are keyed by source, so replaying a batch after a crash is idempotent"""
+
+    def __init__(self, path, offset=None):
+        self.store = get_store(path)
+        self.store.migrate('classifications', CLASSIFICATIONS_MIGRATIONS)
+
+    def write(self, rows):
+        now = datetime.now().isoformat()
+        self.store.execute_many(
+            "INSERT OR REPLACE INTO classifications (source, label, confidence, alternatives, error, classified_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [(r['source'], r['label'], r['confidence'], json.dumps(r['alternatives']), r['error'], now) for r in rows]
+        )
+
+    def flush(self):
+        return None
+
+    def close(self):
+        pass
+
+
+WRITERS = {'csv': CsvWriter, 'jsonl': JsonlWriter, 'sqlite': SQLiteWriter}
+
+
+# --- Checkpoints ---
+def checkpoint_path_for(output):
+    return f"{output}.checkpoint.json"
+
+
+def load_checkpoint(output, inputs):
+    """Return the checkpoint of an earlier run over the same inputs, or None"""
+    path = checkpoint_path_for(output)
+    if output == '-' or not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            checkpoint = json.load(f)
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable checkpoint {path}: {e}")
+        return None
+    if checkpoint.get('version') != CHECKPOINT_VERSION or checkpoint.get('inputs') != inputs:
+        logger.warning(f"Ignoring checkpoint {path}: it belongs to a different run")
+        return None
+    return checkpoint
+
+
+def save_checkpoint(output, checkpoint):
+    if output == '-':
+        return
+    path = checkpoint_path_for(output)
+    with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+        json.dump(dict(checkpoint, version=CHECKPOINT_VERSION, updated_at=datetime.now().isoformat()), f)
+    os.replace(f"{path}.tmp", path)
+
+
+# --- Pipeline ---
+def load_predictor(backend, backbone, weights, tflite_path, require_weights=False):
+    """Batch forward function for the requested backend"""
+    if backend == 'tflite':
+        from quantization import TFLiteRunner
+        return TFLiteRunner(tflite_path)
+    from inference import compile_forward
+    from models import build_model
+    model, loaded = build_model(backbone, len(CLASS_NAMES), weights_path=weights)
+    if not loaded:
+        if require_weights:
+            raise SystemExit(f"Could not load {backbone} weights from {weights}; pass --weights with a checkpoint for it")
+        logger.warning("Classifying with randomly initialized weights")
+    if backend == 'keras':
+        return lambda batch: model.predict(batch, verbose=0)
+    return compile_forward(model)
+
+
+class BatchClassifier:
+    """
+    Three-stage pipeline: a producer thread reads image bytes and hands them to a decode pool that
+    fills a preallocated batch buffer, while the calling thread runs inference on earlier batches.
+    """
+
+    def __init__(self, predict_fn, preprocessor, class_names, batch_size=32, decode_workers=4, prefetch=2, top_k=3):
+        self.predict_fn = predict_fn
+        self.preprocessor = preprocessor
+        self.class_names = class_names
+        self.batch_size = batch_size
+        self.decode_workers = decode_workers
+        self.prefetch = prefetch
+        self.top_k = top_k
+        self.timings = {'read': 0.0, 'decode_wait': 0.0, 'inference': 0.0}
+
+    def run(self, sources):
+        """Yield (source_ids, rows) per batch, in input order"""
+        batches = queue.Queue(maxsize=self.prefetch)
+        stop = threading.Event()
+        with ThreadPoolExecutor(max_workers=self.decode_workers, thread_name_prefix='decode') as pool:
+            producer = threading.Thread(
+                target=self._produce, args=(sources, pool, batches, stop), name='classify-reader', daemon=True
+            )
+            producer.start()
+            try:
+                while True:
+                    item = batches.get()
+                    if item is None:
+                        break
+                    if isinstance(item, BaseException):
+                        raise item
+                    yield self._finish(*item)
+            finally:
+                stop.set()
+                while producer.is_alive():
+                    try:
+                        batches.get_nowait()
+                    except queue.Empty:
+                        producer.join(0.05)
+
+    def _produce(self, sources, pool, batches, stop):
+        try:
+            chunk = []
+            for source_id, read in sources:
+                if stop.is_set():
+                    return
+                start = time.perf_counter()
+                try:
+                    chunk.append((source_id, read(), None))
+                except Exception as e:
+                    chunk.append((source_id, None, f"read failed: {e}"))
+                self.timings['read'] += time.perf_counter() - start
+                if len(chunk) == self.batch_size:
+                    self._put(batches, self._submit(chunk, pool), stop)
+                    chunk = []
+            if chunk:
+                self._put(batches, self._submit(chunk, pool), stop)
+            self._put(batches, None, stop)
+        except BaseException as e:
+            self._put(batches, e, stop)
+
+    @staticmethod
+    def _put(batches, item, stop):
+        while not stop.is_set():
+            try:
+                batches.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _submit(self, chunk, pool):
+        batch = np.empty((len(chunk),) + self.preprocessor.target_size[::-1] + (3,), dtype=np.float32)
+        futures = []
+        for i, (_, data, error) in enumerate(chunk):
+            futures.append(None if error else pool.submit(self.preprocessor.preprocess, data, batch[i:i + 1]))
+        # Drop the raw bytes as soon as they are queued for decoding
+        return [source_id for source_id, _, _ in chunk], [error for _, _, error in chunk], batch, futures
+
+    def _finish(self, source_ids, errors, batch, futures):
+        start = time.perf_counter()
+        errors = list(errors)
+        for i, future in enumerate(futures):
+            if future is None:
+                continue
+            try:
+                future.result()
+            except Exception as e:
+                errors[i] = f"decode failed: {e}"
+        self.timings['decode_wait'] += time.perf_counter() - start
+
+        valid = [i for i, error in enumerate(errors) if error is None]
+        probs = None
+        if valid:
+            start = time.perf_counter()
+            inputs = batch if len(valid) == len(batch) else batch[valid]
+            probs = np.asarray(self.predict_fn(inputs))
+            self.timings['inference'] += time.perf_counter() - start
+
+        rows, position = [], {index: n for n, index in enumerate(valid)}
+        for i, source_id in enumerate(source_ids):
+            row = {'source': source_id, 'label': None, 'confidence': None, 'alternatives': [], 'error': errors[i]}
+            if i in position:
+                p = probs[position[i]]
+                ranked = np.argsort(-p)[:self.top_k]
+                row['label'] = self.class_names[ranked[0]]
+                row['confidence'] = round(float(p[ranked[0]]), 6)
+                row['alternatives'] = [
+                    {'disease': self.class_names[j], 'confidence': round(float(p[j]), 6)} for j in ranked[1:]
+                ]
+            rows.append(row)
+        return source_ids, rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Classify directories or archives of leaf photos in batches')
+    parser.add_argument('inputs', nargs='+', help='Image files, directories, .zip or .tar(.gz) archives')
+    parser.add_argument('--output', default='-', help="Results file ('-' writes JSONL to stdout)")
+    parser.add_argument('--format', choices=sorted(WRITERS), help='Output format (default: from the extension)')
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--decode-workers', type=int, default=min(8, os.cpu_count() or 1))
+    parser.add_argument('--prefetch', type=int, default=2, help='Decoded batches kept ahead of inference')
+    parser.add_argument('--backbone', default=os.environ.get('MODEL_BACKBONE', 'simple_cnn'))
+    parser.add_argument('--weights', default=os.environ.get('MODEL_PATH', os.path.join(BASE_DIR, 'plant_disease_model.h5')))
+    parser.add_argument('--backend', choices=('compiled', 'keras', 'tflite'), default='compiled')
+    parser.add_argument('--require-weights', action='store_true',
+                        help='Exit instead of classifying with random weights when --weights does not load')
+    parser.add_argument('--tflite-model', default=os.environ.get('TFLITE_MODEL_PATH', os.path.join(BASE_DIR, 'plant_disease_model.tflite')))
+    parser.add_argument('--top-k', type=int, default=3)
+    parser.add_argument('--resume', action='store_true', help='Continue after the last checkpointed batch')
+    parser.add_argument('--report-every', type=float, default=10.0, help='Seconds between progress lines')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s %(message)s', stream=sys.stderr)
+    output_format = args.format or {'.csv': 'csv', '.db': 'sqlite', '.sqlite': 'sqlite'}.get(
+        os.path.splitext(args.output)[1].lower(), 'jsonl'
+    )
+    if args.output == '-' and output_format != 'jsonl':
+        raise SystemExit("Only JSONL can be written to stdout")
+    inputs = [os.path.abspath(path) for path in args.inputs]
+
+    checkpoint = load_checkpoint(args.output, inputs) if args.resume else None
+    skip = checkpoint['completed'] if checkpoint else 0
+    if checkpoint and checkpoint.get('finished'):
+        logger.info(f"{args.output} is already complete ({skip} images)")
+        return checkpoint
+
+    sources = iter_sources(inputs)
+    if skip:
+        source_id, remaining = None, skip
+        for source_id, _ in sources:
+            remaining -= 1
+            if not remaining:
+                break
+        if remaining or source_id != checkpoint['last_source']:
+            raise SystemExit(f"Inputs changed since the checkpoint ({source_id} != {checkpoint['last_source']})")
+        logger.info(f"Resuming after {skip} images")
+
+    classifier = BatchClassifier(
+        load_predictor(args.backend, args.backbone, args.weights, args.tflite_model, args.require_weights),
+        ImagePreprocessor(), CLASS_NAMES, args.batch_size, args.decode_workers, args.prefetch, args.top_k
+    )
+    writer = WRITERS[output_format](args.output, checkpoint.get('output_offset') if checkpoint else None)
+    state = {'inputs': inputs, 'completed': skip, 'last_source': checkpoint['last_source'] if checkpoint else None}
+    processed, errors = 0, 0
+    start = last_report = time.perf_counter()
+    try:
+        for source_ids, rows in classifier.run(sources):
+            writer.write(rows)
+            processed += len(rows)
+            errors += sum(1 for row in rows if row['error'])
+            state.update(completed=state['completed'] + len(rows), last_source=source_ids[-1], output_offset=writer.flush())
+            save_checkpoint(args.output, state)
+            now = time.perf_counter()
+            if now - last_report >= args.report_every:
+                logger.info(f"{state['completed']} images ({processed / (now - start):.1f} images/s)")
+                last_report = now
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - start
+    summary = {
+        'images': processed,
+        'errors': errors,
+        'seconds': round(elapsed, 3),
+        'images_per_sec': round(processed / elapsed, 2) if elapsed > 0 else 0.0,
+        **{f'{stage}_seconds': round(seconds, 3) for stage, seconds in classifier.timings.items()},
+    }
+    save_checkpoint(args.output, dict(state, finished=True, summary=summary))
+    logger.info(
+        f"Classified {processed} images ({errors} errors) in {elapsed:.1f}s: {summary['images_per_sec']} images/s "
+        f"(read {summary['read_seconds']}s, waiting on decode {summary['decode_wait_seconds']}s, "
+        f"inference {summary['inference_seconds']}s)"
+    )
+    return summary
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,218 @@
+# disease_index.py - Local fuzzy resolution of free-text disease names to the model's classes
+import re
+import threading
+from difflib import SequenceMatcher
+import unicodedata
+from collections import Counter, OrderedDict
+
+# Common and pathogen names for each class; matched after normalization
+ALIASES = {
+    "Apple Scab": ["venturia inaequalis"],
+    "Apple Black Rot": ["botryosphaeria obtusa", "apple frogeye leaf spot"],
+    "Apple Cedar Rust": ["cedar apple rust", "gymnosporangium juniperi virginianae"],
+    "Cherry Powdery Mildew": ["podosphaera clandestina", "cherry mildew"],
+    "Corn Gray Leaf Spot": ["corn grey leaf spot", "cercospora zeae maydis", "corn cercospora leaf spot"],
+    "Corn Common Rust": ["puccinia sorghi", "corn rust"],
+    "Corn Northern Leaf Blight": ["exserohilum turcicum", "setosphaeria turcica", "turcicum leaf blight"],
+    "Grape Black Rot": ["guignardia bidwellii"],
+    "Grape Esca": ["black measles", "grape black measles", "esca"],
+    "Grape Leaf Blight": ["isariopsis leaf spot", "pseudocercospora vitis"],
+    "Orange Haunglongbing": ["huanglongbing", "citrus greening", "hlb", "candidatus liberibacter"],
+    "Peach Bacterial Spot": ["xanthomonas arboricola"],
+    "Pepper Bacterial Spot": ["xanthomonas euvesicatoria"],
+    "Potato Early Blight": ["alternaria solani"],
+    "Potato Late Blight": ["phytophthora infestans"],
+    "Squash Powdery Mildew": ["podosphaera xanthii", "cucurbit powdery mildew"],
+    "Strawberry Leaf Scorch": ["diplocarpon earlianum"],
+    "Tomato Bacterial Spot": ["xanthomonas perforans"],
+    "Tomato Leaf Mold": ["passalora fulva", "cladosporium fulvum", "tomato leaf mould"],
+    "Tomato Septoria Leaf Spot": ["septoria lycopersici", "septoria leaf spot"],
+    "Tomato Spider Mites": ["two spotted spider mite", "tetranychus urticae", "spider mite"],
+    "Tomato Target Spot": ["corynespora cassiicola"],
+    "Tomato Mosaic Virus": ["tomv"],
+    "Tomato Yellow Leaf Curl Virus": ["tylcv"],
+}
+
+# Crop synonyms rewritten before matching ("maize common rust" -> "corn common rust")
+SYNONYMS = {
+    "maize": "corn",
+    "citrus": "orange",
+    "bell": "",
+    "capsicum": "pepper",
+    "mould": "mold",
+    "grey": "gray",
+}
+
+_NON_WORD = re.compile(r'[^a-z0-9]+')
+
+
+def _stem(token):
+    # Plural folding only: "mites" -> "mite", but not "virus" or "grass"
+    if len(token) > 3 and token.endswith('s') and not token.endswith(('ss', 'us', 'is')):
+        return token[:-1]
+    return token
+
+
+def normalize(text, synonyms=SYNONYMS):
+    """Lowercase, strip accents and punctuation (PlantVillage-style underscores included), fold plurals and synonyms"""
+    text = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode('ascii').lower()
+    tokens = []
+    for token in _NON_WORD.split(text):
+        token = synonyms.get(token, token)
+        if token and (not tokens or tokens[-1] != _stem(token)):
+            tokens.append(_stem(token))
+    return ' '.join(tokens)
+
+
+def display_key(text):
+    """Cache key for names that do not resolve: collapsed whitespace, sentence case as Wikipedia titles use"""
+    text = ' '.join(text.replace('_', ' ').split())
+    return text[:1].upper() + text[1:].lower()
+
+
+def _similar(a, b, threshold):
+    return SequenceMatcher(None, a, b).ratio() >= threshold
+
+
+def _trigrams(key):
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class DiseaseIndex:
+    """
+    Resolves user input to a canonical class name without any network calls.
+
+    Exact matches on the normalized name or an alias are a dict lookup; everything else is
+    scored by trigram Dice similarity through an inverted index, and accepted above
+    `min_score` unless a different class scores within `margin` of it (e.g. a bare
+    "powdery mildew" matches cherry and squash equally and stays unresolved). A query whose
+    words all occur in more than one class (a crop like "apple", or "rust") is ambiguous
+    too, however well it scores against the shortest of them.
+
+    A fuzzy candidate must also be compatible with the query: a crop named in the query must
+    be the candidate's crop, and every other query word must be close to a word of the
+    matched name, so "tomato bacterial wilt" or "soybean rust" fall through to a network
+    search instead of resolving to a sibling class. A candidate whose crop the query does
+    not name ("banana leaf spot") needs `crop_less_score`. Results are memoized in a bounded
+    LRU, so repeat queries cost a dict hit.
+    """
+
+    def __init__(self, names, aliases=ALIASES, min_score=0.65, margin=0.05, crop_less_score=0.85,
+                 word_similarity=0.7, memo_size=4096):
+        self.min_score = min_score
+        self.margin = margin
+        self.crop_less_score = crop_less_score
+        self.word_similarity = word_similarity
+        self.memo_size = memo_size
+        self._crops = {name: normalize(name).split()[0] for name in names}  # class -> crop word
+        self._crop_words = set(self._crops.values())
+        self._exact = {}  # normalized key -> (canonical name, 'name' or 'alias')
+        for name in names:
+            self._exact[normalize(name)] = (name, 'name')
+        for name, name_aliases in aliases.items():
+            if name not in names:
+                continue
+            for alias in name_aliases:
+                self._exact.setdefault(normalize(alias), (name, 'alias'))
+
+        self._token_classes = {}  # word -> classes whose name or an alias contains it
+        for key, (name, _) in self._exact.items():
+            for token in key.split():
+                self._token_classes.setdefault(token, set()).add(name)
+
+        self._keys = list(self._exact)
+        self._grams = [_trigrams(key) for key in self._keys]
+        self._postings = {}
+        for key_id, grams in enumerate(self._grams):
+            for gram in grams:
+                self._postings.setdefault(gram, []).append(key_id)
+
+        self._memo = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = Counter()
+
+    def resolve(self, text):
+        """Return {'name', 'match', 'score'} for the best class, or None if nothing is close enough"""
+        query = normalize(text)
+        with self._lock:
+            if query in self._memo:
+                self._memo.move_to_end(query)
+                result = self._memo[query]
+                self._counters['memo_hits'] += 1
+                self._counters[result['match'] if result else 'misses'] += 1
+                return result
+
+        result = self._lookup(query)
+        with self._lock:
+            self._memo[query] = result
+            while len(self._memo) > self.memo_size:
+                self._memo.popitem(last=False)
+            self._counters[result['match'] if result else 'misses'] += 1
+        return result
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+            memo = len(self._memo)
+        return {
+            'keys': len(self._keys),
+            'memoized': memo,
+            **{name: counters.get(name, 0) for name in ('name', 'alias', 'fuzzy', 'misses', 'memo_hits')},
+        }
+
+    def _lookup(self, query):
+        if not query:
+            return None
+        exact = self._exact.get(query)
+        if exact is not None:
+            return {'name': exact[0], 'match': exact[1], 'score': 1.0}
+        if self._ambiguous(query):
+            return None
+
+        grams = _trigrams(query)
+        overlaps = Counter()
+        for gram in grams:
+            overlaps.update(self._postings.get(gram, ()))
+        scores = {}  # canonical name -> (best score over its name and aliases, that key)
+        for key_id, overlap in overlaps.items():
+            key = self._keys[key_id]
+            name = self._exact[key][0]
+            score = 2.0 * overlap / (len(grams) + len(self._grams[key_id]))
+            if score > scores.get(name, (0.0, None))[0]:
+                scores[name] = (score, key)
+        ranked = sorted(
+            ((name, score) for name, (score, key) in scores.items()
+             if score >= self.min_score and self._compatible(query, name, key, score)),
+            key=lambda item: item[1], reverse=True
+        )[:2]
+        if not ranked:
+            return None
+        if len(ranked) > 1 and ranked[0][1] - ranked[1][1] < self.margin:
+            return None
+        return {'name': ranked[0][0], 'match': 'fuzzy', 'score': round(ranked[0][1], 3)}
+
+    def _compatible(self, query, name, key, score):
+        # Crop words get a stricter bar than other words: "corn" and "comon" are 0.67 apart
+        crop = self._crops[name]
+        key_tokens = key.split()
+        named_crop = False
+        for token in query.split():
+            token_crop = next((c for c in self._crop_words if _similar(token, c, 0.8)), None)
+            if token_crop is not None:
+                if token_crop != crop:
+                    return False
+                named_crop = True
+            elif not any(_similar(token, word, self.word_similarity) for word in key_tokens):
+                return False
+        return named_crop or score >= self.crop_less_score
+
+    def _ambiguous(self, query):
+        # Only known words: ambiguous when more than one class contains all of them
+        candidates = None
+        for token in query.split():
+            classes = self._token_classes.get(token)
+            if classes is None:
+                return False
+            candidates = classes if candidates is None else candidates & classes
+        return candidates is not None and len(candidates) > 1
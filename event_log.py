@@ -0,0 +1,237 @@
+# event_log.py - Write-behind prediction history with incrementally maintained rollups
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from collections import Counter
+
+from storage import get_store
+
+logger = logging.getLogger(__name__)
+
+CONFIDENCE_BUCKETS = 10  # Histogram buckets of width 0.1
+
+EVENT_LOG_MIGRATIONS = [
+    '''
+    CREATE TABLE IF NOT EXISTS prediction_events (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        ts REAL NOT NULL,
+        day TEXT NOT NULL,
+        disease TEXT NOT NULL,
+        confidence REAL NOT NULL,
+        source TEXT,
+        cache_hit TEXT
+    );
+    CREATE INDEX IF NOT EXISTS idx_prediction_events_disease_ts ON prediction_events (disease, ts);
+    CREATE INDEX IF NOT EXISTS idx_prediction_events_ts ON prediction_events (ts);
+    CREATE TABLE IF NOT EXISTS prediction_daily (
+        day TEXT,
+        disease TEXT,
+        count INTEGER,
+        confidence_sum REAL,
+        PRIMARY KEY (day, disease)
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS prediction_confidence (
+        disease TEXT,
+        bucket INTEGER,
+        count INTEGER,
+        PRIMARY KEY (disease, bucket)
+    ) WITHOUT ROWID
+    ''',
+]
+
+EVENT_INSERT_SQL = '''
+    INSERT INTO prediction_events (ts, day, disease, confidence, source, cache_hit) VALUES (?, ?, ?, ?, ?, ?)
+'''
+DAILY_UPSERT_SQL = '''
+    INSERT INTO prediction_daily (day, disease, count, confidence_sum) VALUES (?, ?, ?, ?)
+    ON CONFLICT (day, disease) DO UPDATE SET
+        count = count + excluded.count, confidence_sum = confidence_sum + excluded.confidence_sum
+'''
+CONFIDENCE_UPSERT_SQL = '''
+    INSERT INTO prediction_confidence (disease, bucket, count) VALUES (?, ?, ?)
+    ON CONFLICT (disease, bucket) DO UPDATE SET count = count + excluded.count
+'''
+
+_STOP = object()
+
+
+def confidence_bucket(confidence):
+    return min(CONFIDENCE_BUCKETS - 1, max(0, int(confidence * CONFIDENCE_BUCKETS)))
+
+
+class PredictionEventLog:
+    """
+    Append-only log of predictions, written behind the request path.
+
+    record() only enqueues. A background thread drains the queue in batches of up to
+    `batch_size` (or whatever arrived within `flush_interval_ms`) and writes each batch in
+    one WAL transaction, together with the per-day and confidence-histogram rollup deltas,
+    so aggregate queries never scan the event table. When the queue is full, events are
+    dropped and counted rather than blocking a request.
+    """
+
+    def __init__(self, db_path, batch_size=256, flush_interval_ms=500, max_queue=10000):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000.0
+        self._store = get_store(db_path)
+        self._store.migrate('prediction_events', EVENT_LOG_MIGRATIONS)
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._counters = Counter()
+        self._lock = threading.Lock()
+        self._writer = None
+        self._writer_pid = None
+
+    def record(self, disease, confidence, source='predict', cache_hit=None, ts=None):
+        """Enqueue one prediction; never blocks"""
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait((ts if ts is not None else time.time(), disease, float(confidence), source, cache_hit))
+        except queue.Full:
+            self._count('dropped')
+
+    def flush(self, timeout=5.0):
+        """Wait until everything recorded so far has been written"""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return not self._queue.unfinished_tasks
+
+    def close(self):
+        """Write out queued events and stop the writer (registered to run at exit)"""
+        if self._writer is not None and self._writer.is_alive():
+            try:
+                self._queue.put(_STOP, timeout=5.0)
+            except queue.Full:
+                return
+            self._writer.join(timeout=5.0)
+
+    def daily_counts(self, days=30, disease=None):
+        """Predictions per disease per day for the last `days` days (UTC), newest first"""
+        since = time.strftime('%Y-%m-%d', time.gmtime(time.time() - (days - 1) * 86400))
+        sql = 'SELECT day, disease, count, confidence_sum FROM prediction_daily WHERE day >= ?'
+        params = [since]
+        if disease:
+            sql += ' AND disease = ?'
+            params.append(disease)
+        rows = self._store.query_all(sql + ' ORDER BY day DESC, count DESC', params)
+        return [
+            {'day': day, 'disease': name, 'count': count, 'mean_confidence': round(total / count, 4)}
+            for day, name, count, total in rows
+        ]
+
+    def confidence_distribution(self, disease=None):
+        """Confidence histogram (buckets of width 1/CONFIDENCE_BUCKETS), for one disease or all"""
+        if disease:
+            rows = self._store.query_all(
+                'SELECT bucket, count FROM prediction_confidence WHERE disease = ?', (disease,)
+            )
+        else:
+            rows = self._store.query_all(
+                'SELECT bucket, SUM(count) FROM prediction_confidence GROUP BY bucket'
+            )
+        counts = dict(rows)
+        width = 1.0 / CONFIDENCE_BUCKETS
+        return [
+            {'min': round(i * width, 2), 'max': round((i + 1) * width, 2), 'count': counts.get(i, 0)}
+            for i in range(CONFIDENCE_BUCKETS)
+        ]
+
+    def recent(self, limit=50, disease=None):
+        """Most recent events, optionally for one disease (served by the time and disease indexes)"""
+        if disease:
+            rows = self._store.query_all(
+                'SELECT id, ts, disease, confidence, source, cache_hit FROM prediction_events '
+                'WHERE disease = ? ORDER BY ts DESC LIMIT ?', (disease, limit)
+            )
+        else:
+            rows = self._store.query_all(
+                'SELECT id, ts, disease, confidence, source, cache_hit FROM prediction_events '
+                'ORDER BY ts DESC LIMIT ?', (limit,)
+            )
+        return [
+            {'id': row[0], 'timestamp': row[1], 'disease': row[2], 'confidence': row[3],
+             'source': row[4], 'cache_hit': row[5]}
+            for row in rows
+        ]
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+        return {
+            'enabled': True,
+            'database': os.path.basename(self.db_path),
+            'queued': self._queue.qsize(),
+            **{name: counters.get(name, 0) for name in ('written', 'batches', 'dropped', 'write_errors')},
+            'last_batch_ms': counters.get('last_batch_ms', 0.0),
+        }
+
+    def _ensure_writer(self):
+        # Started lazily, and again in a forked worker (threads do not survive fork)
+        if self._writer_pid == os.getpid():
+            return
+        with self._lock:
+            if self._writer_pid != os.getpid():
+                self._writer = threading.Thread(target=self._run, name='prediction-event-writer', daemon=True)
+                self._writer.start()
+                if self._writer_pid is None:
+                    atexit.register(self.close)
+                self._writer_pid = os.getpid()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                self._queue.task_done()
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            stop = False
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+            self._write(batch)
+            for _ in range(len(batch) + stop):
+                self._queue.task_done()
+            if stop:
+                return
+
+    def _write(self, batch):
+        start = time.perf_counter()
+        events, daily, buckets = [], Counter(), Counter()
+        confidence_sums = Counter()
+        for ts, disease, confidence, source, cache_hit in batch:
+            day = time.strftime('%Y-%m-%d', time.gmtime(ts))
+            events.append((ts, day, disease, confidence, source, cache_hit))
+            daily[(day, disease)] += 1
+            confidence_sums[(day, disease)] += confidence
+            buckets[(disease, confidence_bucket(confidence))] += 1
+        try:
+            with self._store.transaction() as conn:
+                conn.executemany(EVENT_INSERT_SQL, events)
+                conn.executemany(DAILY_UPSERT_SQL, [
+                    (day, disease, count, confidence_sums[(day, disease)]) for (day, disease), count in daily.items()
+                ])
+                conn.executemany(CONFIDENCE_UPSERT_SQL, [
+                    (disease, bucket, count) for (disease, bucket), count in buckets.items()
+                ])
+            with self._lock:
+                self._counters['written'] += len(events)
+                self._counters['batches'] += 1
+                self._counters['last_batch_ms'] = (time.perf_counter() - start) * 1000.0
+        except Exception as e:
+            self._count('write_errors')
+            logger.error(f"Could not write {len(events)} prediction events: {e}")
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
@@ -0,0 +1,60 @@
+# http_transport.py - Shared pooled HTTP transport for outbound lookups
+import logging
+import threading
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+
+class HttpTransport:
+    """
+    One requests.Session shared by every outbound lookup.
+
+    Connections are kept alive in a bounded pool, idempotent requests are retried
+    with exponential backoff (honouring Retry-After), and a semaphore per host caps
+    how many requests are in flight against any single server.
+    """
+
+    def __init__(self, pool_size=16, max_retries=2, backoff=0.3, per_host_limit=8, timeout=8, headers=None):
+        self.timeout = timeout
+        self.per_host_limit = per_host_limit
+        self.session = requests.Session()
+        if headers:
+            self.session.headers.update(headers)
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=backoff,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset(['GET', 'HEAD']),
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry, pool_block=True)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._host_limits = {}
+        self._lock = threading.Lock()
+
+    def get(self, url, params=None, timeout=None, **kwargs):
+        """GET through the pool, respecting the per-host concurrency limit"""
+        with self._host_limit(urlparse(url).netloc):
+            return self.session.get(url, params=params, timeout=timeout or self.timeout, **kwargs)
+
+    def get_json(self, url, params=None, timeout=None, **kwargs):
+        response = self.get(url, params=params, timeout=timeout, **kwargs)
+        response.raise_for_status()
+        return response.json()
+
+    def close(self):
+        self.session.close()
+
+    def _host_limit(self, host):
+        with self._lock:
+            semaphore = self._host_limits.get(host)
+            if semaphore is None:
+                semaphore = self._host_limits[host] = threading.BoundedSemaphore(self.per_host_limit)
+            return semaphore
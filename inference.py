@@ -0,0 +1,161 @@
+# inference.py - Micro-batching scheduler for model inference
+import logging
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+
+import numpy as np
+import tensorflow as tf
+
+logger = logging.getLogger(__name__)
+
+
+def _bucket(value):
+    """Power-of-two histogram bucket label for a non-negative count"""
+    if value <= 1:
+        return str(value)
+    low = 1 << (value.bit_length() - 1)
+    return f"{low}-{(low << 1) - 1}"
+
+
+def compile_forward(model, jit_compile=False):
+    """
+    Trace a fixed-signature forward function for `model`.
+
+    Calling a tf.function directly skips the data adapter and callback setup that
+    Model.predict performs on every call. The batch dimension is left open so the
+    same trace serves every batch size the scheduler produces.
+    """
+    signature = [tf.TensorSpec((None,) + tuple(model.input_shape[1:]), tf.float32)]
+
+    @tf.function(input_signature=signature, jit_compile=jit_compile)
+    def forward(batch):
+        return model(batch, training=False)
+
+    def run(batch):
+        return forward(tf.convert_to_tensor(batch, dtype=tf.float32)).numpy()
+
+    return run
+
+
+def warm_up(predict_fn, input_shape, batch_sizes=(1,)):
+    """Run dummy batches through predict_fn so tracing/compilation happens before traffic"""
+    for size in sorted(set(batch_sizes)):
+        start = time.perf_counter()
+        predict_fn(np.zeros((size,) + tuple(input_shape), dtype=np.float32))
+        logger.info(f"Warm-up for batch size {size} took {(time.perf_counter() - start) * 1000:.1f}ms")
+
+
+class BatchScheduler:
+    """
+    Gather concurrent inference requests into batches and run one forward pass per batch.
+
+    Callers submit preprocessed arrays of shape (n, H, W, C); a single worker thread
+    concatenates queued submissions until `max_batch_size` rows are collected or
+    `max_wait_ms` has passed since the first one arrived, calls `predict_fn` once and
+    hands each caller back its own slice of the output.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=16, max_wait_ms=5.0):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._batches = 0
+        self._rows = 0
+        self._batch_sizes = Counter()
+        self._queue_depths = Counter()
+
+    def submit(self, batch):
+        """
+        Queue a copy of a preprocessed batch and return a Future resolving to its predictions.
+        Callers may reuse their buffer as soon as this returns, even if they stop waiting.
+        """
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((np.array(batch, dtype=np.float32), future))
+        return future
+
+    def predict(self, batch, timeout=None):
+        """Blocking helper around submit()"""
+        return self.submit(batch).result(timeout=timeout)
+
+    def stats(self):
+        """Snapshot of queue depth and batch-size histograms"""
+        with self._lock:
+            return {
+                'enabled': True,
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000.0,
+                'queue_depth': self._queue.qsize(),
+                'batches': self._batches,
+                'rows': self._rows,
+                'mean_batch_size': (self._rows / self._batches) if self._batches else 0.0,
+                'batch_size_histogram': dict(sorted(self._batch_sizes.items())),
+                'queue_depth_histogram': dict(self._queue_depths),
+            }
+
+    def _ensure_worker(self):
+        # Started lazily so that forked worker processes get their own thread
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='inference-batcher', daemon=True)
+                self._thread.start()
+                logger.info(
+                    f"Batch scheduler started (max_batch_size={self.max_batch_size}, "
+                    f"max_wait_ms={self.max_wait * 1000.0:.1f})"
+                )
+
+    def _run(self):
+        carry = None
+        while True:
+            first = carry if carry is not None else self._queue.get()
+            carry = None
+            pending = [first]
+            rows = len(first[0])
+            deadline = time.monotonic() + self.max_wait
+
+            while rows < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if rows + len(item[0]) > self.max_batch_size:
+                    carry = item
+                    break
+                pending.append(item)
+                rows += len(item[0])
+
+            self._dispatch(pending, rows)
+
+    def _dispatch(self, pending, rows):
+        with self._lock:
+            self._batches += 1
+            self._rows += rows
+            self._batch_sizes[rows] += 1
+            self._queue_depths[_bucket(self._queue.qsize())] += 1
+
+        try:
+            if len(pending) == 1:
+                batch = pending[0][0]
+            else:
+                batch = np.concatenate([item[0] for item in pending], axis=0)
+            preds = np.asarray(self.predict_fn(batch))
+        except Exception as e:
+            logger.error(f"Batched inference failed for {rows} rows: {e}")
+            for _, future in pending:
+                future.set_exception(e)
+            return
+
+        offset = 0
+        for submitted, future in pending:
+            count = len(submitted)
+            future.set_result(preds[offset:offset + count])
+            offset += count
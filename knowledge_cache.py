@@ -0,0 +1,205 @@
+# knowledge_cache.py - Two-tier TTL cache with stale-while-revalidate and single-flight loading
+import json
+import logging
+import threading
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from storage import get_store
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+KNOWLEDGE_CACHE_MIGRATIONS = [
+    '''
+    CREATE TABLE IF NOT EXISTS knowledge_cache (
+        namespace TEXT,
+        key TEXT,
+        value TEXT,
+        fetched_at REAL,
+        PRIMARY KEY (namespace, key)
+    )
+    ''',
+]
+
+
+class KnowledgeCache:
+    """
+    Cache slow-changing remote knowledge (e.g. Wikipedia pages) in memory and SQLite.
+
+    Entries younger than `ttl` are served directly. Entries past their TTL but within
+    the `stale` window are still served while a background thread reloads them, at most
+    one refresh per key at a time.
+    Concurrent misses for the same key share a single call to `loader`. Values must
+    be JSON-serializable and should be treated as read-only by callers.
+    """
+
+    def __init__(self, loader, ttl, stale, db_path=None, namespace='default', max_entries=512, refresh_workers=2):
+        self.loader = loader
+        self.ttl = ttl
+        self.stale = stale
+        self.db_path = db_path
+        self._store = get_store(db_path) if db_path else None
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self._memory = OrderedDict()  # key -> (value, fetched_at)
+        self._inflight = {}  # key -> Future
+        self._refreshing = set()  # keys with a background refresh queued or running
+        self._lock = threading.Lock()
+        self._counters = Counter()
+        self._refresher = ThreadPoolExecutor(max_workers=refresh_workers, thread_name_prefix=f'{namespace}-refresh')
+        if db_path:
+            self._initialize_database()
+
+    def get(self, key):
+        """Return the cached value for key, loading it if missing or fully expired"""
+        value = self.peek(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        self._count('misses')
+        return self._load(key)
+
+    def peek(self, key, default=None):
+        """Return the cached value for key (fresh or stale, as get() would), or default without calling the loader"""
+        entry = self._memory_get(key)
+        if entry is None and self.db_path:
+            entry = self._db_get(key)
+            if entry is not None:
+                self._memory_put(key, entry)
+                self._count('db_hits')
+
+        if entry is not None:
+            value, fetched_at = entry
+            age = time.time() - fetched_at
+            if age < self.ttl:
+                self._count('hits')
+                return value
+            if age < self.ttl + self.stale:
+                self._count('stale_hits')
+                self._refresh_async(key)
+                return value
+        return default
+
+    def contains(self, key):
+        """True if get(key) would be answered from cache (fresh or stale) without calling the loader"""
+        entry = self._memory_get(key)
+        if entry is None and self.db_path:
+            entry = self._db_get(key)
+        return entry is not None and time.time() - entry[1] < self.ttl + self.stale
+
+    def put(self, key, value, fetched_at=None, persist=True):
+        """Store a value in memory and, unless persist is False, in SQLite"""
+        entry = (value, fetched_at if fetched_at is not None else time.time())
+        self._memory_put(key, entry)
+        if persist and self.db_path:
+            self._db_put(key, entry)
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+            size = len(self._memory)
+        return {
+            'entries': size,
+            'persistent': bool(self.db_path),
+            'ttl_seconds': self.ttl,
+            'stale_seconds': self.stale,
+            **{name: counters.get(name, 0) for name in
+               ('hits', 'db_hits', 'stale_hits', 'misses', 'coalesced', 'refreshes', 'refresh_failures')},
+        }
+
+    def _load(self, key):
+        # Single-flight: the first caller loads, concurrent callers wait on its Future
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+            else:
+                self._counters['coalesced'] += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            value = self.loader(key)
+            self.put(key, value)
+            future.set_result(value)
+            return value
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def _refresh_async(self, key):
+        with self._lock:
+            if key in self._inflight or key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        self._refresher.submit(self._refresh, key)
+
+    def _refresh(self, key):
+        try:
+            # A foreground load (or put) may have refreshed the key while this task was queued
+            entry = self._memory_get(key)
+            if entry is not None and time.time() - entry[1] < self.ttl:
+                return
+            self._load(key)
+            self._count('refreshes')
+        except Exception as e:
+            self._count('refresh_failures')
+            logger.warning(f"Background refresh failed for {self.namespace} '{key}': {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def _memory_get(self, key):
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+            return entry
+
+    def _memory_put(self, key, entry):
+        with self._lock:
+            self._memory[key] = entry
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    # --- SQLite tier ---
+    def _initialize_database(self):
+        try:
+            self._store.migrate('knowledge_cache', KNOWLEDGE_CACHE_MIGRATIONS)
+        except Exception as e:
+            logger.error(f"Knowledge cache database initialization failed: {e}")
+            self.db_path = self._store = None
+
+    def _db_get(self, key):
+        try:
+            row = self._store.query_one(
+                "SELECT value, fetched_at FROM knowledge_cache WHERE namespace=? AND key=?",
+                (self.namespace, key)
+            )
+            if row:
+                return json.loads(row[0]), row[1]
+        except Exception as e:
+            logger.error(f"Knowledge cache lookup error: {e}")
+        return None
+
+    def _db_put(self, key, entry):
+        try:
+            self._store.execute(
+                "INSERT OR REPLACE INTO knowledge_cache (namespace, key, value, fetched_at) VALUES (?, ?, ?, ?)",
+                (self.namespace, key, json.dumps(entry[0]), entry[1])
+            )
+        except Exception as e:
+            logger.error(f"Knowledge cache write failed: {e}")
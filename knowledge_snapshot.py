@@ -0,0 +1,74 @@
+# knowledge_snapshot.py - Prefetch disease knowledge into a versioned snapshot file
+import hashlib
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 1
+
+
+def build_snapshot(disease_names, collect, max_workers=8):
+    """
+    Run collect(disease_name) for every disease on a bounded thread pool.
+
+    collect must return a JSON-serializable dict. Failures are recorded under
+    'errors' instead of aborting the whole snapshot.
+    """
+    start = time.perf_counter()
+    entries, errors = {}, {}
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='prefetch') as executor:
+        futures = {executor.submit(collect, name): name for name in disease_names}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                entries[name] = future.result()
+            except Exception as e:
+                logger.error(f"Prefetch failed for {name}: {e}")
+                errors[name] = str(e)
+
+    ordered = {name: entries[name] for name in disease_names if name in entries}
+    body = json.dumps(ordered, sort_keys=True)
+    logger.info(f"Prefetched {len(ordered)}/{len(disease_names)} diseases in {time.perf_counter() - start:.1f}s")
+    return {
+        'version': SNAPSHOT_VERSION,
+        'created_at': datetime.now().isoformat(),
+        'created_ts': time.time(),
+        'fingerprint': hashlib.sha256(body.encode('utf-8')).hexdigest(),
+        'entries': ordered,
+        'errors': errors,
+    }
+
+
+def save_snapshot(snapshot, path):
+    """Write the snapshot atomically so a running server never sees a partial file"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(snapshot, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+    logger.info(f"Knowledge snapshot written to {path}")
+
+
+def load_snapshot(path):
+    """Load a snapshot, returning None if it is missing, unreadable or from another format version"""
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        start = time.perf_counter()
+        with open(path, 'r', encoding='utf-8') as f:
+            snapshot = json.load(f)
+        if snapshot.get('version') != SNAPSHOT_VERSION:
+            logger.warning(f"Ignoring knowledge snapshot {path}: version {snapshot.get('version')} != {SNAPSHOT_VERSION}")
+            return None
+        logger.info(
+            f"Loaded knowledge snapshot with {len(snapshot.get('entries', {}))} diseases "
+            f"in {(time.perf_counter() - start) * 1000:.1f}ms"
+        )
+        return snapshot
+    except Exception as e:
+        logger.error(f"Could not load knowledge snapshot {path}: {e}")
+        return None
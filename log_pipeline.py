@@ -0,0 +1,195 @@
+# log_pipeline.py - Queue-based structured logging with per-level sampling and hot-message rate limits
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import threading
+from collections import Counter
+from datetime import datetime, timezone
+
+from rate_limit import ClientRateLimiter
+
+# Attributes every LogRecord has; anything else was passed through `extra=` and is emitted as a field
+_RESERVED = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime', 'request_id'}
+
+_request_id = contextvars.ContextVar('request_id', default=None)
+
+
+def set_request_id(request_id):
+    """Bind a request ID to the current context (copied into pipeline worker threads)"""
+    return _request_id.set(request_id)
+
+
+def current_request_id():
+    return _request_id.get()
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: timestamp, level, logger, message, request ID and any `extra` fields"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        if getattr(record, 'request_id', None):
+            entry['request_id'] = record.request_id
+        for key, value in vars(record).items():
+            if key not in _RESERVED:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Drops records before they are queued: each level keeps a `sample_rates` fraction of its
+    records (missing levels keep all), and messages starting with one of `rate_limited`
+    prefixes share a token bucket per prefix. The first record let through after a
+    suppressed run carries `suppressed=<count>`. WARNING and above are never sampled.
+    """
+
+    def __init__(self, sample_rates=None, rate_limited=(), rate=5.0, burst=20):
+        super().__init__()
+        self.sample_rates = {logging.getLevelName(level) if isinstance(level, str) else level: value
+                             for level, value in (sample_rates or {}).items()}
+        self.rate_limited = tuple(rate_limited)
+        self._limiter = ClientRateLimiter(rate, burst, max_clients=max(1, len(self.rate_limited)))
+        self._suppressed = Counter()
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.sample_rates.get(record.levelno)
+        if rate is not None and random.random() >= rate:
+            return False
+        if self.rate_limited and isinstance(record.msg, str):
+            prefix = next((p for p in self.rate_limited if record.msg.startswith(p)), None)
+            if prefix is not None:
+                allowed, _ = self._limiter.allow(prefix)
+                with self._lock:
+                    if not allowed:
+                        self._suppressed[prefix] += 1
+                        return False
+                    suppressed = self._suppressed.pop(prefix, 0)
+                if suppressed:
+                    record.suppressed = suppressed
+        return True
+
+
+class AsyncQueueHandler(logging.handlers.QueueHandler):
+    """
+    Hands records to a QueueListener thread that owns the (rotating) file and console
+    handlers, so request threads never block on disk. The record's request ID is captured
+    here, in the logging thread. A full queue drops the record and counts it. After a fork
+    the child gets a fresh queue and its own listener over the same handlers.
+    """
+
+    def __init__(self, log_queue, listener):
+        super().__init__(log_queue)
+        self.listener = listener
+        self.dropped = 0
+        self._pid = os.getpid()
+        self._stopped = False
+
+    def prepare(self, record):
+        # Resolve the message and traceback now; args and exc_info may not be safe to pass between threads
+        record = logging.makeLogRecord(vars(record))
+        record.request_id = _request_id.get()
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def stats(self):
+        return {'queued': self.queue.qsize(), 'dropped': self.dropped}
+
+    def stop(self):
+        """Drain the queue and stop this process's listener (registered to run at exit)"""
+        if self._pid == os.getpid() and not self._stopped:
+            self._stopped = True
+            self.listener.stop()
+
+    def enqueue(self, record):
+        if self._pid != os.getpid():
+            self._restart_after_fork()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _restart_after_fork(self):
+        # The parent's listener thread does not exist here and its queue may hold the parent's
+        # records, so the child gets a fresh queue and its own listener over the same handlers
+        with self.lock:
+            if self._pid == os.getpid():
+                return
+            parent = self.listener
+            self.queue = queue.Queue(maxsize=self.queue.maxsize)
+            self.listener = logging.handlers.QueueListener(
+                self.queue, *parent.handlers, respect_handler_level=parent.respect_handler_level
+            )
+            self.listener.start()
+            self._pid = os.getpid()
+
+
+def setup_logging(level=logging.INFO, log_path=None, json_lines=True, max_bytes=10 * 1024 * 1024,
+                  backup_count=5, sample_rates=None, rate_limited=(), rate=5.0, burst=20, queue_size=10000,
+                  force=False):
+    """
+    Route the root logger through a bounded queue to a background listener writing JSON lines
+    to a size-rotated `log_path` (rotation happens on the listener thread) and plain text to
+    stderr. Returns the root AsyncQueueHandler; the listener is stopped and drained at exit.
+    Like logging.basicConfig, does nothing (and returns None) if the root logger already has
+    handlers, unless `force` is set.
+    """
+    root = logging.getLogger()
+    if root.handlers and not force:
+        return None
+
+    handlers = []
+    console = logging.StreamHandler()
+    console.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s %(message)s'))
+    handlers.append(console)
+    if log_path:
+        file_handler = logging.handlers.RotatingFileHandler(
+            log_path, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8'
+        )
+        file_handler.setFormatter(
+            JsonFormatter() if json_lines else logging.Formatter('%(asctime)s %(levelname)s %(name)s %(message)s')
+        )
+        handlers.append(file_handler)
+
+    log_queue = queue.Queue(maxsize=queue_size)
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    handler = AsyncQueueHandler(log_queue, listener)
+    handler.addFilter(SamplingFilter(sample_rates, rate_limited, rate, burst))
+
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level)
+    listener.start()
+    atexit.register(handler.stop)
+    return handler
+
+
+def parse_sample_rates(text):
+    """'DEBUG=0.1,INFO=1' -> {'DEBUG': 0.1, 'INFO': 1.0}"""
+    rates = {}
+    for part in filter(None, (item.strip() for item in text.split(','))):
+        level, _, value = part.partition('=')
+        rates[level.strip().upper()] = float(value)
+    return rates
@@ -0,0 +1,170 @@
+# mapped_weights.py - Flat, memory-mappable model weights shared by all worker processes on a host
+import hashlib
+import json
+import logging
+import os
+
+import numpy as np
+
+from inference import compile_forward
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_VERSION = 1
+ALIGNMENT = 64  # Byte alignment of every tensor in the data file
+
+
+def _softmax(x):
+    x = x - x.max(axis=-1, keepdims=True)
+    np.exp(x, out=x)
+    x /= x.sum(axis=-1, keepdims=True)
+    return x
+
+
+# Activations the NumPy head supports; each may work in place on its argument
+_ACTIVATIONS = {
+    'linear': lambda x: x,
+    'relu': lambda x: np.maximum(x, 0.0, out=x),
+    'softmax': _softmax,
+}
+
+
+def manifest_path_for(data_path):
+    return os.path.splitext(data_path)[0] + '.json'
+
+
+def export_weights(model, data_path):
+    """
+    Write every weighted layer of `model` into one flat little-endian float32 file plus a JSON manifest
+    (`<name>.json`) describing each tensor's layer, shape and byte offset, plus the data's sha256
+    and modification time. Both files are replaced atomically so running workers keep their
+    existing mapping.
+    """
+    layers, offset = [], 0
+    digest = hashlib.sha256()
+    tmp_data = f"{data_path}.tmp"
+    with open(tmp_data, 'wb') as f:
+        for layer in model.layers:
+            values = layer.get_weights()
+            if not values:
+                continue
+            tensors = []
+            for value in values:
+                data = np.ascontiguousarray(value, dtype='<f4').tobytes()
+                padding = -offset % ALIGNMENT
+                f.write(b'\0' * padding)
+                offset += padding
+                f.write(data)
+                digest.update(data)
+                tensors.append({'shape': list(value.shape), 'offset': offset})
+                offset += len(data)
+            layers.append({
+                'name': layer.name,
+                'class_name': type(layer).__name__,
+                'activation': getattr(getattr(layer, 'activation', None), '__name__', None),
+                'tensors': tensors,
+            })
+        f.flush()
+        os.fsync(f.fileno())
+    mtime_ns = os.stat(tmp_data).st_mtime_ns  # os.replace keeps it
+
+    manifest = {
+        'version': MANIFEST_VERSION,
+        'dtype': 'float32',
+        'data_file': os.path.basename(data_path),
+        'size': offset,
+        'sha256': digest.hexdigest(),
+        'mtime_ns': mtime_ns,
+        'layers': layers,
+    }
+    manifest_path = manifest_path_for(data_path)
+    with open(f"{manifest_path}.tmp", 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_data, data_path)
+    os.replace(f"{manifest_path}.tmp", manifest_path)
+    logger.info(f"Exported {len(layers)} layers ({offset / 1e6:.1f}MB) to {data_path}")
+    return manifest
+
+
+class MappedWeights:
+    """
+    Read-only view of exported weights. The data file is mapped once and every tensor is a
+    zero-copy slice of that mapping, so the pages live in the OS page cache and are shared by
+    every process mapping the same file instead of being copied into each private heap.
+
+    Hashing reads every page, so a load only compares the file's size and modification time
+    with the manifest; the sha256 is checked when those differ from export time or `verify` is
+    set. A warning is logged when `source_path` (the checkpoint the file was exported from) is
+    newer than the data file.
+    """
+
+    def __init__(self, data_path, source_path=None, verify=False):
+        self.data_path = data_path
+        with open(manifest_path_for(data_path), 'r', encoding='utf-8') as f:
+            self.manifest = json.load(f)
+        if self.manifest.get('version') != MANIFEST_VERSION:
+            raise ValueError(f"Unsupported weights manifest version {self.manifest.get('version')}")
+        self._buffer = np.memmap(data_path, dtype=np.uint8, mode='r')
+        if self._buffer.size != self.manifest['size']:
+            raise ValueError(f"{data_path} is {self._buffer.size} bytes, manifest expects {self.manifest['size']}")
+        self.layers = [
+            dict(layer, weights=[self._tensor(t) for t in layer['tensors']])
+            for layer in self.manifest['layers']
+        ]
+        if verify or os.stat(data_path).st_mtime_ns != self.manifest.get('mtime_ns'):
+            self.verify()
+        if source_path and os.path.exists(source_path) and os.path.getmtime(source_path) > os.path.getmtime(data_path):
+            logger.warning(f"{data_path} is older than {source_path}; re-run 'python app.py export-weights'")
+
+    def verify(self):
+        """Hash the mapped tensors in export order and compare with the manifest's sha256"""
+        digest = hashlib.sha256()
+        for layer in self.layers:
+            for weights in layer['weights']:
+                digest.update(weights.data)
+        if digest.hexdigest() != self.manifest['sha256']:
+            raise ValueError(f"{self.data_path} does not match the sha256 recorded in its manifest")
+
+    def _tensor(self, tensor):
+        count = int(np.prod(tensor['shape'])) if tensor['shape'] else 1
+        return np.frombuffer(self._buffer, dtype='<f4', count=count, offset=tensor['offset']).reshape(tensor['shape'])
+
+
+class MappedModel:
+    """
+    Forward pass split between a TensorFlow trunk and a NumPy head.
+
+    The trunk (convolutions, a few hundred KB) gets copies of its weights. The trailing Dense layers,
+    which hold almost all parameters, are evaluated with NumPy directly against the mapped arrays so
+    their weights are never copied into the process.
+    """
+
+    def __init__(self, trunk, mapped):
+        self.trunk = trunk
+        self.mapped = mapped
+        self.input_shape = trunk.input_shape
+
+        trunk_layers = [layer for layer in trunk.layers if layer.weights]
+        if len(trunk_layers) > len(mapped.layers):
+            raise ValueError("Exported weights have fewer layers than the model trunk")
+        for layer, entry in zip(trunk_layers, mapped.layers):
+            layer.set_weights(entry['weights'])
+
+        self.head = []
+        for entry in mapped.layers[len(trunk_layers):]:
+            if entry['class_name'] != 'Dense' or entry['activation'] not in _ACTIVATIONS:
+                raise ValueError(f"Cannot evaluate layer {entry['name']} ({entry['class_name']}) in the mapped head")
+            kernel, bias = entry['weights']
+            self.head.append((kernel, bias, _ACTIVATIONS[entry['activation']]))
+        self._trunk_forward = compile_forward(trunk)
+
+    def count_params(self):
+        return self.trunk.count_params() + sum(kernel.size + bias.size for kernel, bias, _ in self.head)
+
+    def predict(self, batch, verbose=0):
+        features = self._trunk_forward(batch)
+        for kernel, bias, activation in self.head:
+            features = activation(np.matmul(features, kernel) + bias)
+        return features
+
+    __call__ = predict
@@ -0,0 +1,73 @@
+# mediawiki.py - Minimal MediaWiki API client (search and page extracts) over HttpTransport
+import re
+
+HEADING_PATTERN = re.compile(r'^(={2,6})\s*(.+?)\s*\1\s*$', re.MULTILINE)
+
+
+class WikiSection:
+    def __init__(self, title, level):
+        self.title = title
+        self.level = level
+        self.text = ''
+        self.sections = []
+
+
+class WikiPage:
+    """Plain-text page with a summary and nested sections, mirroring what WikipediaHelper reads"""
+
+    def __init__(self, title, fullurl, extract):
+        self.title = title
+        self.fullurl = fullurl
+        self.summary, self.sections = parse_extract(extract or '')
+
+
+def parse_extract(extract):
+    """Split an extract fetched with exsectionformat=wiki into (summary, nested sections)"""
+    matches = list(HEADING_PATTERN.finditer(extract))
+    summary = extract[:matches[0].start()] if matches else extract
+    root = WikiSection('', 1)
+    stack = [root]
+    for i, match in enumerate(matches):
+        section = WikiSection(match.group(2), len(match.group(1)))
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(extract)
+        section.text = extract[match.end():end].strip()
+        while stack[-1].level >= section.level:
+            stack.pop()
+        stack[-1].sections.append(section)
+        stack.append(section)
+    return summary.strip(), root.sections
+
+
+class MediaWikiClient:
+    def __init__(self, transport, api_url):
+        self.transport = transport
+        self.api_url = api_url
+
+    def search(self, query, limit=5):
+        """Titles of the best full-text matches for query"""
+        data = self.transport.get_json(self.api_url, params={
+            'action': 'query',
+            'list': 'search',
+            'srsearch': query,
+            'format': 'json',
+            'srlimit': limit
+        })
+        return [result['title'] for result in data.get('query', {}).get('search', [])]
+
+    def page(self, title):
+        """Fetch a page's plain-text extract, following redirects; None if it does not exist"""
+        data = self.transport.get_json(self.api_url, params={
+            'action': 'query',
+            'prop': 'extracts|info',
+            'explaintext': 1,
+            'exsectionformat': 'wiki',
+            'inprop': 'url',
+            'redirects': 1,
+            'titles': title,
+            'format': 'json'
+        })
+        for page_id, page in data.get('query', {}).get('pages', {}).items():
+            if page_id.startswith('-') or 'missing' in page or 'invalid' in page:
+                return None
+            return WikiPage(page['title'], page.get('fullurl', ''), page.get('extract', ''))
+        return None
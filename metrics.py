@@ -0,0 +1,223 @@
+# metrics.py - Lightweight stage timers, Prometheus-style histograms and Server-Timing support
+import bisect
+import contextvars
+import functools
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Seconds; tuned for stages between ~100us (cache hits) and tens of seconds (network timeouts)
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_labels(labelnames, values):
+    if not labelnames:
+        return ''
+    pairs = ','.join(
+        f'{name}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+        for name, value in zip(labelnames, values)
+    )
+    return '{' + pairs + '}'
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels, rendered in Prometheus text format"""
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series_items = [(labels, list(series)) for labels, series in self._series.items()]
+        for labels, series in sorted(series_items):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), series[:-1]):
+                cumulative += count
+                bucket_labels = _format_labels(self.labelnames + ('le',), labels + (bound,))
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {series[-1]:.6f}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+class CallbackGauge:
+    """Gauge or counter whose samples are read from a callback at scrape time"""
+
+    def __init__(self, name, help_text, callback, labelnames=(), metric_type='gauge'):
+        self.name = name
+        self.help = help_text
+        self.callback = callback  # returns a number, or {label values tuple: number}
+        self.labelnames = tuple(labelnames)
+        self.metric_type = metric_type
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.metric_type}"]
+        try:
+            values = self.callback()
+        except Exception as e:
+            logger.debug(f"Metric callback {self.name} failed: {e}")
+            return lines
+        if not isinstance(values, dict):
+            values = {(): values}
+        for labels, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class RequestTimings:
+    """Stage durations recorded while serving one request, for the Server-Timing header"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.stages = []
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds):
+        with self._lock:
+            self.stages.append((stage, seconds))
+
+    def totals(self):
+        """Seconds per stage, summed over repeated stages, in first-seen order"""
+        totals = {}
+        with self._lock:
+            for stage, seconds in self.stages:
+                totals[stage] = totals.get(stage, 0.0) + seconds
+        return totals
+
+    def server_timing(self):
+        parts = [f"{stage};dur={seconds * 1000.0:.2f}" for stage, seconds in self.totals().items()]
+        parts.append(f"total;dur={(time.perf_counter() - self.start) * 1000.0:.2f}")
+        return ', '.join(parts)
+
+
+_current_request = contextvars.ContextVar('request_timings', default=None)
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+        self.stage_seconds = self.histogram(
+            'plantdoc_stage_duration_seconds', 'Time spent in each processing stage', ('stage',)
+        )
+        self.request_seconds = self.histogram(
+            'plantdoc_http_request_duration_seconds', 'HTTP request latency', ('endpoint', 'status')
+        )
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, help_text, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def gauge(self, name, help_text, callback, labelnames=(), metric_type='gauge'):
+        metric = CallbackGauge(name, help_text, callback, labelnames, metric_type)
+        self._metrics.append(metric)
+        return metric
+
+    @contextmanager
+    def timer(self, stage):
+        """Time a stage into the stage histogram and the current request's Server-Timing"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def record(self, stage, seconds):
+        """Record a stage duration measured elsewhere"""
+        self.stage_seconds.observe(seconds, stage)
+        timings = _current_request.get()
+        if timings is not None:
+            timings.add(stage, seconds)
+
+    def timed(self, stage):
+        """Decorator form of timer()"""
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.timer(stage):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def begin_request(self):
+        timings = RequestTimings()
+        _current_request.set(timings)
+        return timings
+
+    def current_request(self):
+        return _current_request.get()
+
+    def end_request(self, endpoint, status):
+        timings = _current_request.get()
+        _current_request.set(None)
+        if timings is not None:
+            self.request_seconds.observe(time.perf_counter() - timings.start, endpoint, str(status))
+        return timings
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+class StackSampler:
+    """
+    Sampling profiler for a single thread: records its Python stack every `interval`
+    seconds from a helper thread and aggregates them as folded stacks (flamegraph input).
+    """
+
+    def __init__(self, thread_id, interval=0.005, max_depth=64):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self.samples
+
+    def folded(self):
+        return '\n'.join(f"{stack} {count}" for stack, count in self.samples.most_common()) + '\n'
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None and len(stack) < self.max_depth:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+                frame = frame.f_back
+            if stack:
+                self.samples[';'.join(reversed(stack))] += 1
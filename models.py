@@ -0,0 +1,147 @@
+# models.py - Backbone registry shared by the API (app.py) and the standalone predictor (test.py)
+import logging
+import os
+import time
+
+import tensorflow as tf
+from tensorflow.keras import applications
+from tensorflow.keras.layers import (
+    Conv2D, Dense, Dropout, Flatten, GlobalAveragePooling2D, Input, MaxPooling2D, Rescaling
+)
+from tensorflow.keras.models import Sequential
+from tensorflow.keras.optimizers import Adam
+
+logger = logging.getLogger(__name__)
+
+INPUT_SHAPE = (224, 224, 3)
+
+# Disease classes
+CLASS_NAMES = [
+    "Apple Scab", "Apple Black Rot", "Apple Cedar Rust", "Apple Healthy",
+    "Blueberry Healthy", "Cherry Healthy", "Cherry Powdery Mildew",
+    "Corn Gray Leaf Spot", "Corn Common Rust", "Corn Healthy",
+    "Corn Northern Leaf Blight", "Grape Black Rot", "Grape Esca",
+    "Grape Healthy", "Grape Leaf Blight", "Orange Haunglongbing",
+    "Peach Bacterial Spot", "Peach Healthy", "Pepper Bacterial Spot",
+    "Pepper Healthy", "Potato Early Blight", "Potato Healthy",
+    "Potato Late Blight", "Raspberry Healthy", "Soybean Healthy",
+    "Squash Powdery Mildew", "Strawberry Healthy", "Strawberry Leaf Scorch",
+    "Tomato Bacterial Spot", "Tomato Early Blight", "Tomato Healthy",
+    "Tomato Late Blight", "Tomato Leaf Mold", "Tomato Septoria Leaf Spot",
+    "Tomato Spider Mites", "Tomato Target Spot", "Tomato Mosaic Virus",
+    "Tomato Yellow Leaf Curl Virus"
+]
+
+
+def _conv_trunk(input_shape):
+    return [
+        Input(shape=input_shape),
+        Conv2D(32, (3, 3), activation='relu'),
+        MaxPooling2D(2, 2),
+        Conv2D(64, (3, 3), activation='relu'),
+        MaxPooling2D(2, 2),
+        Conv2D(128, (3, 3), activation='relu'),
+        MaxPooling2D(2, 2),
+    ]
+
+
+def _compile(model):
+    model.compile(
+        optimizer=Adam(learning_rate=0.001),
+        loss='categorical_crossentropy',
+        metrics=['accuracy']
+    )
+    return model
+
+
+def create_simple_model(num_classes, input_shape=INPUT_SHAPE, include_head=True):
+    """Create a simple CNN model that works reliably (include_head=False stops after Flatten)"""
+    logger.info("Creating simple CNN model")
+    layers = _conv_trunk(input_shape) + [Flatten()]
+    if not include_head:
+        return Sequential(layers)
+    return _compile(Sequential(layers + [
+        Dense(512, activation='relu'),
+        Dropout(0.5),
+        Dense(num_classes, activation='softmax')
+    ]))
+
+
+def create_gap_model(num_classes, input_shape=INPUT_SHAPE, include_head=True):
+    """Simple CNN trunk with global average pooling instead of Flatten (~0.1M instead of 44M parameters)"""
+    logger.info("Creating simple CNN (global average pooling) model")
+    layers = _conv_trunk(input_shape) + [GlobalAveragePooling2D()]
+    if not include_head:
+        return Sequential(layers)
+    return _compile(Sequential(layers + [
+        Dense(128, activation='relu'),
+        Dropout(0.3),
+        Dense(num_classes, activation='softmax')
+    ]))
+
+
+def _application_builder(name, constructor, scale, offset=0.0, **kwargs):
+    """
+    Builder for a keras.applications backbone. Every backbone takes the same [0, 1] inputs as
+    the simple CNN; the Rescaling layer maps them to the range the architecture expects.
+    Weights are never downloaded: the base is built with weights=None.
+    """
+    def build(num_classes, input_shape=INPUT_SHAPE, include_head=True):
+        logger.info(f"Creating {name} model")
+        base = constructor(include_top=False, weights=None, input_shape=input_shape, **kwargs)
+        layers = [Input(shape=input_shape), Rescaling(scale, offset=offset), base, GlobalAveragePooling2D()]
+        if not include_head:
+            return Sequential(layers)
+        return _compile(Sequential(layers + [Dropout(0.2), Dense(num_classes, activation='softmax')]))
+    return build
+
+
+BACKBONES = {
+    'simple_cnn': create_simple_model,
+    'simple_cnn_gap': create_gap_model,
+    'mobilenet_v2': _application_builder('MobileNetV2', applications.MobileNetV2, 2.0, -1.0),
+    'mobilenet_v3_small': _application_builder(
+        'MobileNetV3Small', applications.MobileNetV3Small, 255.0, include_preprocessing=True
+    ),
+    'efficientnet_b0': _application_builder('EfficientNetB0', applications.EfficientNetB0, 255.0),
+}
+
+
+def build_model(name, num_classes=len(CLASS_NAMES), weights_path=None, include_head=True):
+    """
+    Build a registered backbone and, if weights_path points to an existing file, load its
+    weights. Returns (model, weights_loaded).
+    """
+    if name not in BACKBONES:
+        raise ValueError(f"Unknown backbone '{name}' (available: {', '.join(BACKBONES)})")
+    model = BACKBONES[name](num_classes, include_head=include_head)
+    if not weights_path or not os.path.exists(weights_path):
+        logger.info(f"No weights at {weights_path}; using {name} with random initialization")
+        return model, False
+    try:
+        start = time.perf_counter()
+        model.load_weights(weights_path)
+        logger.info(f"Loaded {name} weights from {weights_path} in {(time.perf_counter() - start) * 1000:.1f}ms")
+        return model, True
+    except Exception as e:
+        logger.warning(f"Could not load {name} weights from {weights_path}: {e}")
+        return model, False
+
+
+def count_flops(model, input_shape=INPUT_SHAPE):
+    """Floating point operations for one image, from TensorFlow's graph profiler (None if unavailable)"""
+    try:
+        from tensorflow.python.framework.convert_to_constants import convert_variables_to_constants_v2
+        forward = tf.function(lambda batch: model(batch, training=False))
+        frozen = convert_variables_to_constants_v2(
+            forward.get_concrete_function(tf.TensorSpec((1,) + tuple(input_shape), tf.float32))
+        )
+        options = tf.compat.v1.profiler.ProfileOptionBuilder.float_operation()
+        options['output'] = 'none'
+        profile = tf.compat.v1.profiler.profile(
+            graph=frozen.graph, run_meta=tf.compat.v1.RunMetadata(), cmd='op', options=options
+        )
+        return profile.total_float_ops
+    except Exception as e:
+        logger.warning(f"Could not count FLOPs: {e}")
+        return None
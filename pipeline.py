@@ -0,0 +1,194 @@
+# pipeline.py - /predict orchestration that overlaps enrichment I/O with model inference
+import contextvars
+import logging
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class StageTimings:
+    """Start offset and duration (ms) of each pipeline stage, relative to request start"""
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, start, time.perf_counter())
+
+    def record(self, name, start, end):
+        with self._lock:
+            self.stages[name] = {
+                'start_ms': round((start - self.origin) * 1000.0, 3),
+                'duration_ms': round((end - start) * 1000.0, 3),
+            }
+
+    def timed(self, name, fn, *args):
+        """Wrap fn so that running it (on any thread) records a stage"""
+        def run():
+            with self.stage(name):
+                return fn(*args)
+        return run
+
+    def total_ms(self):
+        return (time.perf_counter() - self.origin) * 1000.0
+
+    def as_dict(self):
+        with self._lock:
+            return dict(self.stages)
+
+
+class Enrichment:
+    """
+    Treatment and Wikipedia lookups in flight for one label. result() waits for them until the
+    deadline and substitutes fallbacks for whatever misses it (flagging the result partial),
+    while the lookups keep running and fill the caches.
+    """
+
+    def __init__(self, label, treatments_future, wiki_future, deadline, fallback_treatments, fallback_wiki):
+        self.label = label
+        self.deadline = deadline
+        self._futures = (treatments_future, wiki_future)
+        self._fallbacks = (fallback_treatments, fallback_wiki)
+        self._result = None
+
+    def done(self):
+        return all(future.done() for future in self._futures) or time.monotonic() >= self.deadline
+
+    def result(self):
+        """Returns (scraped_info, wiki_info, partial)"""
+        if self._result is None:
+            values, partial = [], False
+            for future, fallback, name in zip(self._futures, self._fallbacks, ('Treatment', 'Wikipedia')):
+                try:
+                    values.append(future.result(timeout=max(0.0, self.deadline - time.monotonic())))
+                except FutureTimeoutError:
+                    logger.warning(f"{name} lookup for {self.label} missed the request deadline")
+                    values.append(fallback(self.label))
+                    partial = True
+            self._result = (values[0], values[1], partial)
+        return self._result
+
+
+class EnrichmentPipeline:
+    """
+    Thread-pool orchestrator for the /predict flow.
+
+    While the forward pass runs on the request thread, enrichment for the labels that
+    were predicted most often recently is warmed on a side pool. Once the label is
+    known, treatments and Wikipedia info are fetched concurrently and awaited only
+    until the request deadline; whatever misses it is replaced by a fallback and the
+    result is flagged partial, while the fetch keeps running and fills the caches.
+    The runner-up labels are warmed as well.
+
+    `treatments_cached` / `wiki_cached` return a label's cached result, or None on a miss,
+    without any network call. Hits are answered inline on the request thread, so they never
+    queue behind slow network fetches on the pool.
+    """
+
+    def __init__(self, classify, fetch_treatments, fetch_wiki, fallback_treatments, fallback_wiki,
+                 max_workers=8, deadline_ms=2500, top_k=3, history=256, treatments_cached=None, wiki_cached=None):
+        self.classify = classify
+        self.fetch_treatments = fetch_treatments
+        self.fetch_wiki = fetch_wiki
+        self.treatments_cached = treatments_cached
+        self.wiki_cached = wiki_cached
+        self.fallback_treatments = fallback_treatments
+        self.fallback_wiki = fallback_wiki
+        self.deadline = deadline_ms / 1000.0
+        self.top_k = top_k
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='enrich')
+        self._warm_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='enrich-warm')
+        self._warming = set()
+        self._recent = deque(maxlen=history)
+        self._lock = threading.Lock()
+
+    def run(self, image_bytes, class_names, classify=None):
+        """
+        Returns (prediction, scraped_info, wiki_info, alternatives, partial, timings).
+        `classify` overrides the pipeline's classifier for this call (e.g. tiled prediction).
+        """
+        timings = StageTimings()
+        deadline = time.monotonic() + self.deadline
+
+        with self._lock:
+            likely = [label for label, _ in Counter(self._recent).most_common(self.top_k)]
+        for label in likely:
+            self._warm(label)
+
+        with timings.stage('inference'):
+            prediction = (classify or self.classify)(image_bytes)
+        label = prediction['label']
+        enrichment = self.enrich(label, timings, deadline)
+
+        alternatives = self.alternatives(prediction, class_names)
+        for alternative in alternatives:
+            self._warm(alternative['disease'])
+
+        scraped_info, wiki_info, partial = enrichment.result()
+        return prediction, scraped_info, wiki_info, alternatives, partial, timings
+
+    def enrich(self, label, timings=None, deadline=None):
+        """Start the treatment and Wikipedia lookups for a predicted label"""
+        timings = timings or StageTimings()
+        with self._lock:
+            self._recent.append(label)
+        treatments_future = self._start(timings, 'treatments', self.fetch_treatments, self.treatments_cached, label)
+        wiki_future = self._start(timings, 'wikipedia', self.fetch_wiki, self.wiki_cached, label)
+        return Enrichment(
+            label, treatments_future, wiki_future, deadline or time.monotonic() + self.deadline,
+            self.fallback_treatments, self.fallback_wiki
+        )
+
+    def alternatives(self, prediction, class_names):
+        """Runner-up labels (up to top_k - 1) with their probabilities"""
+        label = prediction['label']
+        probs = prediction.get('probs') or []
+        ranked = sorted(range(len(probs)), key=lambda i: probs[i], reverse=True)
+        return [
+            {'disease': class_names[i], 'confidence': float(probs[i])}
+            for i in ranked[:self.top_k] if class_names[i] != label
+        ][:max(0, self.top_k - 1)]
+
+    def _start(self, timings, stage, fetch, cached, label):
+        if cached is not None:
+            try:
+                value = timings.timed(stage, cached, label)()
+            except Exception as e:
+                logger.debug(f"Cache check for {label} failed: {e}")
+                value = None
+            if value is not None:
+                future = Future()
+                future.set_result(value)
+                return future
+        # Run network fetches in copies of the request context so per-request instrumentation follows them
+        return self._executor.submit(contextvars.copy_context().run, timings.timed(stage, fetch, label))
+
+    def _warm(self, label):
+        # Best effort: fill the treatment and Wikipedia caches, at most one warm-up per label at a time
+        with self._lock:
+            if label in self._warming:
+                return
+            self._warming.add(label)
+
+        def warm():
+            try:
+                self.fetch_treatments(label)
+                self.fetch_wiki(label)
+            except Exception as e:
+                logger.debug(f"Warm-up for {label} failed: {e}")
+            finally:
+                with self._lock:
+                    self._warming.discard(label)
+
+        self._warm_executor.submit(warm)
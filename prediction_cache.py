@@ -0,0 +1,275 @@
+# prediction_cache.py - Content-addressed prediction cache with perceptual near-duplicate lookup
+import hashlib
+import json
+import logging
+import threading
+from collections import Counter, OrderedDict
+from datetime import datetime
+
+import numpy as np
+from PIL import Image
+
+from storage import get_store
+
+logger = logging.getLogger(__name__)
+
+HASH_BITS = 64
+BANDS = 4  # Near-duplicate index bands; any distance up to BANDS - 1 bits shares at least one band
+BAND_BITS = HASH_BITS // BANDS
+BAND_MASK = (1 << BAND_BITS) - 1
+DIGEST_CHUNK = 1024 * 1024
+_LUMA = np.array([0.299, 0.587, 0.114], dtype=np.float32)  # ITU-R 601, as PIL's convert('L')
+
+
+PREDICTION_CACHE_MIGRATIONS = [
+    '''
+    CREATE TABLE IF NOT EXISTS prediction_cache (
+        digest TEXT PRIMARY KEY,
+        phash INTEGER,
+        band0 INTEGER, band1 INTEGER, band2 INTEGER, band3 INTEGER,
+        label TEXT,
+        confidence REAL,
+        probs TEXT,
+        timestamp DATETIME
+    );
+    CREATE INDEX IF NOT EXISTS idx_prediction_cache_band0 ON prediction_cache (band0);
+    CREATE INDEX IF NOT EXISTS idx_prediction_cache_band1 ON prediction_cache (band1);
+    CREATE INDEX IF NOT EXISTS idx_prediction_cache_band2 ON prediction_cache (band2);
+    CREATE INDEX IF NOT EXISTS idx_prediction_cache_band3 ON prediction_cache (band3)
+    ''',
+]
+
+
+def content_digest(image):
+    """Exact cache key for an upload (bytes, or a seekable stream hashed in chunks and rewound)"""
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        return hashlib.sha256(image).hexdigest()
+    digest = hashlib.sha256()
+    image.seek(0)
+    for chunk in iter(lambda: image.read(DIGEST_CHUNK), b''):
+        digest.update(chunk)
+    image.seek(0)
+    return digest.hexdigest()
+
+
+def perceptual_hash(pixels):
+    """
+    64-bit difference hash (dHash) that survives recompression and resizing, computed from an
+    already decoded (H, W, 3) image in [0, 1] such as the model input
+    """
+    gray = Image.fromarray(np.dot(pixels, _LUMA).astype(np.float32, copy=False))
+    small = np.asarray(gray.resize((9, 8), Image.Resampling.BILINEAR, reducing_gap=2.0))
+    bits = np.packbits(small[:, 1:] > small[:, :-1])
+    return int.from_bytes(bits.tobytes(), 'big')
+
+
+def hamming_distance(a, b):
+    return (a ^ b).bit_count()
+
+
+def _bands(phash):
+    return [(phash >> (BAND_BITS * i)) & BAND_MASK for i in range(BANDS)]
+
+
+def _to_signed(value):
+    # SQLite integers are signed 64-bit
+    return value - (1 << HASH_BITS) if value >= (1 << (HASH_BITS - 1)) else value
+
+
+def _to_unsigned(value):
+    return value + (1 << HASH_BITS) if value < 0 else value
+
+
+class PredictionCache:
+    """
+    Cache of model predictions keyed on the SHA-256 of the uploaded bytes.
+
+    With `max_distance` > 0, a perceptual hash secondary index also lets recompressed or
+    resized copies of an image hit, after they are decoded (lookup_near). That trades
+    correctness for latency: a different photo within `max_distance` bits gets its
+    diagnosis, so it is off by default. Entries live in a bounded in-memory LRU, optionally
+    backed by a SQLite table that survives restarts.
+    """
+
+    def __init__(self, max_entries=1024, max_distance=0, db_path=None):
+        self.max_entries = max(1, int(max_entries))
+        self.max_distance = max_distance
+        self.near_duplicates = max_distance > 0
+        self.db_path = db_path
+        self._store = get_store(db_path) if db_path else None
+        self._entries = OrderedDict()  # digest -> (phash, prediction)
+        self._band_index = [{} for _ in range(BANDS)]  # band value -> set of digests
+        self._lock = threading.Lock()
+        self._counters = Counter()
+        if self.max_distance >= BANDS:
+            logger.warning(f"Near-duplicate matches above {BANDS - 1} bits are best-effort only")
+        if db_path:
+            self._initialize_database()
+
+    def lookup(self, image):
+        """
+        Look up a prediction for an upload (bytes or a seekable stream) by its exact content.
+        Returns (prediction or None, key); after a miss pass key to lookup_near() and/or store().
+        """
+        digest = content_digest(image)
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None:
+                self._entries.move_to_end(digest)
+                self._counters['hits_exact'] += 1
+                return dict(entry[1], cache_hit='exact'), (digest, entry[0])
+
+        if self.db_path:
+            row = self._db_get(digest)
+            if row is not None:
+                self._remember(digest, row[0], row[1])
+                self._count('hits_db')
+                return dict(row[1], cache_hit='exact'), (digest, row[0])
+
+        self._count('misses')
+        return None, (digest, None)
+
+    def lookup_near(self, key, pixels):
+        """
+        Near-duplicate lookup for an exact miss, on the image the preprocessor decoded
+        ((H, W, 3) in [0, 1]). Returns (prediction or None, key); a no-op unless near_duplicates.
+        """
+        digest, _ = key
+        if not self.near_duplicates:
+            return None, key
+        try:
+            phash = perceptual_hash(pixels)
+        except Exception as e:
+            logger.warning(f"Perceptual hash failed: {e}")
+            return None, key
+
+        near = self._find_near(phash)
+        if near is None and self.db_path:
+            near = self._db_find_near(phash)
+        if near is not None:
+            # Alias the exact digest so the next identical upload skips decoding
+            self._remember(digest, phash, near)
+            self._count('hits_near')
+            return dict(near, cache_hit='near'), (digest, phash)
+        return None, (digest, phash)
+
+    def store(self, key, prediction):
+        """Cache a prediction under the key returned by lookup() or lookup_near()"""
+        digest, phash = key
+        entry = {
+            'label': prediction['label'],
+            'confidence': prediction['confidence'],
+            'probs': list(prediction['probs']),
+        }
+        self._remember(digest, phash, entry)
+        if self.db_path:
+            self._db_put(digest, phash, entry)
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+            size = len(self._entries)
+        # Near hits are exact misses that lookup_near() then answered
+        exact_hits = counters.get('hits_exact', 0) + counters.get('hits_db', 0)
+        hits = exact_hits + counters.get('hits_near', 0)
+        lookups = exact_hits + counters.get('misses', 0)
+        return {
+            'enabled': True,
+            'entries': size,
+            'max_entries': self.max_entries,
+            'persistent': bool(self.db_path),
+            'max_distance': self.max_distance,
+            'hits_exact': counters.get('hits_exact', 0),
+            'hits_near': counters.get('hits_near', 0),
+            'hits_db': counters.get('hits_db', 0),
+            'misses': counters.get('misses', 0),
+            'hit_rate': (hits / lookups) if lookups else 0.0,
+        }
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def _remember(self, digest, phash, entry):
+        with self._lock:
+            if digest in self._entries:
+                self._entries.move_to_end(digest)
+                return
+            self._entries[digest] = (phash, entry)
+            if phash is not None:
+                for band, value in zip(self._band_index, _bands(phash)):
+                    band.setdefault(value, set()).add(digest)
+            while len(self._entries) > self.max_entries:
+                old_digest, (old_phash, _) = self._entries.popitem(last=False)
+                if old_phash is not None:
+                    for band, value in zip(self._band_index, _bands(old_phash)):
+                        digests = band.get(value)
+                        if digests is not None:
+                            digests.discard(old_digest)
+                            if not digests:
+                                del band[value]
+
+    def _find_near(self, phash):
+        best, best_distance = None, self.max_distance + 1
+        with self._lock:
+            candidates = set()
+            for band, value in zip(self._band_index, _bands(phash)):
+                candidates.update(band.get(value, ()))
+            for digest in candidates:
+                candidate_hash, entry = self._entries[digest]
+                distance = hamming_distance(phash, candidate_hash)
+                if distance < best_distance:
+                    best, best_distance = entry, distance
+        return best
+
+    # --- SQLite tier ---
+    def _initialize_database(self):
+        try:
+            self._store.migrate('prediction_cache', PREDICTION_CACHE_MIGRATIONS)
+        except Exception as e:
+            logger.error(f"Prediction cache database initialization failed: {e}")
+            self.db_path = self._store = None
+
+    def _db_get(self, digest):
+        try:
+            row = self._store.query_one(
+                "SELECT phash, label, confidence, probs FROM prediction_cache WHERE digest=?", (digest,)
+            )
+            if row:
+                phash = _to_unsigned(row[0]) if row[0] is not None else None
+                return phash, {'label': row[1], 'confidence': row[2], 'probs': json.loads(row[3])}
+        except Exception as e:
+            logger.error(f"Prediction cache lookup error: {e}")
+        return None
+
+    def _db_find_near(self, phash):
+        try:
+            rows = self._store.query_all(
+                "SELECT phash, label, confidence, probs FROM prediction_cache "
+                "WHERE band0=? OR band1=? OR band2=? OR band3=? LIMIT 64",
+                _bands(phash)
+            )
+        except Exception as e:
+            logger.error(f"Prediction cache lookup error: {e}")
+            return None
+
+        best, best_distance = None, self.max_distance + 1
+        for row in rows:
+            distance = hamming_distance(phash, _to_unsigned(row[0]))
+            if distance < best_distance:
+                best = {'label': row[1], 'confidence': row[2], 'probs': json.loads(row[3])}
+                best_distance = distance
+        return best
+
+    def _db_put(self, digest, phash, entry):
+        bands = _bands(phash) if phash is not None else [None] * BANDS
+        try:
+            self._store.execute(
+                "INSERT OR REPLACE INTO prediction_cache "
+                "(digest, phash, band0, band1, band2, band3, label, confidence, probs, timestamp) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (digest, _to_signed(phash) if phash is not None else None, *bands,
+                 entry['label'], entry['confidence'], json.dumps(entry['probs']), datetime.now().isoformat())
+            )
+        except Exception as e:
+            logger.error(f"Prediction cache write failed: {e}")
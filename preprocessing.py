@@ -0,0 +1,245 @@
+# preprocessing.py - Allocation-lean image preprocessing for model input
+import io
+import logging
+import math
+import threading
+
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+TARGET_SIZE = (224, 224)
+DRAFT_FACTOR = 2  # Use reduced-size JPEG decoding once the source is this many times the target
+MAX_IMAGE_PIXELS = 40_000_000  # Declared dimensions above this are rejected before decoding
+MAX_DECODE_BYTES = 64 * 1024 * 1024  # Estimated decode memory per image (after JPEG draft scaling)
+TILE_OVERLAP = 0.25  # Minimum fraction of a tile shared with its neighbour in tiled mode
+MAX_TILES = 16
+
+# Bytes per pixel for the modes PIL decodes into
+_MODE_BYTES = {'1': 1, 'L': 1, 'P': 1, 'LA': 2, 'PA': 2, 'I;16': 2, 'RGB': 3, 'YCbCr': 3, 'LAB': 3, 'HSV': 3,
+               'RGBA': 4, 'RGBa': 4, 'CMYK': 4, 'I': 4, 'F': 4}
+
+
+class ImageTooLargeError(ValueError):
+    """Raised when an image's declared size exceeds the pixel or decode-memory limits"""
+
+
+def open_image(source):
+    """Open image bytes or a (rewound) file-like object; reads the header only, no pixel data"""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    else:
+        source.seek(0)
+    return Image.open(source)
+
+
+def decode_bytes(image, target_mode='RGB'):
+    """Estimated peak memory to decode `image` at its current (draft-adjusted) size and convert it"""
+    pixels = image.width * image.height
+    estimate = pixels * _MODE_BYTES.get(image.mode, 4)
+    if image.mode != target_mode:
+        estimate += pixels * _MODE_BYTES.get(target_mode, 4)
+    return estimate
+
+
+def check_dimensions(image, max_pixels=MAX_IMAGE_PIXELS):
+    if image.width * image.height > max_pixels:
+        raise ImageTooLargeError(
+            f"Image is {image.width}x{image.height} ({image.width * image.height / 1e6:.1f}MP), "
+            f"limit is {max_pixels / 1e6:.1f}MP"
+        )
+
+
+def check_decode_budget(image, max_bytes=MAX_DECODE_BYTES, target_mode='RGB'):
+    """Return the estimated decode memory, raising ImageTooLargeError above max_bytes"""
+    estimate = decode_bytes(image, target_mode)
+    if estimate > max_bytes:
+        raise ImageTooLargeError(
+            f"Decoding {image.width}x{image.height} {image.mode} needs ~{estimate / 2**20:.0f}MB, "
+            f"limit is {max_bytes / 2**20:.0f}MB"
+        )
+    return estimate
+
+
+def tile_count(length, tile, stride):
+    """Tiles of size `tile` needed to cover `length` pixels with at most `stride` between starts"""
+    if length <= tile:
+        return 1
+    return math.ceil((length - tile) / stride) + 1
+
+
+def tile_layout(width, height, tile_size, overlap=TILE_OVERLAP, max_tiles=MAX_TILES):
+    """
+    Working size and grid for tiling a width x height image: the largest scale (at most 1)
+    whose grid of tiles fits in `max_tiles`. Returns ((work_width, work_height), (rows, cols)).
+    The short side is never scaled below one tile; only extreme aspect ratios are squashed.
+    """
+    tile_w, tile_h = tile_size
+    stride_w = max(1, round(tile_w * (1.0 - overlap)))
+    stride_h = max(1, round(tile_h * (1.0 - overlap)))
+    best = None
+    for rows in range(1, max_tiles + 1):
+        cols = max_tiles // rows
+        # Largest scale at which `rows` x `cols` tiles still cover the image
+        scale = min((tile_w + (cols - 1) * stride_w) / width, (tile_h + (rows - 1) * stride_h) / height)
+        if best is None or scale > best[0]:
+            best = (scale, rows, cols)
+    scale, rows, cols = best
+    scale = min(1.0, scale)
+    work_w = min(max(tile_w, math.floor(width * scale)), tile_w + (cols - 1) * stride_w)
+    work_h = min(max(tile_h, math.floor(height * scale)), tile_h + (rows - 1) * stride_h)
+    return (work_w, work_h), (tile_count(work_h, tile_h, stride_h), tile_count(work_w, tile_w, stride_w))
+
+
+class ImagePreprocessor:
+    """
+    Decode uploads straight into float32 model input.
+
+    Large JPEGs are decoded at a reduced DCT scale (PIL draft mode) so a 12MP photo
+    never materializes at full resolution, other formats are box-reduced before the
+    final resample, and pixels are scaled into a float32 buffer without the float64
+    temporary that `np.array(image) / 255.0` creates.
+
+    Sources may be bytes or seekable file-like objects (e.g. the spooled upload stream),
+    which are decoded in place. Declared dimensions are checked from the header before
+    any pixel data is read, and images whose decode would exceed `max_decode_bytes`
+    even after draft scaling are rejected with ImageTooLargeError. `observer`, if given,
+    is called with the estimated decode memory of every accepted image.
+    """
+
+    def __init__(self, target_size=TARGET_SIZE, draft_factor=DRAFT_FACTOR,
+                 max_pixels=MAX_IMAGE_PIXELS, max_decode_bytes=MAX_DECODE_BYTES, observer=None):
+        self.target_size = tuple(target_size)
+        self.draft_factor = draft_factor
+        self.max_pixels = max_pixels
+        self.max_decode_bytes = max_decode_bytes
+        self.observer = observer
+        self.rejected = 0
+        self._local = threading.local()
+
+    def inspect(self, source):
+        """Header-only check of an upload; returns its format, size and estimated decode memory"""
+        image = self._open(source)
+        return {
+            'format': image.format,
+            'width': image.width,
+            'height': image.height,
+            'decode_bytes': decode_bytes(image),
+        }
+
+    def load(self, source):
+        """Open image bytes or a file-like object and return an RGB image at target size"""
+        image = self._open(source)
+        if self.observer is not None:
+            self.observer(decode_bytes(image))
+
+        image = image.convert('RGB')
+        return image.resize(self.target_size, Image.Resampling.BICUBIC, reducing_gap=3.0)
+
+    def tiles(self, source, overlap=TILE_OVERLAP, max_tiles=MAX_TILES):
+        """
+        Cut an image into overlapping target-size tiles, for photos with several leaves.
+
+        The image is decoded once at the scale chosen by tile_layout (JPEG draft included),
+        and every tile is gathered from a sliding-window view of the pixel array in a single
+        fancy-indexing step, then scaled into one float32 batch. Returns
+        (batch, (rows, cols), boxes): batch is (rows * cols, H, W, 3) in row-major grid order
+        and boxes are the tiles' (left, top, right, bottom) in source-image pixels.
+        """
+        tile_w, tile_h = self.target_size
+        header = open_image(source)
+        (work_w, work_h), (rows, cols) = tile_layout(
+            header.width, header.height, self.target_size, overlap, max_tiles
+        )
+        image = self._open(source, (work_w, work_h))
+        if self.observer is not None:
+            self.observer(decode_bytes(image))
+
+        image = image.convert('RGB')
+        if image.size != (work_w, work_h):
+            image = image.resize((work_w, work_h), Image.Resampling.BICUBIC, reducing_gap=3.0)
+        pixels = np.asarray(image)
+
+        # Tile starts are spread evenly so the last row and column end flush with the edges
+        tops = np.linspace(0, work_h - tile_h, rows).round().astype(np.intp)
+        lefts = np.linspace(0, work_w - tile_w, cols).round().astype(np.intp)
+        windows = np.lib.stride_tricks.sliding_window_view(pixels, (tile_h, tile_w), axis=(0, 1))
+        gathered = windows[tops[:, None], lefts[None, :]]  # (rows, cols, 3, tile_h, tile_w) uint8 copy
+
+        batch = np.empty((rows * cols, tile_h, tile_w, 3), dtype=np.float32)
+        np.divide(
+            gathered.transpose(0, 1, 3, 4, 2), np.float32(255.0), out=batch.reshape(rows, cols, tile_h, tile_w, 3)
+        )
+
+        scale_x, scale_y = header.width / work_w, header.height / work_h
+        boxes = [
+            [round(left * scale_x), round(top * scale_y),
+             round((left + tile_w) * scale_x), round((top + tile_h) * scale_y)]
+            for top in tops.tolist() for left in lefts.tolist()
+        ]
+        return batch, (rows, cols), boxes
+
+    def _open(self, source, draft_size=None):
+        image = open_image(source)
+        try:
+            # Declared dimensions come from the header; nothing has been decoded yet
+            check_dimensions(image, self.max_pixels)
+        except ImageTooLargeError:
+            self.rejected += 1
+            raise
+
+        width, height = draft_size or self.target_size
+        if (image.format == 'JPEG'
+                and image.width >= width * self.draft_factor
+                and image.height >= height * self.draft_factor):
+            # libjpeg picks the largest 1/2, 1/4 or 1/8 scale that stays >= the requested size
+            image.draft('RGB', (width, height))
+
+        try:
+            check_decode_budget(image, self.max_decode_bytes)
+        except ImageTooLargeError:
+            self.rejected += 1
+            raise
+        return image
+
+    def preprocess(self, source, out=None):
+        """
+        Preprocess a single image into a (1, H, W, 3) float32 array.
+
+        Without `out`, a per-thread buffer is reused, so the result is only valid
+        until the next call on the same thread.
+        """
+        if out is None:
+            out = self._buffer()
+        self._fill(source, out[0])
+        return out
+
+    def preprocess_batch(self, sources, out=None):
+        """
+        Preprocess a list of images into one (N, H, W, 3) float32 array.
+
+        Returns (batch, errors) where errors maps the index of each image that could
+        not be decoded to its error message; those rows are left zeroed.
+        """
+        if out is None:
+            out = np.zeros((len(sources),) + self.target_size[::-1] + (3,), dtype=np.float32)
+        errors = {}
+        for i, source in enumerate(sources):
+            try:
+                self._fill(source, out[i])
+            except Exception as e:
+                out[i] = 0.0
+                errors[i] = str(e)
+        return out, errors
+
+    def _fill(self, source, row):
+        image = self.load(source)
+        np.divide(np.asarray(image), np.float32(255.0), out=row)
+
+    def _buffer(self):
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer is None:
+            buffer = np.empty((1,) + self.target_size[::-1] + (3,), dtype=np.float32)
+            self._local.buffer = buffer
+        return buffer
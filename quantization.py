@@ -0,0 +1,184 @@
+# quantization.py - TFLite conversion (float16 / int8) and an interpreter-based inference backend
+import glob
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import tensorflow as tf
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+QUANTIZATION_MODES = ('float32', 'float16', 'int8')
+IMAGE_PATTERNS = ('*.jpg', '*.jpeg', '*.png')
+
+
+def find_images(directories):
+    """Image files directly inside the given directories, in a stable order"""
+    paths = []
+    for directory in directories:
+        for pattern in IMAGE_PATTERNS:
+            paths.extend(glob.glob(os.path.join(directory, pattern)))
+    return sorted(set(paths))
+
+
+def representative_dataset(paths, preprocessor, samples=100, seed=0):
+    """
+    Calibration generator for int8 conversion. Local leaf photos are few, so the set is
+    padded with flipped and randomly cropped variants of them up to `samples` inputs.
+    """
+    if not paths:
+        raise ValueError("No calibration images found")
+    images = []
+    for path in paths:
+        try:
+            with open(path, 'rb') as f:
+                images.append(preprocessor.load(f.read()))
+        except Exception as e:
+            logger.warning(f"Skipping calibration image {path}: {e}")
+    if not images:
+        raise ValueError("No readable calibration images")
+
+    width, height = preprocessor.target_size
+
+    def generate():
+        rng = np.random.default_rng(seed)
+        for i in range(samples):
+            image = images[i % len(images)]
+            if i >= len(images):
+                scale = rng.uniform(0.6, 1.0)
+                w, h = int(width * scale), int(height * scale)
+                x, y = rng.integers(0, width - w + 1), rng.integers(0, height - h + 1)
+                image = image.crop((x, y, x + w, y + h)).resize((width, height))
+                if rng.random() < 0.5:
+                    image = image.transpose(Image.Transpose.FLIP_LEFT_RIGHT)
+            yield [np.asarray(image, dtype=np.float32)[np.newaxis] / 255.0]
+
+    return generate
+
+
+def _configure(converter, mode, representative):
+    if mode == 'float16':
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.target_spec.supported_types = [tf.float16]
+    elif mode == 'int8':
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = representative
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    return converter
+
+
+def convert_model(model, output_path, mode='float16', representative=None):
+    """
+    Convert a Keras model to a TFLite flatbuffer. float16 halves the weights; int8 quantizes
+    weights and activations using `representative` for calibration. Inputs and outputs stay
+    float32 so callers pass the same preprocessed batches as to the Keras model.
+    """
+    if mode not in QUANTIZATION_MODES:
+        raise ValueError(f"Unknown quantization mode '{mode}'")
+    if mode == 'int8' and representative is None:
+        raise ValueError("int8 conversion needs a representative dataset")
+
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory() as export_dir:
+        # A SavedModel export freezes the Keras variables into constants the calibrator can run
+        model.export(export_dir, format='tf_saved_model', verbose=False)
+        converter = _configure(tf.lite.TFLiteConverter.from_saved_model(export_dir), mode, representative)
+        flatbuffer = converter.convert()
+
+    tmp_path = f"{output_path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(flatbuffer)
+    os.replace(tmp_path, output_path)
+    logger.info(
+        f"Converted model to {mode} TFLite ({len(flatbuffer) / 1e6:.1f}MB) in "
+        f"{time.perf_counter() - start:.1f}s: {output_path}"
+    )
+    return output_path
+
+
+class TFLiteRunner:
+    """
+    Run a TFLite model on (n, H, W, C) float32 batches.
+
+    Resizing an interpreter means a full allocate_tensors(), and the batch scheduler produces a
+    different batch size on most calls, so interpreters stay allocated for the batch size they
+    were last used with. Interpreters are not thread-safe: each call checks one out of a pool
+    keyed by batch size. Every interpreter holds its own packed copy of the weights, so once
+    `max_interpreters` exist a new batch size resizes the least recently used idle one instead.
+    """
+
+    def __init__(self, model_path, num_threads=None, max_interpreters=4):
+        self.model_path = model_path
+        self.num_threads = num_threads
+        self.max_interpreters = max(1, int(max_interpreters))
+        with open(model_path, 'rb') as f:
+            self._content = f.read()  # Shared by all interpreters instead of re-reading the file
+        self._idle = OrderedDict()  # batch size -> idle interpreters, least recently used first
+        self._lock = threading.Lock()
+        self._count = 0  # Idle and checked-out interpreters
+        self._created = 0
+        self._resized = 0
+        interpreter = self._acquire(1)
+        self.input_shape = tuple(interpreter.get_input_details()[0]['shape'])
+        self._release(1, interpreter)
+
+    def _acquire(self, batch_size):
+        interpreter = None
+        with self._lock:
+            idle = self._idle.get(batch_size)
+            if idle:
+                self._idle.move_to_end(batch_size)
+                return idle.pop()
+            if self._count >= self.max_interpreters and self._idle:
+                interpreter = self._pop_least_recent()
+                self._resized += 1
+            else:
+                self._count += 1
+                self._created += 1
+        if interpreter is None:
+            interpreter = tf.lite.Interpreter(model_content=self._content, num_threads=self.num_threads)
+        details = interpreter.get_input_details()[0]
+        if details['shape'][0] != batch_size:
+            interpreter.resize_tensor_input(details['index'], [batch_size] + list(details['shape'][1:]))
+        interpreter.allocate_tensors()
+        return interpreter
+
+    def _release(self, batch_size, interpreter):
+        with self._lock:
+            self._idle.setdefault(batch_size, []).append(interpreter)
+            self._idle.move_to_end(batch_size)
+            # More than the cap exist only while concurrent callers had all of them checked out
+            while self._count > self.max_interpreters:
+                self._pop_least_recent()
+                self._count -= 1
+
+    def _pop_least_recent(self):
+        size, idle = next(iter(self._idle.items()))
+        interpreter = idle.pop(0)
+        if not idle:
+            del self._idle[size]
+        return interpreter
+
+    def stats(self):
+        with self._lock:
+            return {
+                'interpreters': self._count,
+                'created': self._created,
+                'resized': self._resized,
+                'idle_batch_sizes': sorted(self._idle),
+            }
+
+    def __call__(self, batch):
+        batch = np.asarray(batch, dtype=np.float32)
+        interpreter = self._acquire(len(batch))
+        try:
+            interpreter.set_tensor(interpreter.get_input_details()[0]['index'], batch)
+            interpreter.invoke()
+            return interpreter.get_tensor(interpreter.get_output_details()[0]['index'])
+        finally:
+            self._release(len(batch), interpreter)
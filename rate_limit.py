@@ -0,0 +1,48 @@
+# rate_limit.py - Keyed token buckets, shared by request rate limiting and log throttling
+import math
+import threading
+import time
+from collections import Counter, OrderedDict
+
+
+class ClientRateLimiter:
+    """
+    Token bucket per client: `rate` requests per second sustained, bursts up to `burst`.
+    Buckets for the least recently seen clients are dropped beyond `max_clients`.
+    """
+
+    def __init__(self, rate, burst, max_clients=10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()  # client -> (tokens, updated_at)
+        self._lock = threading.Lock()
+        self._counters = Counter()
+
+    def allow(self, client, cost=1.0):
+        """Take `cost` tokens from the client's bucket; returns (allowed, retry_after_seconds)"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(client, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[client] = (tokens, now)
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+            self._counters['allowed' if allowed else 'limited'] += 1
+        if allowed:
+            return True, 0
+        return False, max(1, math.ceil((cost - tokens) / self.rate))
+
+    def stats(self):
+        with self._lock:
+            return {
+                'enabled': True,
+                'rate_per_second': self.rate,
+                'burst': self.burst,
+                'clients': len(self._buckets),
+                'allowed': self._counters.get('allowed', 0),
+                'limited': self._counters.get('limited', 0),
+            }
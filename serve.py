@@ -0,0 +1,138 @@
+# serve.py - Production launcher: preforked gunicorn workers with CPU-aware TensorFlow threading
+#
+# The master process never imports app.py, so TensorFlow is never initialized before fork. Each worker
+# imports the app after fork, builds its own model and sizes TensorFlow's thread pools to its share of
+# the CPUs, optionally pinned to those CPUs.
+#
+# Usage: python serve.py [--workers N] [--threads T] [--bind HOST:PORT] [--pin-cpus]
+import argparse
+import logging
+import os
+
+try:
+    from gunicorn.app.base import BaseApplication
+except ImportError:
+    BaseApplication = None
+
+logger = logging.getLogger('serve')
+
+DEFAULT_BIND = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+WORKER_TIMEOUT = 120  # Seconds; covers model build and warm-up in a freshly forked worker
+
+
+def available_cpus():
+    """CPUs this process may run on"""
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def partition_cpus(cpus, workers):
+    """Split cpus into one contiguous, near-equal slice per worker (slices repeat when workers > cpus)"""
+    if workers >= len(cpus):
+        return [[cpus[i % len(cpus)]] for i in range(workers)]
+    size, extra = divmod(len(cpus), workers)
+    slices, start = [], 0
+    for i in range(workers):
+        end = start + size + (1 if i < extra else 0)
+        slices.append(cpus[start:end])
+        start = end
+    return slices
+
+
+def thread_settings(cpu_count, workers):
+    """TensorFlow (intra_op, inter_op) thread counts so that all workers together use each core once"""
+    per_worker = max(1, cpu_count // workers)
+    return per_worker, 2 if per_worker >= 4 else 1
+
+
+if BaseApplication is not None:
+    class PlantDiseaseServer(BaseApplication):
+        """Programmatic gunicorn application serving app:app"""
+
+        def __init__(self, options, cpu_slices=None):
+            self.options = options
+            self.cpu_slices = cpu_slices
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+            self.cfg.set('pre_fork', self.pre_fork)
+            self.cfg.set('post_fork', self.post_fork)
+            self.cfg.set('post_worker_init', self.post_worker_init)
+
+        def load(self):
+            from app import app
+            return app
+
+        def pre_fork(self, server, worker):
+            # Runs in the master: give the new worker the CPU slot no live worker holds
+            if self.cpu_slices:
+                taken = {getattr(w, 'cpu_slot', None) for w in server.WORKERS.values()}
+                worker.cpu_slot = next((i for i in range(len(self.cpu_slices)) if i not in taken), 0)
+
+        def post_fork(self, server, worker):
+            if self.cpu_slices and hasattr(os, 'sched_setaffinity'):
+                cpus = self.cpu_slices[worker.cpu_slot]
+                try:
+                    os.sched_setaffinity(0, cpus)
+                    server.log.info(f"Worker {worker.pid} pinned to CPUs {cpus}")
+                except OSError as e:
+                    server.log.warning(f"Could not pin worker {worker.pid} to CPUs {cpus}: {e}")
+
+        def post_worker_init(self, worker):
+            import app
+            app.initialize_application()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the Plant Disease Detection API with preforked workers')
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('WEB_WORKERS', 0)),
+                        help='Worker processes (default: one per available CPU)')
+    parser.add_argument('--threads', type=int, default=int(os.environ.get('WEB_THREADS', 8)),
+                        help='Request threads per worker; concurrent requests share forward passes')
+    parser.add_argument('--bind', default=os.environ.get('BIND', DEFAULT_BIND))
+    parser.add_argument('--pin-cpus', action='store_true',
+                        default=os.environ.get('PIN_CPUS', 'False').lower() == 'true',
+                        help='Pin each worker to its own slice of CPUs')
+    parser.add_argument('--timeout', type=int, default=WORKER_TIMEOUT)
+    args = parser.parse_args()
+
+    # Configure only this logger: the root logger is left for app.py to set up inside each worker
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s %(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+
+    if BaseApplication is None:
+        raise SystemExit("gunicorn is required for the production server: pip install gunicorn")
+
+    cpus = available_cpus()
+    workers = args.workers or len(cpus)
+    intra_op, inter_op = thread_settings(len(cpus), workers)
+
+    # Inherited by every worker; app.py applies them before building the model
+    os.environ['TF_INTRA_OP_THREADS'] = str(intra_op)
+    os.environ['TF_INTER_OP_THREADS'] = str(inter_op)
+    os.environ['OMP_NUM_THREADS'] = str(intra_op)
+    os.environ['OPENBLAS_NUM_THREADS'] = str(intra_op)  # NumPy matmuls of the mmap backend's Dense head
+    os.environ.setdefault('FLASK_DEBUG', 'false')
+
+    logger.info(
+        f"Starting {workers} workers x {args.threads} threads on {args.bind} "
+        f"({len(cpus)} CPUs, TensorFlow intra_op={intra_op} inter_op={inter_op}, pinning={'on' if args.pin_cpus else 'off'})"
+    )
+    options = {
+        'bind': args.bind,
+        'workers': workers,
+        'worker_class': 'gthread',
+        'threads': args.threads,
+        'timeout': args.timeout,
+        'preload_app': False,  # Each worker imports the app (and TensorFlow) after fork
+    }
+    PlantDiseaseServer(options, partition_cpus(cpus, workers) if args.pin_cpus else None).run()
+
+
+if __name__ == '__main__':
+    main()
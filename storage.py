@@ -0,0 +1,114 @@
+# storage.py - Pooled SQLite storage with WAL mode and versioned migrations
+import logging
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+BUSY_TIMEOUT_SECONDS = 5.0
+CACHED_STATEMENTS = 256  # Compiled statements kept per connection, keyed by SQL text
+
+
+class SQLiteStore:
+    """
+    One SQLite connection per thread (and per process, so forked workers never share
+    a handle), opened in WAL mode so readers do not block the writer. The sqlite3
+    statement cache keeps constant SQL strings prepared across calls.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def connection(self):
+        """Return this thread's connection, opening it on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        conn = sqlite3.connect(
+            self.path,
+            timeout=BUSY_TIMEOUT_SECONDS,
+            cached_statements=CACHED_STATEMENTS,
+            isolation_level=None  # Autocommit; transactions are explicit via transaction()
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def query_one(self, sql, params=()):
+        return self.connection().execute(sql, params).fetchone()
+
+    def query_all(self, sql, params=()):
+        return self.connection().execute(sql, params).fetchall()
+
+    def execute(self, sql, params=()):
+        """Run a single write statement in its own transaction"""
+        with self.transaction() as conn:
+            return conn.execute(sql, params).rowcount
+
+    def execute_many(self, sql, rows):
+        """Batch many writes into one transaction"""
+        with self.transaction() as conn:
+            return conn.executemany(sql, rows).rowcount
+
+    @contextmanager
+    def transaction(self):
+        conn = self.connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def migrate(self, component, migrations):
+        """
+        Apply pending migrations for a component.
+
+        migrations is an ordered list; entry N (1-based) upgrades the component's schema
+        to version N and is either an SQL script or a callable taking the connection.
+        Applied versions are tracked per component in schema_migrations, so tables
+        survive restarts and are only rebuilt when a migration says so.
+        """
+        with self._lock, self.transaction() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS schema_migrations (component TEXT PRIMARY KEY, version INTEGER)"
+            )
+            row = conn.execute("SELECT version FROM schema_migrations WHERE component=?", (component,)).fetchone()
+            current = row[0] if row else 0
+            for version, migration in enumerate(migrations, start=1):
+                if version <= current:
+                    continue
+                if callable(migration):
+                    migration(conn)
+                else:
+                    for statement in migration.split(';'):
+                        if statement.strip():
+                            conn.execute(statement)
+                logger.info(f"Applied {component} migration {version} to {os.path.basename(self.path)}")
+            if len(migrations) > current:
+                conn.execute(
+                    "INSERT OR REPLACE INTO schema_migrations (component, version) VALUES (?, ?)",
+                    (component, len(migrations))
+                )
+            return max(current, len(migrations))
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(path):
+    """Shared SQLiteStore for a database path"""
+    path = os.path.abspath(path)
+    with _stores_lock:
+        store = _stores.get(path)
+        if store is None:
+            store = _stores[path] = SQLiteStore(path)
+        return store
@@ -0,0 +1,46 @@
+import pytest
+
+from disease_index import DiseaseIndex
+from models import CLASS_NAMES
+
+
+@pytest.fixture(scope='module')
+def index():
+    return DiseaseIndex(CLASS_NAMES)
+
+
+@pytest.mark.parametrize('query, name', [
+    ('Tomato Late Blight', 'Tomato Late Blight'),
+    ('tomato_late_blight', 'Tomato Late Blight'),
+    ('phytophthora infestans', 'Potato Late Blight'),
+    ('maize common rust', 'Corn Common Rust'),
+    ('tomato leaf mould', 'Tomato Leaf Mold'),
+    ('tomatoe late blite', 'Tomato Late Blight'),
+    ('apple scab', 'Apple Scab'),
+])
+def test_resolves(index, query, name):
+    assert index.resolve(query)['name'] == name
+
+
+@pytest.mark.parametrize('query', [
+    'apple', 'grape', 'tomato', 'corn', 'rust', 'powdery mildew', 'late blight', 'blight', 'leaf spot', 'banana',
+])
+def test_ambiguous_or_unknown_queries_stay_unresolved(index, query):
+    assert index.resolve(query) is None
+
+
+@pytest.mark.parametrize('query', [
+    'soybean rust', 'cherry leaf spot', 'banana leaf spot', 'tomato bacterial wilt', 'cucumber mosaic virus',
+])
+def test_fuzzy_match_needs_compatible_crop_and_condition(index, query):
+    assert index.resolve(query) is None
+
+
+@pytest.mark.parametrize('query, name', [
+    ('tomatoe late blite', 'Tomato Late Blight'),
+    ('strawbery leaf scorch', 'Strawberry Leaf Scorch'),
+    ('septoria leaf spt', 'Tomato Septoria Leaf Spot'),
+])
+def test_fuzzy_match_tolerates_typos(index, query, name):
+    result = index.resolve(query)
+    assert (result['name'], result['match']) == (name, 'fuzzy')
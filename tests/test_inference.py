@@ -0,0 +1,26 @@
+import threading
+
+import numpy as np
+
+from inference import BatchScheduler
+
+
+def test_submitted_batch_is_not_affected_by_buffer_reuse():
+    busy, release = threading.Event(), threading.Event()
+
+    def predict(batch):
+        busy.set()
+        release.wait(5.0)
+        return batch.reshape(len(batch), -1).sum(axis=1)
+
+    scheduler = BatchScheduler(predict, max_batch_size=1, max_wait_ms=0)
+    first = scheduler.submit(np.zeros((1, 2, 2, 3), dtype=np.float32))
+    busy.wait(5.0)  # The worker is now holding the first batch
+
+    buffer = np.ones((1, 2, 2, 3), dtype=np.float32)
+    queued = scheduler.submit(buffer)
+    buffer.fill(0.0)  # The caller's next request reuses the buffer while its old batch is still queued
+    release.set()
+
+    assert first.result(5.0)[0] == 0.0
+    assert queued.result(5.0)[0] == 12.0
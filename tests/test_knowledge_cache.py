@@ -0,0 +1,35 @@
+import threading
+import time
+
+from knowledge_cache import KnowledgeCache
+
+
+def test_stale_hits_share_one_background_refresh():
+    calls = []
+    release = threading.Event()
+
+    def loader(key):
+        calls.append(key)
+        release.wait(5.0)
+        return key.upper()
+
+    cache = KnowledgeCache(loader, ttl=1, stale=100)
+    cache.put('blight', 'old', fetched_at=time.time() - 10, persist=False)
+    for _ in range(50):
+        assert cache.get('blight') == 'old'
+    release.set()
+    cache._refresher.shutdown(wait=True)
+
+    assert calls == ['blight']
+    assert cache.get('blight') == 'BLIGHT'
+    assert cache.stats()['refreshes'] == 1
+
+
+def test_peek_answers_hits_without_loading():
+    calls = []
+    cache = KnowledgeCache(lambda key: calls.append(key) or key.upper(), ttl=100, stale=0)
+    assert cache.peek('scab') is None
+    cache.put('scab', 'cached', persist=False)
+    assert cache.peek('scab') == 'cached'
+    assert calls == []
+    assert cache.stats()['hits'] == 1
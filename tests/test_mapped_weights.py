@@ -0,0 +1,68 @@
+import logging
+import os
+
+import pytest
+
+from mapped_weights import MappedWeights, export_weights
+from models import CLASS_NAMES, build_model
+
+
+@pytest.fixture(scope='module')
+def model():
+    return build_model('simple_cnn', len(CLASS_NAMES))[0]
+
+
+@pytest.fixture
+def exported(model, tmp_path):
+    data_path = str(tmp_path / 'model.bin')
+    export_weights(model, data_path)
+    return data_path
+
+
+def test_maps_exported_weights(model, exported):
+    mapped = MappedWeights(exported)
+    assert len(mapped.layers) == len([layer for layer in model.layers if layer.weights])
+
+
+def corrupt(data_path):
+    with open(data_path, 'r+b') as f:
+        f.seek(os.path.getsize(data_path) // 2)
+        byte = f.read(1)
+        f.seek(-1, os.SEEK_CUR)
+        f.write(bytes([byte[0] ^ 0xFF]))
+
+
+def test_unchanged_file_is_not_hashed(exported, monkeypatch):
+    monkeypatch.setattr(MappedWeights, 'verify', lambda self: pytest.fail('hashed an unchanged file'))
+    MappedWeights(exported)
+
+
+def test_rejects_data_file_modified_after_export(exported):
+    corrupt(exported)
+    with pytest.raises(ValueError, match='sha256'):
+        MappedWeights(exported)
+
+
+def test_verify_hashes_even_when_mtime_matches(exported):
+    stat = os.stat(exported)
+    corrupt(exported)
+    os.utime(exported, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    MappedWeights(exported)
+    with pytest.raises(ValueError, match='sha256'):
+        MappedWeights(exported, verify=True)
+
+
+def test_warns_when_checkpoint_is_newer(exported, tmp_path, caplog):
+    checkpoint = tmp_path / 'model.h5'
+    checkpoint.write_bytes(b'')
+    mtime = os.path.getmtime(exported)
+    os.utime(checkpoint, (mtime + 60, mtime + 60))
+    with caplog.at_level(logging.WARNING, logger='mapped_weights'):
+        MappedWeights(exported, source_path=str(checkpoint))
+    assert 'older than' in caplog.text
+
+    caplog.clear()
+    os.utime(checkpoint, (mtime - 60, mtime - 60))
+    with caplog.at_level(logging.WARNING, logger='mapped_weights'):
+        MappedWeights(exported, source_path=str(checkpoint))
+    assert 'older than' not in caplog.text
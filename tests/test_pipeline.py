@@ -0,0 +1,35 @@
+import threading
+
+from pipeline import EnrichmentPipeline
+
+CACHED = {'Apple Scab'}
+
+
+def cached(label):
+    return {'label': label} if label in CACHED else None
+
+
+def test_cache_hits_do_not_queue_behind_network_fetches():
+    release = threading.Event()
+    fetched = []
+
+    def fetch(label):
+        fetched.append(label)
+        if label not in CACHED:
+            release.wait(5.0)  # A slow network fetch holding a pool worker
+        return {'label': label}
+
+    pipeline = EnrichmentPipeline(
+        classify=None, fetch_treatments=fetch, fetch_wiki=fetch,
+        fallback_treatments=lambda label: {'fallback': label}, fallback_wiki=lambda label: {'fallback': label},
+        max_workers=2, deadline_ms=200, treatments_cached=cached, wiki_cached=cached
+    )
+    try:
+        slow = pipeline.enrich('Tomato Late Blight')
+        scraped_info, wiki_info, partial = pipeline.enrich('Apple Scab').result()
+        assert not partial
+        assert scraped_info == wiki_info == {'label': 'Apple Scab'}
+        assert slow.result()[2]
+        assert 'Apple Scab' not in fetched  # The cached value is used as is, not looked up again
+    finally:
+        release.set()
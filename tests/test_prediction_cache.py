@@ -0,0 +1,49 @@
+import io
+import os
+
+import pytest
+from PIL import Image
+
+from prediction_cache import PredictionCache
+from preprocessing import ImagePreprocessor
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PREDICTION = {'label': 'Apple Scab', 'confidence': 0.9, 'probs': [0.9, 0.1]}
+
+
+@pytest.fixture(scope='module')
+def uploads():
+    with open(os.path.join(BASE_DIR, 'test_leaf.jpg'), 'rb') as f:
+        original = f.read()
+    buffer = io.BytesIO()
+    Image.open(io.BytesIO(original)).convert('RGB').resize((300, 300)).save(buffer, 'JPEG', quality=60)
+    return original, buffer.getvalue()
+
+
+def classify(cache, preprocessor, upload):
+    prediction, key = cache.lookup(upload)
+    if prediction is None:
+        prediction, key = cache.lookup_near(key, preprocessor.preprocess(upload)[0])
+    if prediction is None:
+        cache.store(key, PREDICTION)
+    return prediction
+
+
+def test_exact_matches_only_by_default(uploads):
+    original, recompressed = uploads
+    cache, preprocessor = PredictionCache(), ImagePreprocessor()
+    assert classify(cache, preprocessor, original) is None
+    assert classify(cache, preprocessor, original)['cache_hit'] == 'exact'
+    assert classify(cache, preprocessor, recompressed) is None
+    assert cache.stats()['hits_near'] == 0
+
+
+def test_near_duplicates_when_enabled(uploads):
+    original, recompressed = uploads
+    cache, preprocessor = PredictionCache(max_distance=3), ImagePreprocessor()
+    assert classify(cache, preprocessor, original) is None
+    hit = classify(cache, preprocessor, recompressed)
+    assert hit['cache_hit'] == 'near' and hit['label'] == 'Apple Scab'
+    # The near hit aliases the recompressed copy's digest
+    assert classify(cache, preprocessor, recompressed)['cache_hit'] == 'exact'
+    assert cache.stats()['hit_rate'] == pytest.approx(2 / 3)
@@ -0,0 +1,72 @@
+import io
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from benchmarks.preprocess import legacy_preprocess
+from models import CLASS_NAMES, build_model
+from preprocessing import ImagePreprocessor
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+JPEG_FIXTURES = ['test_leaf.jpg', 'OIP.jpeg', 'test.jpeg', 'uploads/plant.jpg', 'uploads/plant_image.jpg']
+TOLERANCE = 0.02  # Max per-pixel difference from the original preprocess_image (JPEG draft decoding adds ~4/255)
+
+
+def read(name):
+    with open(os.path.join(BASE_DIR, name), 'rb') as f:
+        return f.read()
+
+
+def convert(image_bytes, image_format, mode='RGB', size=None):
+    image = Image.open(io.BytesIO(image_bytes)).convert(mode)
+    if size is not None:
+        image = image.resize(size, Image.Resampling.BICUBIC)
+    buffer = io.BytesIO()
+    image.save(buffer, image_format, quality=90)
+    return buffer.getvalue()
+
+
+FIXTURES = {name: read(name) for name in JPEG_FIXTURES}
+FIXTURES['test_leaf.png'] = convert(FIXTURES['test_leaf.jpg'], 'PNG')
+FIXTURES['OIP_rgba.png'] = convert(FIXTURES['OIP.jpeg'], 'PNG', 'RGBA')
+FIXTURES['test_gray.png'] = convert(FIXTURES['test.jpeg'], 'PNG', 'L')
+FIXTURES['test_leaf_4032x3024.jpg'] = convert(FIXTURES['test_leaf.jpg'], 'JPEG', size=(4032, 3024))  # Draft path
+
+
+@pytest.fixture(scope='module')
+def model():
+    return build_model(
+        os.environ.get('MODEL_BACKBONE', 'simple_cnn'), len(CLASS_NAMES),
+        weights_path=os.path.join(BASE_DIR, 'plant_disease_model.h5')
+    )[0]
+
+
+@pytest.fixture(scope='module')
+def preprocessor():
+    return ImagePreprocessor((224, 224))
+
+
+@pytest.mark.parametrize('name', sorted(FIXTURES))
+def test_preprocess_matches_original(name, model, preprocessor):
+    reference = legacy_preprocess(FIXTURES[name])
+    candidate = preprocessor.preprocess(FIXTURES[name])
+    assert candidate.shape == reference.shape == (1, 224, 224, 3)
+    assert candidate.dtype == np.float32
+    assert np.abs(reference - candidate).max() <= TOLERANCE
+    predicted = np.asarray(model(np.concatenate([reference.astype(np.float32), candidate]), training=False))
+    assert np.argmax(predicted[0]) == np.argmax(predicted[1])
+
+
+def test_preprocess_batch_matches_original(model, preprocessor):
+    names = sorted(FIXTURES)
+    batch, errors = preprocessor.preprocess_batch([FIXTURES[name] for name in names] + [b'not an image'])
+    assert list(errors) == [len(names)]
+    assert not batch[len(names)].any()
+    reference = np.concatenate([legacy_preprocess(FIXTURES[name]) for name in names]).astype(np.float32)
+    assert np.abs(reference - batch[:len(names)]).max() <= TOLERANCE
+    np.testing.assert_array_equal(
+        np.asarray(model(reference, training=False)).argmax(axis=1),
+        np.asarray(model(batch[:len(names)], training=False)).argmax(axis=1)
+    )